@@ -0,0 +1 @@
+"""Micro-benchmarks for the dashboard data pipeline (``python -m benchmarks.run``)."""
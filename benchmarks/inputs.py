@@ -0,0 +1,151 @@
+"""Benchmark inputs: the real ``results/`` and ``samples/`` data plus scaled-up copies.
+
+Every builder returns a list of inputs for one helper. With ``scale=None``
+these are all the real inputs. With ``scale=N`` a median-sized real input (the
+seed) is grown N times: more knot groups, more JSON blocks, longer bodies,
+more sections. So scale 1, 10 and 100 show how each helper grows with input
+size without multiplying the whole corpus. The completeness scoring and the
+entity aggregation work on the whole set of files, which is repeated N times.
+"""
+import email
+import glob
+import importlib
+import json
+import os
+from email.message import EmailMessage
+
+from pipeline.parsing import extract_knots_from_section
+
+EMAIL_RESULTS = "results/real_email_combined_prompts_v9.json"
+FILE_COMPARISON_PATTERN = "results/file_comparison_*.json"
+REAL_FILE_PATTERN = "results/real_file/*.json"
+
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _seed(items, size=len):
+    """Median-sized item, so the scaled inputs are neither trivial nor the worst case"""
+    return sorted(items, key=size)[len(items) // 2]
+
+
+def _suffixed(groups, copies):
+    """Knot groups repeated ``copies`` times; copies after the first get distinct entity names"""
+    return [[entity if i == 0 else f"{entity} {i}" for entity in group]
+            for i in range(copies) for group in groups]
+
+
+def email_outputs(root="."):
+    """Raw email prompt outputs (```json wrapped) from the email comparison results"""
+    data = _load(os.path.join(root, EMAIL_RESULTS))
+    outputs = []
+    for name, entry in data.items():
+        if name == "summary":
+            continue
+        outputs.extend(entry["raw_results"].values())
+    return outputs
+
+
+def knots_section_inputs(root=".", scale=None):
+    """Complete outputs plus truncated copies, which take the line-scanning fallback path"""
+    outputs = email_outputs(root)
+    if scale:
+        seed = _seed(outputs)
+        parsed = json.loads(seed.replace("```json\n", "").replace("\n```", "").strip())
+        parsed["entities"]["knots_from_section"] = _suffixed(parsed["entities"]["knots_from_section"], scale)
+        outputs = ["```json\n" + json.dumps(parsed, indent=2, ensure_ascii=False) + "\n```"]
+    return outputs + [output[:len(output) // 2] for output in outputs]
+
+
+def file_raw_outputs(root="."):
+    outputs = []
+    for path in sorted(glob.glob(os.path.join(root, FILE_COMPARISON_PATTERN))):
+        data = _load(path)
+        outputs.append(data["separate_approach"].get("raw_json", ""))
+        outputs.append(data["combined_approach"].get("raw_json", ""))
+    return [output for output in outputs if output]
+
+
+def json_blocks_inputs(root=".", scale=None):
+    """File comparison raw outputs (several ```json blocks each); scaled by repeating the blocks"""
+    outputs = file_raw_outputs(root)
+    if scale:
+        outputs = ["\n".join([_seed(outputs)] * scale)]
+    return outputs
+
+
+def knot_group_inputs(root=".", scale=None):
+    """Knot group lists parsed from the email outputs; scaled by repeating the groups verbatim"""
+    groups = [extract_knots_from_section(output) for output in email_outputs(root)]
+    groups = [g for g in groups if g]
+    if scale:
+        groups = [_seed(groups) * scale]
+    return groups
+
+
+def real_emails():
+    module = importlib.import_module("samples.real_email")
+    return [value for name, value in sorted(vars(module).items())
+            if name.startswith("real_email") and isinstance(value, str)]
+
+
+def _html_part(raw_email):
+    for part in email.message_from_string(raw_email).walk():
+        if part.get_content_type() == "text/html":
+            return part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="replace")
+    return ""
+
+
+def html_inputs(root=".", scale=None):
+    """HTML bodies of the real emails; scaled by repeating the body inside one document"""
+    bodies = [body for body in (_html_part(raw) for raw in real_emails()) if body]
+    if scale:
+        bodies = [_seed(bodies) * scale]
+    return bodies
+
+
+def email_inputs(root=".", scale=None):
+    """Raw real emails; scaled by building a new MIME message with N times longer parts"""
+    emails = real_emails()
+    if scale:
+        seed = email.message_from_string(_seed(emails))
+        message = EmailMessage()
+        for header in ("Subject", "From", "To", "Date"):
+            if seed.get(header):
+                message[header] = str(seed.get(header))
+        html = _html_part(_seed(emails))
+        message.set_content(" ".join(html.split())[:2000] * scale)
+        message.add_alternative(html * scale, subtype="html")
+        emails = [message.as_string()]
+    return emails
+
+
+def completeness_inputs(root=".", scale=None):
+    """One batch of (document, variant, extracted_data) from the real-file results; scaled by adding documents"""
+    results = []
+    for path in sorted(glob.glob(os.path.join(root, REAL_FILE_PATTERN))):
+        extracted = _load(path).get("extracted_data", {}).get("extracted_data", {})
+        results.append((os.path.basename(path), "result", extracted))
+    if scale:
+        results = [(f"{name}#{i}", variant, extracted) for i in range(scale) for name, variant, extracted in results]
+    return [results]
+
+
+def file_entity_inputs(root=".", scale=None):
+    """(file name, separate knots, combined knots) for every file comparison; scaled by adding files"""
+    files = []
+    for path in sorted(glob.glob(os.path.join(root, FILE_COMPARISON_PATTERN))):
+        data = _load(path)
+        files.append((os.path.basename(path), set(data["separate_approach"]["knots"]),
+                      set(data["combined_approach"]["knots"])))
+    if scale:
+        files = [(f"{name}#{i}", separate, combined) for i in range(scale) for name, separate, combined in files]
+    return [files]
+
+
+def input_size(inputs):
+    """Rough input size in bytes, for the history records"""
+    return len(json.dumps(inputs, default=list, ensure_ascii=False).encode("utf-8"))
+
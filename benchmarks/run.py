@@ -0,0 +1,196 @@
+"""Run the pipeline benchmarks and keep a machine-readable history.
+
+Each run appends one JSON line to ``benchmarks/history.jsonl`` with the commit,
+an optional label and the timings of every case at every scale. The history
+is machine-local (timings only compare on the same machine) and ignored by git.
+Compare two runs before and after a performance change::
+
+    python -m benchmarks.run --label "before knots fix"
+    python -m benchmarks.run --label "after knots fix"
+    python -m benchmarks.run compare            # last two runs
+    python -m benchmarks.run compare --base "before knots fix" --head -1
+
+Scale ``real`` runs every real input from ``results/`` and ``samples/``; scales
+1, 10 and 100 run one median-sized input grown that many times (see
+``benchmarks/inputs.py``). Use ``--case`` to run a subset and
+``--scale real 1 10`` to skip the 100x inputs.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import inputs
+from pipeline import completeness, mail_reader, parsing
+
+HISTORY_FILE = os.path.join("benchmarks", "history.jsonl")
+DEFAULT_SCALES = ["real", "1", "10", "100"]
+MIN_REPEAT_SECONDS = 0.05
+MAX_LOOPS = 1000
+
+
+def _aggregate_file_entities(files):
+    separate_counts, combined_counts = {}, {}
+    separate_by_file, combined_by_file = {}, {}
+    for name, separate, combined in files:
+        parsing.add_file_entities(separate, name, separate_counts, separate_by_file)
+        parsing.add_file_entities(combined, name, combined_counts, combined_by_file)
+    return parsing.common_entities_in_same_file(separate_by_file, combined_by_file)
+
+
+def _score_completeness(results):
+    return completeness.completeness_scores(completeness.field_table(results))
+
+
+# name -> (input builder, function applied to every input)
+CASES = {
+    "extract_knots_from_section": (inputs.knots_section_inputs, parsing.extract_knots_from_section),
+    "extract_knots_from_json_blocks": (inputs.json_blocks_inputs, parsing.extract_knots_from_json_blocks),
+    "extract_topics": (inputs.json_blocks_inputs, parsing.extract_topics),
+    "get_plain_text": (inputs.html_inputs, parsing.get_plain_text),
+    "extract_email_parts": (inputs.email_inputs, parsing.extract_email_parts),
+    "parse_message": (inputs.email_inputs, mail_reader.parse_message),
+    "has_excessive_duplicates": (inputs.knot_group_inputs, parsing.has_excessive_duplicates),
+    "completeness_scoring": (inputs.completeness_inputs, _score_completeness),
+    "file_entity_aggregation": (inputs.file_entity_inputs, _aggregate_file_entities),
+}
+
+
+def time_case(function, case_inputs, repeat):
+    """Per-loop timings in ms; a loop calls ``function`` once per input"""
+    def one_loop():
+        for item in case_inputs:
+            function(item)
+
+    start = time.perf_counter()
+    one_loop()
+    first = time.perf_counter() - start
+    loops = max(1, min(MAX_LOOPS, int(MIN_REPEAT_SECONDS / first) if first > 0 else MAX_LOOPS))
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            one_loop()
+        timings.append((time.perf_counter() - start) * 1000 / loops)
+    return loops, timings
+
+
+def git_state():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, timeout=30).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        return "unknown", False
+    return commit or "unknown", dirty
+
+
+def run_suite(case_names, scales, repeat, root="."):
+    results = []
+    for name in case_names:
+        build, function = CASES[name]
+        for scale in scales:
+            case_inputs = build(root, scale=None if scale == "real" else int(scale))
+            loops, timings = time_case(function, case_inputs, repeat)
+            result = {
+                "case": name,
+                "scale": scale,
+                "inputs": len(case_inputs),
+                "input_bytes": inputs.input_size(case_inputs),
+                "loops": loops,
+                "repeat": repeat,
+                "min_ms": round(min(timings), 4),
+                "median_ms": round(statistics.median(timings), 4),
+            }
+            results.append(result)
+            print(f"{name:<32} {scale:>5} {result['inputs']:>4} inputs "
+                  f"{result['input_bytes'] / 1024:>10.0f} KB {result['median_ms']:>12.3f} ms", flush=True)
+    return results
+
+
+def read_history(path=HISTORY_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(record, path=HISTORY_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def find_run(history, ref):
+    """A history record by index (``-1`` is the latest), label or commit prefix"""
+    try:
+        return history[int(ref)]
+    except (ValueError, IndexError):
+        pass
+    for record in reversed(history):
+        if record.get("label") == ref or record.get("commit", "").startswith(ref):
+            return record
+    raise SystemExit(f"No benchmark run matches {ref!r}")
+
+
+def compare_runs(base, head, threshold=0.10):
+    base_results = {(r["case"], r["scale"]): r for r in base["results"]}
+    print(f"base: {base['commit']} {base.get('label') or ''} ({base['timestamp']})")
+    print(f"head: {head['commit']} {head.get('label') or ''} ({head['timestamp']})")
+    print(f"{'case':<32} {'scale':>5} {'base ms':>12} {'head ms':>12} {'change':>8}")
+    for result in head["results"]:
+        before = base_results.get((result["case"], result["scale"]))
+        if not before:
+            continue
+        change = result["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        marker = "  slower" if change > threshold else ("  faster" if change < -threshold else "")
+        print(f"{result['case']:<32} {result['scale']:>5} {before['median_ms']:>12.3f} "
+              f"{result['median_ms']:>12.3f} {change:>+8.1%}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard parsing helpers")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "compare"])
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="Run only these cases")
+    parser.add_argument("--scale", nargs="+", default=DEFAULT_SCALES,
+                        help="'real' for all real inputs, N for the seed input grown N times")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--label", help="Free-form note stored with the run, e.g. the change being measured")
+    parser.add_argument("--no-save", action="store_true", help="Do not append the run to the history")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--base", default="-2", help="compare: index, label or commit of the base run")
+    parser.add_argument("--head", default="-1", help="compare: index, label or commit of the new run")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        history = read_history(args.history)
+        if len(history) < 2 and (args.base, args.head) == ("-2", "-1"):
+            raise SystemExit("Need at least two runs in the history to compare")
+        compare_runs(find_run(history, args.base), find_run(history, args.head))
+        return
+
+    commit, dirty = git_state()
+    results = run_suite(args.case or list(CASES), args.scale, args.repeat)
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": dirty,
+        "label": args.label,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if not args.no_save:
+        append_history(record, args.history)
+        print(f"Saved to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
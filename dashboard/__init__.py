@@ -0,0 +1 @@
+"""Shared Streamlit helpers used by the dashboard pages."""
@@ -0,0 +1,235 @@
+"""Cached chart rendering for the dashboard pages.
+
+Every chart is described by a plain dict ("spec") that holds the chart data
+and its styling. The spec is fingerprinted and rendered to PNG at most once;
+later reruns and other sessions get the cached image bytes back. Figures are
+built with ``matplotlib.figure.Figure`` instead of ``pyplot``, so they never
+enter pyplot's global figure registry and are freed as soon as the PNG is
+written.
+"""
+import hashlib
+import io
+import json
+import os
+
+import streamlit as st
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+from matplotlib_venn import venn2, venn2_circles
+
+# Upper bound for the number of rendered charts kept in memory (shared by all sessions)
+CHART_CACHE_MAX_ENTRIES = int(os.environ.get("CHART_CACHE_MAX_ENTRIES", "256"))
+
+# Same output settings st.pyplot uses, so cached charts look identical
+CHART_DPI = 200
+
+
+def chart_fingerprint(spec):
+    """Stable hash of a chart spec, used as the cache key"""
+    payload = json.dumps(spec, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _apply_font_sizes(ax, spec):
+    font_size = spec.get("font_size")
+    if font_size:
+        ax.set_ylabel(spec.get("ylabel", ""), fontsize=font_size)
+        ax.set_title(spec.get("title", ""), fontsize=font_size + 1)
+        ax.tick_params(axis="x", labelsize=font_size - 1, rotation=spec.get("xtick_rotation", 0))
+        ax.tick_params(axis="y", labelsize=font_size - 1)
+    else:
+        ax.set_ylabel(spec.get("ylabel", ""))
+        ax.set_title(spec.get("title", ""))
+        if spec.get("xtick_rotation"):
+            ax.tick_params(axis="x", rotation=spec["xtick_rotation"])
+
+
+def _draw_bar(fig, spec):
+    ax = fig.subplots()
+    labels = spec["labels"]
+    values = spec["values"]
+    bars = ax.bar(labels, values, width=spec.get("bar_width", 0.8), color=spec.get("colors"))
+    _apply_font_sizes(ax, spec)
+
+    if spec.get("ylim"):
+        ax.set_ylim(*spec["ylim"])
+
+    label_size = (spec.get("font_size") or 8) - 1
+    if spec.get("value_labels") == "percent":
+        for i, v in enumerate(values):
+            ax.text(i, v + 2, f"{v:.1f}%", ha="center", fontsize=label_size)
+    elif spec.get("value_labels") == "value":
+        for bar, v in zip(bars, values):
+            ax.annotate(f"{v}",
+                        xy=(bar.get_x() + bar.get_width() / 2, bar.get_height()),
+                        xytext=(0, 3),
+                        textcoords="offset points",
+                        ha="center", va="bottom",
+                        fontsize=label_size)
+
+
+def _draw_grouped_bar(fig, spec):
+    ax = fig.subplots()
+    series = spec["series"]
+    x = range(len(spec["labels"]))
+    width = spec.get("bar_width", 0.35)
+    offsets = [(i - (len(series) - 1) / 2) * width for i in range(len(series))]
+
+    for (name, values), offset in zip(series, offsets):
+        ax.bar([i + offset for i in x], values, width, label=name)
+        if spec.get("annotate_negative"):
+            for i, v in enumerate(values):
+                if v < 0:
+                    ax.text(i + offset, v - 10, f"{v:.1f}%", ha="center", fontsize=8)
+
+    _apply_font_sizes(ax, spec)
+    ax.set_xticks(list(x))
+    ax.set_xticklabels(spec["labels"])
+    ax.legend()
+
+    if spec.get("zero_line"):
+        ax.axhline(y=0, color="gray", linestyle="-", alpha=0.3)
+
+
+def _draw_venn2(fig, spec):
+    ax = fig.subplots()
+    subsets = tuple(spec["subsets"])
+    font_size = spec.get("font_size", 10)
+    venn = venn2(subsets=subsets, set_labels=tuple(spec["set_labels"]), ax=ax)
+
+    if venn:
+        for patch_id, color in (spec.get("colors") or {}).items():
+            patch = venn.get_patch_by_id(patch_id)
+            if patch:
+                patch.set_color(color)
+                patch.set_alpha(0.7)
+
+        if spec.get("outline"):
+            venn2_circles(subsets=subsets, linestyle="solid", linewidth=0.5, color="gray", ax=ax)
+
+        # Set labels show the full size of each set, subset labels show the region sizes
+        only_a, only_b, both = subsets
+        for label_id, text in (("A", only_a + both), ("B", only_b + both)):
+            label = venn.get_label_by_id(label_id)
+            if label:
+                label.set_text(f"{label.get_text()}\n({text})" if spec.get("show_set_sizes") else label.get_text())
+                label.set_fontsize(font_size)
+        for label in venn.subset_labels or []:
+            if label:
+                label.set_fontsize(font_size)
+
+    if spec.get("title"):
+        ax.set_title(spec["title"], fontsize=font_size)
+    ax.axis("off")
+
+
+def _draw_gantt(fig, spec):
+    ax = fig.subplots()
+    rows = spec["rows"]
+    colors = spec.get("colors") or {}
+    for row, start, duration, kind in spec["bars"]:
+        ax.broken_barh([(start, duration)], (row - 0.4, 0.8), facecolors=colors.get(kind, "gray"))
+    ax.set_yticks(range(len(rows)))
+    ax.set_yticklabels(rows, fontsize=spec.get("font_size", 8))
+    # Перший рядок зверху, як у таблиці
+    ax.set_ylim(len(rows) - 0.5, -0.5)
+    ax.set_xlabel(spec.get("xlabel", ""))
+    ax.set_title(spec.get("title", ""))
+    ax.grid(axis="x", alpha=0.3)
+    handles = [Patch(color=color, label=kind) for kind, color in colors.items()
+               if any(bar[3] == kind for bar in spec["bars"])]
+    if handles:
+        ax.legend(handles=handles, loc="upper right", fontsize=spec.get("font_size", 8))
+
+
+_DRAWERS = {
+    "bar": _draw_bar,
+    "grouped_bar": _draw_grouped_bar,
+    "venn2": _draw_venn2,
+    "gantt": _draw_gantt,
+}
+
+
+@st.cache_data(max_entries=CHART_CACHE_MAX_ENTRIES, show_spinner=False)
+def _render_png(fingerprint, _spec):
+    """Render a chart spec to PNG bytes (cached by fingerprint across sessions)"""
+    fig = Figure(figsize=tuple(_spec.get("figsize", (5, 3))))
+    _DRAWERS[_spec["kind"]](fig, _spec)
+    if _spec.get("tight_layout", True):
+        fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=CHART_DPI, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+def show_chart(spec, width="stretch"):
+    """Display a chart described by ``spec``, rendering it only if it is not cached yet"""
+    st.image(_render_png(chart_fingerprint(spec), spec), width=width)
+
+
+def bar_chart(labels, values, *, title="", ylabel="", colors=None, figsize=(5, 3),
+              font_size=None, xtick_rotation=0, ylim=None, value_labels=None,
+              bar_width=0.8, width="stretch"):
+    """Simple bar chart; ``value_labels`` can be "percent" or "value" to annotate the bars"""
+    show_chart({
+        "kind": "bar",
+        "labels": list(labels),
+        "values": list(values),
+        "title": title,
+        "ylabel": ylabel,
+        "colors": list(colors) if colors else None,
+        "figsize": list(figsize),
+        "font_size": font_size,
+        "xtick_rotation": xtick_rotation,
+        "ylim": list(ylim) if ylim else None,
+        "value_labels": value_labels,
+        "bar_width": bar_width,
+    }, width=width)
+
+
+def grouped_bar_chart(labels, series, *, title="", ylabel="", figsize=(10, 6),
+                      zero_line=False, annotate_negative=False, width="stretch"):
+    """Side-by-side bars; ``series`` is a list of (legend name, values) pairs"""
+    show_chart({
+        "kind": "grouped_bar",
+        "labels": list(labels),
+        "series": [[name, list(values)] for name, values in series],
+        "title": title,
+        "ylabel": ylabel,
+        "figsize": list(figsize),
+        "zero_line": zero_line,
+        "annotate_negative": annotate_negative,
+        "tight_layout": False,
+    }, width=width)
+
+
+def venn2_chart(subsets, set_labels, *, title=None, colors=None, outline=False,
+                show_set_sizes=False, font_size=10, figsize=(3, 3), width="stretch"):
+    """Two-set Venn diagram; ``subsets`` is (only A, only B, both)"""
+    show_chart({
+        "kind": "venn2",
+        "subsets": [int(s) for s in subsets],
+        "set_labels": list(set_labels),
+        "title": title,
+        "colors": colors,
+        "outline": outline,
+        "show_set_sizes": show_set_sizes,
+        "font_size": font_size,
+        "figsize": list(figsize),
+    }, width=width)
+
+
+def gantt_chart(rows, bars, *, colors=None, title="", xlabel="Seconds", figsize=(12, 6), font_size=8,
+                width="stretch"):
+    """Horizontal timeline; ``bars`` are (row index, start, duration, kind) and ``colors`` maps kinds to colors"""
+    show_chart({
+        "kind": "gantt",
+        "rows": list(rows),
+        "bars": [[int(row), float(start), float(duration), kind] for row, start, duration, kind in bars],
+        "colors": colors,
+        "title": title,
+        "xlabel": xlabel,
+        "figsize": list(figsize),
+        "font_size": font_size,
+    }, width=width)
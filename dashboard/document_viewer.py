@@ -0,0 +1,180 @@
+"""Paged viewer for large sample documents.
+
+Files are memory-mapped and indexed by line start offsets, so showing a page,
+jumping to a line or searching never reads the whole document into a Python
+string. The index is built once per file version and shared between sessions;
+only the latest version of each file stays open.
+"""
+import bisect
+import mmap
+import os
+import re
+import threading
+from array import array
+
+import streamlit as st
+
+LINES_PER_PAGE = 200
+MAX_SEARCH_HITS = 200
+# Minified HTML can put the whole document on one line, so pages are also capped by size
+MAX_PAGE_BYTES = 64 * 1024
+
+
+class MappedDocument:
+    """Read-only memory-mapped text file with a line offset index"""
+
+    def __init__(self, path, encoding="utf-8"):
+        self.path = path
+        self.encoding = encoding
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.version = (stat.st_mtime_ns, stat.st_size)
+        # mmap тримає власний дескриптор, тож файл можна закрити одразу
+        with open(path, "rb") as f:
+            # mmap refuses empty files, an empty bytes object behaves the same for our reads
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.offsets = self._build_line_index()
+
+    def _build_line_index(self):
+        offsets = array("Q", [0])
+        find = self._map.find
+        pos = find(b"\n")
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = find(b"\n", pos + 1)
+        # A trailing newline does not start another line
+        if len(offsets) > 1 and offsets[-1] == self.size:
+            offsets.pop()
+        if not self.size:
+            offsets.pop()
+        return offsets
+
+    @property
+    def line_count(self):
+        return len(self.offsets)
+
+    def _line_end(self, line):
+        return self.offsets[line] if line < len(self.offsets) else self.size
+
+    def read_lines(self, start, count, max_bytes=None):
+        """Return ``count`` lines starting at 0-based line ``start`` and whether they were cut at ``max_bytes``"""
+        if start >= self.line_count or count <= 0:
+            return "", False
+        begin = self.offsets[start]
+        end = self._line_end(min(start + count, self.line_count))
+        truncated = max_bytes is not None and end - begin > max_bytes
+        if truncated:
+            end = begin + max_bytes
+        return self._map[begin:end].decode(self.encoding, errors="replace"), truncated
+
+    def line_of_offset(self, offset):
+        """0-based line number that contains byte ``offset``"""
+        return max(0, bisect.bisect_right(self.offsets, offset) - 1)
+
+    def search(self, query, limit=MAX_SEARCH_HITS):
+        """Case-insensitive search; returns (line number, line text) pairs, one per matching line"""
+        if not query or not self.size:
+            return []
+        pattern = re.compile(re.escape(query.encode(self.encoding)), re.IGNORECASE)
+        hits = []
+        last_line = -1
+        for match in pattern.finditer(self._map):
+            line = self.line_of_offset(match.start())
+            if line == last_line:
+                continue
+            last_line = line
+            text, _ = self.read_lines(line, 1, max_bytes=1024)
+            hits.append((line, text.strip()))
+            if len(hits) >= limit:
+                break
+        return hits
+
+
+@st.cache_resource(show_spinner=False)
+def _open_documents():
+    # One entry per path: a new version replaces the old one, whose mapping is
+    # released as soon as no session still holds it
+    return {}, threading.Lock()
+
+
+def open_document(path):
+    stat = os.stat(path)
+    documents, lock = _open_documents()
+    with lock:
+        doc = documents.get(path)
+        if doc is None or doc.version != (stat.st_mtime_ns, stat.st_size):
+            doc = documents[path] = MappedDocument(path)
+    return doc
+
+
+def _set_line(line_key, line):
+    st.session_state[line_key] = line
+
+
+def _jump_to_hit(line_key, hit_key):
+    hit = st.session_state.get(hit_key)
+    if hit:
+        st.session_state[line_key] = int(hit.split(":", 1)[0].replace("Line", "").strip())
+
+
+def document_viewer(path, key, lines_per_page=LINES_PER_PAGE, height=400):
+    """Render a paged view of ``path`` with jump-to-line and in-document search"""
+    try:
+        doc = open_document(path)
+    except OSError as e:
+        st.error(f"Error loading file: {str(e)}")
+        return
+
+    if not doc.line_count:
+        st.info("The document is empty")
+        return
+
+    line_key = f"{key}_line"
+    hit_key = f"{key}_hit"
+    # The line is driven through session state (paging buttons and search hits set it)
+    st.session_state.setdefault(line_key, 1)
+    if st.session_state[line_key] > doc.line_count:
+        st.session_state[line_key] = doc.line_count
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        first_line = st.number_input("Go to line", min_value=1, max_value=doc.line_count,
+                                     step=1, key=line_key)
+    with col2:
+        query = st.text_input("Search in document", key=f"{key}_search")
+
+    if query:
+        hits = doc.search(query)
+        if hits:
+            suffix = "+" if len(hits) >= MAX_SEARCH_HITS else ""
+            st.selectbox(
+                f"Matching lines ({len(hits)}{suffix})",
+                [f"Line {line + 1}: {text[:120]}" for line, text in hits],
+                index=None,
+                key=hit_key,
+                on_change=_jump_to_hit,
+                args=(line_key, hit_key),
+            )
+        else:
+            st.caption("No matches")
+
+    start = int(first_line) - 1
+    last_line = min(start + lines_per_page, doc.line_count)
+    text, truncated = doc.read_lines(start, lines_per_page, max_bytes=MAX_PAGE_BYTES)
+    label = f"Lines {start + 1}–{last_line} of {doc.line_count} ({doc.size:,} bytes)"
+    if truncated:
+        label += f", page cut at {MAX_PAGE_BYTES // 1024} KB"
+    st.text_area(
+        label,
+        text,
+        height=height,
+        key=f"{key}_text_{start}",
+    )
+
+    prev_col, next_col, _ = st.columns([1, 1, 4])
+    with prev_col:
+        st.button("Previous page", key=f"{key}_prev", disabled=start == 0,
+                  on_click=_set_line, args=(line_key, max(1, start + 1 - lines_per_page)))
+    with next_col:
+        st.button("Next page", key=f"{key}_next", disabled=last_line >= doc.line_count,
+                  on_click=_set_line, args=(line_key, last_line + 1))
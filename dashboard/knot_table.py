@@ -0,0 +1,79 @@
+"""Paginated, searchable view of knot groups.
+
+Pages used to emit one expander (or markdown block) per knot group, which for
+large documents means thousands of Streamlit elements. ``knot_groups_table``
+filters and slices the groups on the server and sends a single table with
+only the visible page to the browser.
+"""
+import math
+
+import pandas as pd
+import streamlit as st
+
+DEFAULT_PAGE_SIZE = 25
+
+
+def filter_knot_groups(groups, query):
+    """Return (original index, group) pairs whose entities contain ``query`` (case-insensitive)"""
+    indexed = list(enumerate(groups))
+    query = (query or "").strip().lower()
+    if not query:
+        return indexed
+    return [(i, group) for i, group in indexed
+            if any(query in str(entity).lower() for entity in group)]
+
+
+def page_slice(items, page, page_size):
+    """Clamp ``page`` to the available range and return (items on that page, page, page count)"""
+    page_count = max(1, math.ceil(len(items) / page_size))
+    page = min(max(1, page), page_count)
+    start = (page - 1) * page_size
+    return items[start:start + page_size], page, page_count
+
+
+def knot_groups_table(groups, key, label="Section", page_size=DEFAULT_PAGE_SIZE):
+    """Render knot groups as one paginated table with a search box.
+
+    ``key`` must be unique on the page; it prefixes the widget keys so the same
+    component can be used in several tabs.
+    """
+    if not groups:
+        return
+
+    if len(groups) > page_size:
+        col_search, col_page = st.columns([3, 1])
+        with col_search:
+            query = st.text_input("Search entities", key=f"{key}_search",
+                                  placeholder="Filter groups by entity")
+        matches = filter_knot_groups(groups, query)
+        page_count = max(1, math.ceil(len(matches) / page_size))
+        # A narrower search can leave the stored page beyond the last one
+        page_key = f"{key}_page"
+        st.session_state.setdefault(page_key, 1)
+        if st.session_state[page_key] > page_count:
+            st.session_state[page_key] = page_count
+        with col_page:
+            page = st.number_input("Page", min_value=1, max_value=page_count,
+                                   step=1, key=page_key)
+    else:
+        matches = filter_knot_groups(groups, "")
+        page = 1
+
+    visible, page, page_count = page_slice(matches, int(page), page_size)
+
+    if not visible:
+        st.info("No groups match the search")
+        return
+
+    first = (page - 1) * page_size + 1
+    shown = f"{label}s {first}–{first + len(visible) - 1} of {len(matches)}"
+    if len(matches) != len(groups):
+        shown += f" (filtered from {len(groups)})"
+    st.caption(shown)
+
+    table = pd.DataFrame({
+        label: [f"{label} {i + 1}" for i, _ in visible],
+        "Count": [len(group) for _, group in visible],
+        "Entities": [", ".join(str(entity) for entity in group) for _, group in visible],
+    })
+    st.dataframe(table, hide_index=True, width="stretch")
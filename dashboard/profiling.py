@@ -0,0 +1,173 @@
+"""Opt-in section timers for the dashboard pages.
+
+A page runs its body inside a profiler right after ``st.set_page_config`` and
+marks the start of each logical block::
+
+    with page_profiler("file_comparison") as profiler:
+        profiler.section("load")
+        ...
+        profiler.section("metrics")
+        ...
+
+Each ``section`` call closes the previous one, so blocks inside the tab loops
+are summed per name. Leaving the block calls ``finish``, also when the page
+raises or calls ``st.stop()``: it shows the timings in the sidebar and appends
+one JSON line per rerun to the trace file; ``python -m pipeline.profile_report``
+summarizes that file per release.
+
+Profiling is off unless the page is opened with ``?profile=1`` or the server
+runs with ``DASHBOARD_PROFILE=1``; when off every call is a no-op.
+Allocation counters use ``tracemalloc``, which slows the whole process down
+while a profiled rerun is in progress. Its counters are process-wide: while
+other sessions run at the same time, a section's allocation and peak include
+theirs.
+"""
+import json
+import os
+import subprocess
+import threading
+import time
+import tracemalloc
+import weakref
+
+import pandas as pd
+import streamlit as st
+
+TRACE_FILE = os.environ.get("DASHBOARD_PROFILE_TRACE", os.path.join("profiles", "page_timings.jsonl"))
+
+# Profilers of reruns in progress; a rerun stopped by st.stop() drops out when collected
+_active_profilers = weakref.WeakSet()
+_tracemalloc_lock = threading.Lock()
+_release = None
+
+
+def profiling_enabled():
+    if os.environ.get("DASHBOARD_PROFILE") == "1":
+        return True
+    return st.query_params.get("profile") == "1"
+
+
+def current_release():
+    """``DASHBOARD_RELEASE`` if set, otherwise the short git commit"""
+    global _release
+    if _release is None:
+        _release = os.environ.get("DASHBOARD_RELEASE")
+        if not _release:
+            try:
+                _release = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                          text=True, timeout=5).stdout.strip() or "unknown"
+            except (OSError, subprocess.SubprocessError):
+                _release = "unknown"
+    return _release
+
+
+def _start_tracemalloc(profiler):
+    with _tracemalloc_lock:
+        _active_profilers.add(profiler)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def _stop_tracemalloc(profiler):
+    with _tracemalloc_lock:
+        _active_profilers.discard(profiler)
+        if not _active_profilers and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+class _NullProfiler:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def section(self, name):
+        pass
+
+    def finish(self, show=True):
+        pass
+
+
+class PageProfiler:
+    """Lap timer with per-section wall time, net allocation and peak allocation (process-wide); a context manager"""
+
+    def __init__(self, page):
+        self.page = page
+        self.sections = {}
+        self._current = None
+        self._finished = False
+        _start_tracemalloc(self)
+        self._page_start = time.perf_counter()
+
+    def _close_current(self):
+        if self._current is None:
+            return
+        name, start, start_memory = self._current
+        elapsed = time.perf_counter() - start
+        memory, peak = tracemalloc.get_traced_memory()
+        stats = self.sections.setdefault(name, {"calls": 0, "ms": 0.0, "alloc_kb": 0.0, "peak_kb": 0.0})
+        stats["calls"] += 1
+        stats["ms"] += elapsed * 1000
+        stats["alloc_kb"] += (memory - start_memory) / 1024
+        stats["peak_kb"] = max(stats["peak_kb"], (peak - start_memory) / 1024)
+        self._current = None
+
+    def section(self, name):
+        """Close the running section and start timing ``name``"""
+        self._close_current()
+        tracemalloc.reset_peak()
+        self._current = (name, time.perf_counter(), tracemalloc.get_traced_memory()[0])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Після помилки чи st.stop() трасування все одно вимикається; таблицю малюємо лише для повного rerun
+        self.finish(show=exc_type is None)
+        return False
+
+    def finish(self, show=True):
+        if self._finished:
+            return
+        self._finished = True
+        try:
+            self._close_current()
+        finally:
+            _stop_tracemalloc(self)
+        total_ms = (time.perf_counter() - self._page_start) * 1000
+
+        record = {
+            "ts": time.time(),
+            "release": current_release(),
+            "page": self.page,
+            "total_ms": round(total_ms, 2),
+            "sections": [{"name": name, **{k: round(v, 2) for k, v in stats.items()}}
+                         for name, stats in self.sections.items()],
+        }
+        try:
+            os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            if show:
+                st.sidebar.warning(f"Could not write profile trace: {str(e)}")
+        if not show:
+            return
+
+        with st.sidebar.expander("Profile", expanded=True):
+            st.caption(f"Rerun {total_ms:.0f} ms · release {record['release']}")
+            table = pd.DataFrame([
+                {"Section": name, "Calls": stats["calls"], "ms": round(stats["ms"], 1),
+                 "Process Alloc KB": round(stats["alloc_kb"]), "Process Peak KB": round(stats["peak_kb"])}
+                for name, stats in self.sections.items()
+            ])
+            st.dataframe(table, hide_index=True, width="stretch")
+            st.caption("Allocation and peak are process-wide: they include other sessions running at the same time.")
+
+
+def page_profiler(page):
+    """A ``PageProfiler`` when profiling is enabled, otherwise a no-op stand-in"""
+    if profiling_enabled():
+        return PageProfiler(page)
+    return _NullProfiler()
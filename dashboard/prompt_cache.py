@@ -0,0 +1,49 @@
+"""Effective cost of the stored runs with prompt prefix caching.
+
+Runs made by ``pipeline.runner`` record the cached input tokens; for the
+others ``pipeline.prompt_cache`` projects an upper bound of the saving.
+"""
+import pandas as pd
+import streamlit as st
+
+from dashboard.shared_cache import get_shared_cache, results_index
+from pipeline.prompt_cache import MIN_PREFIX_TOKENS, cache_summary, project_cached_tokens
+from pipeline.results_index import results_fingerprint
+
+
+def cached_calls():
+    """Call records with cached tokens and effective cost. Do not mutate."""
+    key = ("prompt_cache", results_fingerprint())
+    return get_shared_cache().get(key, lambda: project_cached_tokens(results_index()))
+
+
+def prompt_cache_panel(run_sets, key="prompt_cache"):
+    """Recorded cost against the cost with prefix caching, per approach of the given run sets
+
+    ``run_sets`` are results file paths, or ``results/real_file``-style
+    directories of per-document results.
+    """
+    calls = cached_calls()
+    calls = calls[calls["run_set"].isin(run_sets)]
+    if calls.empty:
+        st.info("No stored runs to show.")
+        return
+    summary = cache_summary(calls)
+    display = pd.DataFrame({
+        "Results": summary["run_set"],
+        "Approach": summary["approach"],
+        "Calls": summary["calls"],
+        "Input Tokens": summary["input_tokens"],
+        "Cached Tokens": summary["cached_input_tokens"].astype(int),
+        "Cost ($)": summary["cost"].map(lambda c: f"${c:.6f}"),
+        "With Caching ($)": [f"≥ ${cost:.6f}" if projected else f"${cost:.6f}"
+                             for cost, projected in zip(summary["effective_cost"], summary["projected"])],
+        "Saving": [(f"≤ {saving:.0%}" if projected else f"{saving:.0%}") if saving > 0 else ""
+                   for saving, projected in zip(summary["saving"], summary["projected"])],
+        "Source": summary["projected"].map(lambda p: "upper bound" if p else "recorded"),
+    })
+    st.dataframe(display, hide_index=True, width="stretch", key=f"{key}_table")
+    st.caption(f"Upper bound: the stored runs did not record cache hits, so every call after the first of a stage "
+               f"is assumed to read the stage's smallest input from the cache (from {MIN_PREFIX_TOKENS:,} tokens "
+               f"up). That input includes a document, so the saving is at most the one shown. Recorded: cached "
+               f"tokens reported by the provider during `pipeline.runner` runs.")
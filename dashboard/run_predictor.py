@@ -0,0 +1,88 @@
+"""What-if panel: predicted tokens, time and cost of a document before it is run.
+
+The models are fitted on the stored runs (``pipeline.predictor``) and shared
+across sessions through the shared cache; they are refitted whenever a
+results file changes.
+"""
+import os
+
+import pandas as pd
+import streamlit as st
+
+from dashboard.charts import bar_chart
+from dashboard.shared_cache import get_shared_cache, results_index
+from pipeline.predictor import DEFAULT_THRESHOLDS, RunPredictor
+from pipeline.results_index import results_fingerprint
+
+
+def run_predictor():
+    """``RunPredictor`` fitted on the results index. Do not mutate."""
+    key = ("run_predictor", results_fingerprint())
+    return get_shared_cache().get(key, lambda: RunPredictor.fit(results_index()))
+
+
+def _document_tokens(predictor, documents, key):
+    source = st.radio("Document", ["Sample", "Pasted text", "Size in tokens"], horizontal=True,
+                      key=f"{key}_source")
+    if source == "Sample":
+        available = [document for document in documents if os.path.exists(document["path"])]
+        if not available:
+            st.warning("No sample documents found.")
+            return None
+        document = st.selectbox("Sample document", available, format_func=lambda d: d["name"], key=f"{key}_sample")
+        with open(document["path"], "r", encoding="utf-8", errors="replace") as f:
+            return predictor.document_tokens(f.read())
+    if source == "Pasted text":
+        return predictor.document_tokens(st.text_area("Document text", height=150, key=f"{key}_text")) or None
+    return st.number_input("Document tokens", min_value=1, value=50000, step=1000, key=f"{key}_tokens")
+
+
+def what_if_panel(documents, key="what_if"):
+    """Predicted metrics of every approach and chunking threshold for one document
+
+    ``documents`` is a list of ``{"name", "path"}`` dicts offered as samples;
+    ``key`` prefixes the widget keys.
+    """
+    predictor = run_predictor()
+    if not predictor.approaches:
+        st.info("No stored runs with a document size and chunking threshold to fit on.")
+        return
+
+    document_tokens = _document_tokens(predictor, documents, key)
+    thresholds = st.multiselect("Chunking thresholds", [8000, 16000, 32000, 64000, 128000],
+                                default=list(DEFAULT_THRESHOLDS), key=f"{key}_thresholds")
+    if not document_tokens or not thresholds:
+        return
+
+    table = predictor.what_if(document_tokens, sorted(thresholds))
+    st.caption(f"~{document_tokens:,} document tokens ({predictor.chars_per_token:.1f} characters per token, "
+               f"calibrated on the samples)")
+    labels = [f"{row.approach} {row.chunking_threshold // 1000}k" for row in table.itertuples()]
+    display = pd.DataFrame({
+        "Approach": table["approach"],
+        "Threshold": table["chunking_threshold"].map(lambda t: f"{t // 1000}k"),
+        "Chunks": table["chunks"],
+        "Input Tokens": table["input_tokens"],
+        "Output Tokens": table["output_tokens"],
+        "Time (s)": table["execution_time"].round(1),
+        "Cost ($)": table["cost"].map(lambda c: f"${c:.4f}"),
+        "Extrapolated": table["extrapolated"].map(lambda e: "yes" if e else ""),
+    })
+    st.dataframe(display, hide_index=True, width="stretch")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        bar_chart(labels, table["execution_time"].round(1).tolist(), title="Predicted execution time",
+                  ylabel="Seconds", figsize=(6, 4), xtick_rotation=30)
+    with col2:
+        bar_chart(labels, table["cost"].round(5).tolist(), title="Predicted cost", ylabel="USD", figsize=(6, 4),
+                  xtick_rotation=30)
+
+    with st.expander("Fitted models"):
+        summary = predictor.summary(results_index())
+        summary["error"] = summary["error"].map(lambda e: f"{e:.0%}")
+        st.dataframe(summary.rename(columns={"model": "Model", "detail": "Fit", "runs": "Runs",
+                                             "error": "Median error"}),
+                     hide_index=True, width="stretch")
+        st.caption("Errors are measured on the runs the models were fitted on. Thresholds outside the recorded "
+                   "range are extrapolated.")
@@ -0,0 +1,146 @@
+"""Process-wide, read-only cache for parsed results shared by every session.
+
+``st.cache_data`` pickles the return value and hands each call its own copy,
+so every page in every browser session held its own copy of the same
+multi-MB results. ``SharedCache`` keeps exactly one parsed object per
+dataset (keyed by path and mtime), bounded by a global memory budget with LRU
+eviction, and returns the cached object itself.
+
+Values are shared between sessions: callers must treat them as read-only and
+copy anything they want to modify.
+"""
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from pipeline.results_index import build_results_index, results_fingerprint, RECORD_COLUMNS
+
+DEFAULT_BUDGET_MB = int(os.environ.get("SHARED_CACHE_BUDGET_MB", "512"))
+
+
+def estimate_size(obj):
+    """Approximate in-memory size of a parsed JSON structure (or DataFrame) in bytes"""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    size = 0
+    seen = set()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return size
+
+
+class SharedCache:
+    """Thread-safe LRU cache with a byte budget and hit/miss/eviction counters"""
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, loader):
+        """Return the cached value for ``key``, calling ``loader()`` once on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            # Sessions asking for the same dataset at once share a single load
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key][0]
+            try:
+                value = loader()
+            except BaseException:
+                # A failed load must not leave its lock behind for the next attempt
+                with self._lock:
+                    self._loading.pop(key, None)
+                raise
+            size = estimate_size(value)
+            with self._lock:
+                self._loading.pop(key, None)
+                if size <= self.budget_bytes:
+                    self._entries[key] = (value, size)
+                    self.used_bytes += size
+                    self._evict()
+            return value
+
+    def _evict(self):
+        while self.used_bytes > self.budget_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.used_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.used_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "used_mb": self.used_bytes / 1024 / 1024,
+                "budget_mb": self.budget_bytes / 1024 / 1024,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+@st.cache_resource
+def get_shared_cache():
+    return SharedCache(DEFAULT_BUDGET_MB * 1024 * 1024)
+
+
+def _read_json(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_json(file_path):
+    """Parsed JSON file shared across sessions; reloaded when the file changes. Do not mutate."""
+    key = ("json", os.path.abspath(file_path), os.path.getmtime(file_path))
+    return get_shared_cache().get(key, lambda: _read_json(file_path))
+
+
+def results_index():
+    """Normalized run records for all of ``results/`` as a DataFrame. Do not mutate."""
+    key = ("results_index", results_fingerprint())
+    return get_shared_cache().get(
+        key, lambda: pd.DataFrame(build_results_index(), columns=RECORD_COLUMNS))
+
+
+def cache_stats_sidebar():
+    """Small sidebar panel with the shared cache counters"""
+    stats = get_shared_cache().stats()
+    with st.sidebar.expander("Shared cache"):
+        st.caption(f"{stats['entries']} datasets, {stats['used_mb']:.1f} / {stats['budget_mb']:.0f} MB")
+        st.caption(f"Hits {stats['hits']} · misses {stats['misses']} · "
+                   f"evictions {stats['evictions']} · hit rate {stats['hit_rate']:.0%}")
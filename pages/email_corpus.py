@@ -0,0 +1,176 @@
+import streamlit as st
+import pandas as pd
+from dashboard.profiling import page_profiler
+from pipeline import corpus
+from pipeline.search_index import build_index
+
+st.set_page_config(
+    page_title="Email Corpus",
+    page_icon="📬",
+    layout="wide"
+)
+
+with page_profiler("email_corpus") as profiler:
+    PAGE_SIZE = 50
+    RAW_PREVIEW_BYTES = 20000
+
+    st.title("Email Corpus Analysis")
+    st.markdown("""
+    Analyze whole mailboxes instead of individual examples. Emails are ingested from an mbox file or a directory of
+    `.eml` files into a local SQLite store (`indexes/corpus.sqlite`); everything below is computed with SQL queries,
+    so the page stays fast with thousands of emails.
+
+    The **local** analyzer does not call a model, so its tokens and cost are **projections** from the email size
+    (fitted on the optimized combined prompt) and its entities are candidates (addresses, web domains and capitalized
+    names). The **model** analyzer runs every email through the pipeline's combined prompt and stores measured tokens,
+    cost and latency; it calls the model, so it runs from the command line:
+    `python -m pipeline.corpus analyze --analyzer model --backend openai`.
+
+    The sidebar ingests mailboxes from the corpus directory (`CORPUS_MAIL_DIR`, `mail/` by default). Anything else,
+    and large mailboxes, are ingested from the command line: `python -m pipeline.corpus ingest PATH`.
+    """)
+
+    # З'єднання на кожен rerun: SQLite відкривається швидко, а сесії не ділять один курсор
+    conn = corpus.connect(corpus.CORPUS_DB)
+
+    with st.sidebar:
+        st.subheader("Corpus")
+        # Лише скриньки з каталогу корпусу: сторінка не повинна читати довільні файли сервера
+        mailbox_path = st.selectbox("Mailbox", corpus.mailboxes(), index=None,
+                                    help=f"Mailboxes and .eml directories in {corpus.CORPUS_MAIL_DIR}/")
+        if st.button("Ingest", disabled=not mailbox_path):
+            progress_text = st.empty()
+            with st.spinner("Ingesting emails..."):
+                seen, inserted = corpus.ingest(
+                    conn, mailbox_path,
+                    progress=lambda seen, inserted: progress_text.caption(f"{seen} read, {inserted} new"))
+            progress_text.caption(f"{seen} emails read, {inserted} new")
+            if inserted:
+                build_index()
+        analyzer = st.selectbox("Analyzer", sorted(set(corpus.ANALYZERS) | set(corpus.analyzers_in_store(conn))))
+        if analyzer in corpus.MODEL_ANALYZERS:
+            st.caption(f"`{analyzer}` calls the model: `python -m pipeline.corpus analyze --analyzer {analyzer}`")
+        if st.button("Analyze new emails",
+                     disabled=analyzer not in corpus.ANALYZERS or analyzer in corpus.MODEL_ANALYZERS):
+            with st.spinner(f"Analyzing with '{analyzer}'..."):
+                done = corpus.analyze(conn, analyzer)
+            st.caption(f"{done} emails analyzed")
+
+    profiler.section("load")
+    summary = corpus.corpus_summary(conn, analyzer)
+    documents_df = corpus.list_documents(conn)
+    emails_tab, documents_tab = st.tabs([f"Emails ({summary['emails']:,})", f"Documents ({len(documents_df):,})"])
+
+    with emails_tab:
+        if not summary["emails"]:
+            st.info("No emails yet. Ingest an mbox file or a directory of .eml files from the sidebar "
+                    "or run `python -m pipeline.preprocess emails PATH`.")
+        else:
+            profiler.section("metrics")
+            col1, col2, col3, col4, col5 = st.columns(5)
+            col1.metric("Emails", f"{summary['emails']:,}")
+            col2.metric("Sender Domains", f"{summary['domains']:,}")
+            col3.metric("Corpus Size", f"{summary['size_bytes'] / 1024 / 1024:.1f} MB")
+            col4.metric("Analyzed", f"{summary['analyzed']:,}")
+            col5.metric("Total Cost" if analyzer in corpus.MODEL_ANALYZERS else "Projected Cost",
+                        f"${summary['cost']:.2f}")
+
+            if summary["analyzed"]:
+                st.header("Tokens and Cost")
+                avg_cost = summary["cost"] / summary["analyzed"]
+                st.caption(f"Average ${avg_cost:.6f} and {summary['tokens'] / summary['analyzed']:,.0f} tokens per email "
+                           f"with '{analyzer}'")
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.subheader("Input Tokens per Email")
+                    tokens_hist = corpus.histogram(conn, "input_tokens", 1000, analyzer)
+                    st.bar_chart(tokens_hist.set_index("bucket")["emails"])
+                with col2:
+                    st.subheader("Email Size (KB)")
+                    size_hist = corpus.histogram(conn, "size_bytes", 10240)
+                    size_hist["bucket"] = size_hist["bucket"] // 1024
+                    st.bar_chart(size_hist.set_index("bucket")["emails"])
+
+                profiler.section("entities")
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.subheader("Top Entities")
+                    st.dataframe(corpus.top_entities(conn, analyzer, limit=30), hide_index=True, width="stretch")
+                with col2:
+                    st.subheader("Cost by Sender Domain")
+                    domains_df = corpus.cost_by_domain(conn, analyzer, limit=30)
+                    domains_df["cost"] = domains_df["cost"].map(lambda x: f"${x:.4f}")
+                    domains_df["avg_cost"] = domains_df["avg_cost"].map(lambda x: f"${x:.6f}")
+                    st.dataframe(domains_df, hide_index=True, width="stretch")
+            else:
+                st.info(f"No emails have been analyzed with '{analyzer}' yet.")
+
+            profiler.section("browse")
+            st.header("Browse Emails")
+            col1, col2 = st.columns([3, 2])
+            with col1:
+                query = st.text_input("Subject or sender contains")
+            with col2:
+                domain = st.text_input("Sender domain", placeholder="example.com")
+
+            total = corpus.count_emails(conn, query or None, domain or None)
+            pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+            emails_df = corpus.list_emails(conn, query or None, domain or None, offset=(page - 1) * PAGE_SIZE, limit=PAGE_SIZE)
+            st.caption(f"{total:,} matching emails")
+            st.dataframe(emails_df, hide_index=True, width="stretch")
+
+            if not emails_df.empty:
+                email_id = st.selectbox(
+                    "Open email", emails_df["id"].tolist(),
+                    format_func=lambda i: f"#{i} {emails_df.loc[emails_df['id'] == i, 'subject'].iloc[0][:100]}")
+                email_data = corpus.get_email(conn, int(email_id))
+
+                st.subheader(email_data["subject"] or "(no subject)")
+                st.caption(f"From {email_data['sender']} · {email_data['date']} · {email_data['size_bytes'] / 1024:.1f} KB · "
+                           f"{email_data['attachments']} attachments")
+                if email_data["estimated_tokens"] is not None:
+                    st.caption(f"{email_data['parts']} MIME parts · {email_data['text_chars']:,} characters of text · "
+                               f"~{email_data['estimated_tokens']:,} tokens · "
+                               f"{email_data['skipped_bytes'] / 1024:.1f} KB of non-text parts skipped")
+
+                text_tab, analysis_tab, raw_tab = st.tabs(["Text View", "Analysis", "Raw Email"])
+                with text_tab:
+                    st.text_area("Content", email_data["text"], height=400)
+                with analysis_tab:
+                    if email_data["analyses"]:
+                        st.dataframe(pd.DataFrame(email_data["analyses"]).drop(columns=["result"]), hide_index=True, width="stretch")
+                        for analyzer_name, entities in email_data["entities"].items():
+                            st.markdown(f"**Entities ({analyzer_name})**: " + ", ".join(entities))
+                    else:
+                        st.info("This email has not been analyzed yet.")
+                with raw_tab:
+                    if not corpus.in_mail_dir(email_data["source"]):
+                        st.info(f"The raw email is only shown for mailboxes in {corpus.CORPUS_MAIL_DIR}/.")
+                    else:
+                        try:
+                            raw = corpus.raw_email(email_data, RAW_PREVIEW_BYTES)
+                            truncated = email_data["length"] > RAW_PREVIEW_BYTES
+                            st.text_area("Raw Email", raw.decode("utf-8", errors="replace") + ("..." if truncated else ""), height=400)
+                        except OSError as e:
+                            st.warning(f"The original mailbox is not available: {str(e)}")
+
+
+    profiler.section("documents")
+    with documents_tab:
+        if documents_df.empty:
+            st.info("No documents yet. Run `python -m pipeline.preprocess files samples` to extract the text of "
+                    "the sample files.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Documents", f"{len(documents_df):,}")
+            col2.metric("Total Size", f"{documents_df['size_bytes'].sum() / 1024 / 1024:.1f} MB")
+            col3.metric("Estimated Tokens", f"{documents_df['estimated_tokens'].sum():,}")
+            st.dataframe(documents_df.drop(columns=["id"]), hide_index=True, width="stretch")
+            document_id = st.selectbox(
+                "Open document", documents_df["id"].tolist(),
+                format_func=lambda i: documents_df.loc[documents_df["id"] == i, "name"].iloc[0])
+            document = corpus.get_document(conn, int(document_id))
+            st.caption(f"{document['source']} · {document['words']:,} words · "
+                       f"~{document['estimated_tokens']:,} tokens")
+            st.text_area("Preprocessed Text", document["text"][:RAW_PREVIEW_BYTES], height=400)
@@ -1,10 +1,14 @@
 import streamlit as st
-import json
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib_venn import venn2
 import os
 from typing import Dict, Any
+from dashboard.shared_cache import load_json, cache_stats_sidebar
+from dashboard.profiling import page_profiler
+from dashboard.charts import grouped_bar_chart, venn2_chart
+from dashboard.document_viewer import document_viewer
+from dashboard.knot_table import knot_groups_table
+from dashboard.run_predictor import what_if_panel
+from pipeline.parsing import extract_topics, extract_knots_from_json_blocks, add_file_entities, common_entities_in_same_file
 
 st.set_page_config(
     page_title="File Comparison",
@@ -12,772 +16,559 @@ st.set_page_config(
     layout="wide"
 )
 
-st.title("File Chunks Comparison")
-st.markdown("""
-This dashboard visualizes the analysis of file chunks, showing entities and topics extracted from different parts of the document.
+with page_profiler("file_comparison") as profiler:
+    st.title("File Chunks Comparison")
+    st.markdown("""
+    This dashboard visualizes the analysis of file chunks, showing entities and topics extracted from different parts of the document.
 
-**Separate Approach**: Processes the document using multiple prompts sequentially (legacy approach). Each chunk is analyzed independently with limited context awareness. This approach did not utilize topics extraction
+    **Separate Approach**: Processes the document using multiple prompts sequentially (legacy approach). Each chunk is analyzed independently with limited context awareness. This approach did not utilize topics extraction
 
-**Combined Approach**: Processes the entire document using a single comprehensive prompt, maintaining full context and relationships between different parts of the document.
+    **Combined Approach**: Processes the entire document using a single comprehensive prompt, maintaining full context and relationships between different parts of the document.
 
             
-The file comparison tabs show results for different context window sizes (16K and 32K tokens), allowing comparison of how increasing context affects analysis quality and performance.
+    The file comparison tabs show results for different context window sizes (16K and 32K tokens), allowing comparison of how increasing context affects analysis quality and performance.
 
-**Test Documents:**
-- **File 1**: ~112,607 tokens
-- **File 2**: ~3,440 tokens
-- **File 3**: ~56,347 tokens
+    **Test Documents:**
+    - **File 1**: ~112,607 tokens
+    - **File 2**: ~3,440 tokens
+    - **File 3**: ~56,347 tokens
             
-            """)
-
-# Define available comparison files
-comparison_files = {
-    "File Comparison 1 (16k tokens)": "results/file_comparison_1_v16_.json",
-    "File Comparison 1 (32k tokens)": "results/file_comparison_1_v32.json",
-    "File Comparison 2": "results/file_comparison_2_.json",
-    "File Comparison 3(16k tokens)": "results/file_comparison_3_v16.json",
-    "File Comparison 3(32k tokens)": "results/file_comparison_3_v32.json",
-}
-
-# Create data structures to store aggregated information from all files
-all_separate_metrics = {}
-all_combined_metrics = {}
-all_separate_entities_dict = {}  # Словник для підрахунку кількості входжень кожної сутності (ключ - сутність в нижньому регістрі, значення - [кількість, [оригінальні варіанти]])
-all_combined_entities_dict = {} 
-all_separate_topics = []
-all_combined_topics = []
-all_common_entities_dict = {}
-
-# Словники для відстеження сутностей за файлами (ключ - сутність в нижньому регістрі, значення - набір файлів, де вона зустрічається)
-separate_entities_by_file = {}  # {entity_lower: {file1, file2, ...}}
-combined_entities_by_file = {}  # {entity_lower: {file1, file2, ...}}
-
-# Create a selector for comparison files
-comparison_tabs = st.tabs(list(comparison_files.keys()))
-
-# Load the selected comparison data
-@st.cache_data
-def load_file_data(file_path):
-    try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            return json.load(file)
-    except Exception as e:
-        st.error(f"Error loading comparison data: {str(e)}")
-        return None
-
-for tab_name, tab in zip(comparison_files.keys(), comparison_tabs):
-    with tab:
-        # Load the data for this tab
-        data = load_file_data(comparison_files[tab_name])
+                """)
+
+    # Define available comparison files
+    comparison_files = {
+        "File Comparison 1 (16k tokens)": "results/file_comparison_1_v16_.json",
+        "File Comparison 1 (32k tokens)": "results/file_comparison_1_v32.json",
+        "File Comparison 2": "results/file_comparison_2_.json",
+        "File Comparison 3(16k tokens)": "results/file_comparison_3_v16.json",
+        "File Comparison 3(32k tokens)": "results/file_comparison_3_v32.json",
+    }
+
+    # Create data structures to store aggregated information from all files
+    all_separate_metrics = {}
+    all_combined_metrics = {}
+    all_separate_entities_dict = {}  # Словник для підрахунку кількості входжень кожної сутності (ключ - сутність в нижньому регістрі, значення - [кількість, [оригінальні варіанти]])
+    all_combined_entities_dict = {} 
+    all_separate_topics = []
+    all_combined_topics = []
+    all_common_entities_dict = {}
+
+    # Словники для відстеження сутностей за файлами (ключ - сутність в нижньому регістрі, значення - набір файлів, де вона зустрічається)
+    separate_entities_by_file = {}  # {entity_lower: {file1, file2, ...}}
+    combined_entities_by_file = {}  # {entity_lower: {file1, file2, ...}}
+
+    # Create a selector for comparison files
+    comparison_tabs = st.tabs(list(comparison_files.keys()))
+
+    # Load the selected comparison data
+    def load_file_data(file_path):
+        # Спільний кеш між сесіями: дані тільки для читання
+        try:
+            return load_json(file_path)
+        except Exception as e:
+            st.error(f"Error loading comparison data: {str(e)}")
+            return None
+
+    for tab_name, tab in zip(comparison_files.keys(), comparison_tabs):
+        with tab:
+            profiler.section("load")
+            # Load the data for this tab
+            data = load_file_data(comparison_files[tab_name])
         
-        # Only proceed if data was loaded successfully
-        if data:
-            st.subheader(f"Execution Metrics - {tab_name}")
+            # Only proceed if data was loaded successfully
+            if data:
+                profiler.section("metrics")
+                st.subheader(f"Execution Metrics - {tab_name}")
             
-            # Get metrics
-            separate_metrics = data["separate_approach"]["metrics"]
-            combined_metrics = data["combined_approach"]["metrics"]
+                # Get metrics
+                separate_metrics = data["separate_approach"]["metrics"]
+                combined_metrics = data["combined_approach"]["metrics"]
             
-            # Calculate differences
-            time_difference = separate_metrics["execution_time"] - combined_metrics["execution_time"]
-            time_difference_percentage = (time_difference / separate_metrics["execution_time"]) * 100
+                # Calculate differences
+                time_difference = separate_metrics["execution_time"] - combined_metrics["execution_time"]
+                time_difference_percentage = (time_difference / separate_metrics["execution_time"]) * 100
             
-            cost_difference = separate_metrics["cost"] - combined_metrics["cost"]
-            cost_difference_percentage = (cost_difference / separate_metrics["cost"]) * 100
+                cost_difference = separate_metrics["cost"] - combined_metrics["cost"]
+                cost_difference_percentage = (cost_difference / separate_metrics["cost"]) * 100
             
-            tokens_difference = separate_metrics["total_tokens"] - combined_metrics["total_tokens"]
-            tokens_difference_percentage = (tokens_difference / separate_metrics["total_tokens"]) * 100
+                tokens_difference = separate_metrics["total_tokens"] - combined_metrics["total_tokens"]
+                tokens_difference_percentage = (tokens_difference / separate_metrics["total_tokens"]) * 100
 
-            separate_entities = set(data["separate_approach"]["knots"])
-            combined_entities = set(data["combined_approach"]["knots"])
-            
-            # Зберігаємо метрики та сутності для загального підсумку
-            all_separate_metrics[tab_name] = separate_metrics
-            all_combined_metrics[tab_name] = combined_metrics
-            
-            # Додаємо унікальні сутності з поточного файлу до загальних словників (case-insensitive)
-            for entity in separate_entities:
-                entity_lower = entity.lower()
-                if entity_lower in all_separate_entities_dict:
-                    all_separate_entities_dict[entity_lower][0] += 1
-                    # Додаємо оригінальну сутність до списку варіантів написання
-                    if entity not in all_separate_entities_dict[entity_lower][1]:
-                        all_separate_entities_dict[entity_lower][1].append(entity)
-                else:
-                    all_separate_entities_dict[entity_lower] = [1, [entity]]  # [кількість, [оригінальні варіанти]]
-                
-                # Відстежуємо, в яких файлах зустрічається ця сутність
-                if entity_lower not in separate_entities_by_file:
-                    separate_entities_by_file[entity_lower] = set()
-                separate_entities_by_file[entity_lower].add(tab_name)
+                separate_entities = set(data["separate_approach"]["knots"])
+                combined_entities = set(data["combined_approach"]["knots"])
             
-            for entity in combined_entities:
-                entity_lower = entity.lower()
-                if entity_lower in all_combined_entities_dict:
-                    all_combined_entities_dict[entity_lower][0] += 1
-                    # Додаємо оригінальну сутність до списку варіантів написання
-                    if entity not in all_combined_entities_dict[entity_lower][1]:
-                        all_combined_entities_dict[entity_lower][1].append(entity)
-                else:
-                    all_combined_entities_dict[entity_lower] = [1, [entity]]  # [кількість, [оригінальні варіанти]]
-                
-                # Відстежуємо, в яких файлах зустрічається ця сутність
-                if entity_lower not in combined_entities_by_file:
-                    combined_entities_by_file[entity_lower] = set()
-                combined_entities_by_file[entity_lower].add(tab_name)
+                # Зберігаємо метрики та сутності для загального підсумку
+                all_separate_metrics[tab_name] = separate_metrics
+                all_combined_metrics[tab_name] = combined_metrics
             
+                # Додаємо унікальні сутності з поточного файлу до загальних словників (case-insensitive)
+                add_file_entities(separate_entities, tab_name, all_separate_entities_dict, separate_entities_by_file)
+                add_file_entities(combined_entities, tab_name, all_combined_entities_dict, combined_entities_by_file)
 
+                col1, col2, col3 = st.columns(3)
 
-            col1, col2, col3 = st.columns(3)
-
-            with col1:
-                st.markdown("""
-                <small>
-                <b>Time and Cost Comparison</b><br>
-                Shows execution metrics for both approaches.
-                </small>
-                """, unsafe_allow_html=True)
+                with col1:
+                    st.markdown("""
+                    <small>
+                    <b>Time and Cost Comparison</b><br>
+                    Shows execution metrics for both approaches.
+                    </small>
+                    """, unsafe_allow_html=True)
                 
-                col1a, col1b = st.columns(2)
+                    col1a, col1b = st.columns(2)
                 
-                with col1a:
-                    st.metric("Separate Approach Time (s)", 
-                                f"{separate_metrics.get('execution_time'):.2f}")
+                    with col1a:
+                        st.metric("Separate Approach Time (s)", 
+                                    f"{separate_metrics.get('execution_time'):.2f}")
                     
-                    st.metric("Separate Approach Cost ($)", 
-                                f"{separate_metrics.get('cost'):.6f}")
+                        st.metric("Separate Approach Cost ($)", 
+                                    f"{separate_metrics.get('cost'):.6f}")
                 
-                with col1b:
-                    st.metric("Combined Approach Time (s)", 
-                                f"{combined_metrics.get('execution_time'):.2f}",
-                                f"{time_difference_percentage:.1f}%")
+                    with col1b:
+                        st.metric("Combined Approach Time (s)", 
+                                    f"{combined_metrics.get('execution_time'):.2f}",
+                                    f"{time_difference_percentage:.1f}%")
                     
-                    st.metric("Combined Approach Cost ($)", 
-                                f"{combined_metrics.get('cost'):.6f}",
-                                f"{cost_difference_percentage:.1f}%")
-
-            with col2:
-                st.markdown("""
-                <small>
-                <b>Token Usage Comparison</b><br>
-                Shows total tokens processed by each approach.
-                </small>
-                """, unsafe_allow_html=True)
+                        st.metric("Combined Approach Cost ($)", 
+                                    f"{combined_metrics.get('cost'):.6f}",
+                                    f"{cost_difference_percentage:.1f}%")
+
+                with col2:
+                    st.markdown("""
+                    <small>
+                    <b>Token Usage Comparison</b><br>
+                    Shows total tokens processed by each approach.
+                    </small>
+                    """, unsafe_allow_html=True)
                 
-                st.metric("Separate Approach Tokens", 
-                        f"{separate_metrics['total_tokens']}")
+                    st.metric("Separate Approach Tokens", 
+                            f"{separate_metrics['total_tokens']}")
                 
-                st.metric("Combined Approach Tokens", 
-                        f"{combined_metrics['total_tokens']}",
-                        f"{tokens_difference_percentage:.1f}%")
-
-            with col3:
-                st.markdown("""
-                <small>
-                <b>Token Efficiency</b><br>
-                Shows tokens difference between approaches.
-                </small>
-                """, unsafe_allow_html=True)
+                    st.metric("Combined Approach Tokens", 
+                            f"{combined_metrics['total_tokens']}",
+                            f"{tokens_difference_percentage:.1f}%")
+
+                with col3:
+                    st.markdown("""
+                    <small>
+                    <b>Token Efficiency</b><br>
+                    Shows tokens difference between approaches.
+                    </small>
+                    """, unsafe_allow_html=True)
                 
-                st.metric("Token Difference", 
-                        f"{tokens_difference}")
+                    st.metric("Token Difference", 
+                            f"{tokens_difference}")
                 
-                # Додаткова інформація про вхідні/вихідні токени
-                st.write(f"Separate: {separate_metrics['input_tokens']} in / {separate_metrics['output_tokens']} out")
-                st.write(f"Combined: {combined_metrics['input_tokens']} in / {combined_metrics['output_tokens']} out")
+                    # Додаткова інформація про вхідні/вихідні токени
+                    st.write(f"Separate: {separate_metrics['input_tokens']} in / {separate_metrics['output_tokens']} out")
+                    st.write(f"Combined: {combined_metrics['input_tokens']} in / {combined_metrics['output_tokens']} out")
 
 
-            st.subheader("Entities Comparison")
+                profiler.section("entities")
+                st.subheader("Entities Comparison")
 
-            # Отримуємо дані про сутності
-            knots_comparison = data["knots_comparison"]
+                # Отримуємо дані про сутності
+                knots_comparison = data["knots_comparison"]
 
-            # Створюємо набори сутностей для порівняння
-            separate_entities = set(data["separate_approach"]["knots"])
-            combined_entities = set(data["combined_approach"]["knots"])
+                # Створюємо набори сутностей для порівняння
+                separate_entities = set(data["separate_approach"]["knots"])
+                combined_entities = set(data["combined_approach"]["knots"])
             
-            # Зберігаємо метрики та сутності для загального підсумку
-            all_separate_metrics[tab_name] = separate_metrics
-            all_combined_metrics[tab_name] = combined_metrics
+                # Зберігаємо метрики та сутності для загального підсумку
+                all_separate_metrics[tab_name] = separate_metrics
+                all_combined_metrics[tab_name] = combined_metrics
 
 
-            # Створюємо колонки для списків сутностей
-            col1, col2 = st.columns(2)
+                # Створюємо колонки для списків сутностей
+                col1, col2 = st.columns(2)
 
-            with col1:
+                with col1:
                 
-                st.markdown("##### Separate Approach Entities without duplicates")
-                st.write(f"Total: {len(separate_entities)}")
+                    st.markdown("##### Separate Approach Entities without duplicates")
+                    st.write(f"Total: {len(separate_entities)}")
                 
-                # Показуємо сутності в контейнері з прокруткою, якщо їх багато
-                if len(separate_entities) >= 50:
-                    with st.expander("Show all entities"):
-                        st.markdown("""
-                        <div style="max-height: 200px; overflow-y: scroll;">
-                        """, unsafe_allow_html=True)
+                    # Показуємо сутності в контейнері з прокруткою, якщо їх багато
+                    if len(separate_entities) >= 50:
+                        with st.expander("Show all entities"):
+                            st.markdown("""
+                            <div style="max-height: 200px; overflow-y: scroll;">
+                            """, unsafe_allow_html=True)
+                            st.write(", ".join(sorted(list(separate_entities))))
+                            st.markdown("</div>", unsafe_allow_html=True)
+                    else:
                         st.write(", ".join(sorted(list(separate_entities))))
-                        st.markdown("</div>", unsafe_allow_html=True)
-                else:
-                    st.write(", ".join(sorted(list(separate_entities))))
 
-            with col2:
-                st.markdown("##### Combined Approach Entities without duplicates")
-                st.write(f"Total: {len(combined_entities)}")
+                with col2:
+                    st.markdown("##### Combined Approach Entities without duplicates")
+                    st.write(f"Total: {len(combined_entities)}")
                 
-                # Показуємо сутності в контейнері з прокруткою, якщо їх багато
-                if len(combined_entities) >= 50:
-                    with st.expander("Show all entities"):
-                        st.markdown("""
-                        <div style="max-height: 200px; overflow-y: scroll;">
-                        """, unsafe_allow_html=True)
+                    # Показуємо сутності в контейнері з прокруткою, якщо їх багато
+                    if len(combined_entities) >= 50:
+                        with st.expander("Show all entities"):
+                            st.markdown("""
+                            <div style="max-height: 200px; overflow-y: scroll;">
+                            """, unsafe_allow_html=True)
+                            st.write(", ".join(sorted(list(combined_entities))))
+                            st.markdown("</div>", unsafe_allow_html=True)
+                    else:
                         st.write(", ".join(sorted(list(combined_entities))))
-                        st.markdown("</div>", unsafe_allow_html=True)
-                else:
-                    st.write(", ".join(sorted(list(combined_entities))))
 
 
-            # Створюємо case-insensitive набори
-            separate_entities_lower = {entity.lower() for entity in separate_entities}
-            combined_entities_lower = {entity.lower() for entity in combined_entities}
+                # Створюємо case-insensitive набори
+                separate_entities_lower = {entity.lower() for entity in separate_entities}
+                combined_entities_lower = {entity.lower() for entity in combined_entities}
 
-            # Знаходимо спільні та унікальні сутності (case-insensitive)
-            common_entities_lower_set = separate_entities_lower.intersection(combined_entities_lower)
-            only_separate_lower_set = separate_entities_lower - combined_entities_lower
-            only_combined_lower_set = combined_entities_lower - separate_entities_lower
+                # Знаходимо спільні та унікальні сутності (case-insensitive)
+                common_entities_lower_set = separate_entities_lower.intersection(combined_entities_lower)
+                only_separate_lower_set = separate_entities_lower - combined_entities_lower
+                only_combined_lower_set = combined_entities_lower - separate_entities_lower
 
-            # Зберігаємо оригінальні сутності для відображення
-            common_entities = {entity for entity in separate_entities if entity.lower() in common_entities_lower_set}
-            common_entities.update({entity for entity in combined_entities if entity.lower() in common_entities_lower_set})
-            only_separate = {entity for entity in separate_entities if entity.lower() in only_separate_lower_set}
-            only_combined = {entity for entity in combined_entities if entity.lower() in only_combined_lower_set}
+                # Зберігаємо оригінальні сутності для відображення
+                common_entities = {entity for entity in separate_entities if entity.lower() in common_entities_lower_set}
+                common_entities.update({entity for entity in combined_entities if entity.lower() in common_entities_lower_set})
+                only_separate = {entity for entity in separate_entities if entity.lower() in only_separate_lower_set}
+                only_combined = {entity for entity in combined_entities if entity.lower() in only_combined_lower_set}
             
-            for entity in common_entities:
-                if entity in all_common_entities_dict:
-                    all_common_entities_dict[entity] += 1
-            else:
-                all_common_entities_dict[entity] = 1
+                for entity in common_entities:
+                    if entity in all_common_entities_dict:
+                        all_common_entities_dict[entity] += 1
+                else:
+                    all_common_entities_dict[entity] = 1
 
-            st.subheader("Entity Lists")
+                st.subheader("Entity Lists")
 
-            # Використовуємо сутності тільки з поточного файлу
-            # Створюємо case-insensitive набори для поточного файлу
-            separate_entities_lower = {entity.lower() for entity in separate_entities}
-            combined_entities_lower = {entity.lower() for entity in combined_entities}
+                # Використовуємо сутності тільки з поточного файлу
+                # Створюємо case-insensitive набори для поточного файлу
+                separate_entities_lower = {entity.lower() for entity in separate_entities}
+                combined_entities_lower = {entity.lower() for entity in combined_entities}
 
-            # Знаходимо спільні та унікальні сутності (case-insensitive) для поточного файлу
-            common_entities_lower = separate_entities_lower.intersection(combined_entities_lower)
-            only_separate_lower = separate_entities_lower - combined_entities_lower
-            only_combined_lower = combined_entities_lower - separate_entities_lower
+                # Знаходимо спільні та унікальні сутності (case-insensitive) для поточного файлу
+                common_entities_lower = separate_entities_lower.intersection(combined_entities_lower)
+                only_separate_lower = separate_entities_lower - combined_entities_lower
+                only_combined_lower = combined_entities_lower - separate_entities_lower
 
 
-            col1, col2, col3 = st.columns(3)
+                col1, col2, col3 = st.columns(3)
 
-            with col1:
-                st.markdown("##### Common Entities (case-insensitive) - Current File")
-                with st.expander(f"Show common entities ({len(common_entities_lower)})"):
-                    st.markdown("""
-                    <div style="max-height: 300px; overflow-y: scroll;">
-                    """, unsafe_allow_html=True)
-                    st.write(", ".join(sorted(list(common_entities_lower))))
-                    st.markdown("</div>", unsafe_allow_html=True)
+                with col1:
+                    st.markdown("##### Common Entities (case-insensitive) - Current File")
+                    with st.expander(f"Show common entities ({len(common_entities_lower)})"):
+                        st.markdown("""
+                        <div style="max-height: 300px; overflow-y: scroll;">
+                        """, unsafe_allow_html=True)
+                        st.write(", ".join(sorted(list(common_entities_lower))))
+                        st.markdown("</div>", unsafe_allow_html=True)
 
-            with col2:
-                st.markdown("##### Only in Separate Approach - Current File")
-                with st.expander(f"Show unique entities ({len(only_separate_lower)})"):
-                    st.markdown("""
-                    <div style="max-height: 300px; overflow-y: scroll;">
-                    """, unsafe_allow_html=True)
-                    st.write(", ".join(sorted(list(only_separate_lower))))
-                    st.markdown("</div>", unsafe_allow_html=True)
+                with col2:
+                    st.markdown("##### Only in Separate Approach - Current File")
+                    with st.expander(f"Show unique entities ({len(only_separate_lower)})"):
+                        st.markdown("""
+                        <div style="max-height: 300px; overflow-y: scroll;">
+                        """, unsafe_allow_html=True)
+                        st.write(", ".join(sorted(list(only_separate_lower))))
+                        st.markdown("</div>", unsafe_allow_html=True)
 
-            with col3:
-                st.markdown("##### Only in Combined Approach - Current File")
-                with st.expander(f"Show unique entities ({len(only_combined_lower)})"):
-                    st.markdown("""
-                    <div style="max-height: 300px; overflow-y: scroll;">
-                    """, unsafe_allow_html=True)
-                    st.write(", ".join(sorted(list(only_combined_lower))))
-                    st.markdown("</div>", unsafe_allow_html=True)
+                with col3:
+                    st.markdown("##### Only in Combined Approach - Current File")
+                    with st.expander(f"Show unique entities ({len(only_combined_lower)})"):
+                        st.markdown("""
+                        <div style="max-height: 300px; overflow-y: scroll;">
+                        """, unsafe_allow_html=True)
+                        st.write(", ".join(sorted(list(only_combined_lower))))
+                        st.markdown("</div>", unsafe_allow_html=True)
 
-            st.subheader("Topics Analysis")
-            font_size = 10
+                profiler.section("topics")
+                st.subheader("Topics Analysis")
+                font_size = 10
 
-            # Функція для витягування тем з raw_json
-            def extract_topics(raw_json):
-                if not raw_json:
-                    return []
-                
-                # Результуючий список всіх тем
-                all_topics = []
-                
-                # Розділяємо на блоки JSON
-                json_blocks = []
-                
-                # Перевіряємо, чи є markdown розмітка
-                if "```json" in raw_json:
-                    # Розділяємо за markdown блоками
-                    blocks = raw_json.split("```json")
-                    for i, block in enumerate(blocks):
-                        if i > 0:  # Пропускаємо перший елемент (він перед першим ```json)
-                            block_content = block.split("```")[0].strip()
-                            json_blocks.append(block_content)
-                else:
-                    # Якщо немає markdown розмітки, вважаємо весь текст одним JSON
-                    json_blocks = [raw_json]
-                
-                # Обробляємо кожен блок JSON
-                for block in json_blocks:
-                    try:
-                        json_data = json.loads(block)
-                        if "topics" in json_data:
-                            all_topics.extend(json_data.get("topics", []))
-                    except json.JSONDecodeError:
-                        # Якщо не вдалося розпарсити блок як JSON, спробуємо використати регулярний вираз
-                        try:
-                            import re
-                            topics_match = re.search(r'"topics"\s*:\s*\[(.*?)\]', block, re.DOTALL)
-                            if topics_match:
-                                topics_str = f'{{"topics": [{topics_match.group(1)}]}}'
-                                try:
-                                    json_data = json.loads(topics_str)
-                                    all_topics.extend(json_data.get("topics", []))
-                                except:
-                                    pass
-                        except:
-                            pass
-                
-                # Якщо не знайшли жодної теми, повертаємо порожній список
-                return all_topics
-
-            # Отримуємо теми з обох підходів
-            separate_topics = extract_topics(data["separate_approach"].get("raw_json", ""))
-            combined_topics = extract_topics(data["combined_approach"].get("raw_json", ""))
+                # Отримуємо теми з обох підходів
+                separate_topics = extract_topics(data["separate_approach"].get("raw_json", ""))
+                combined_topics = extract_topics(data["combined_approach"].get("raw_json", ""))
             
-            # Зберігаємо теми для загального підсумку
-            all_separate_topics.extend(separate_topics)
-            all_combined_topics.extend(combined_topics)
-
-            col1, col2 = st.columns(2)
+                # Зберігаємо теми для загального підсумку
+                all_separate_topics.extend(separate_topics)
+                all_combined_topics.extend(combined_topics)
 
-            with col1:
-                st.markdown("##### Separate Approach Topics.")
-                st.markdown(f"<span style='font-size: {font_size+2}pt;'>This approach did not utilize topics extraction</span>", unsafe_allow_html=True)
+                col1, col2 = st.columns(2)
 
-                if not separate_topics:
-                    st.warning("⚠️ No topics found or could not parse JSON")
-                else:
-                    for topic in separate_topics:
-                        with st.expander(f"{topic.get('topic_name')} (Score: {topic.get('relevance_score', '0')})"):
-                            st.write(topic.get('topic_description', 'No description available'))
-
-            with col2:
-                st.markdown("##### Combined Approach Topics")
-                if not combined_topics:
-                    st.warning("⚠️ No topics found or could not parse JSON")
-                else:
-                    st.markdown(f"<span style='font-size: {font_size+2}pt;'>Total topics: {len(combined_topics)}</span>", unsafe_allow_html=True)
+                with col1:
+                    st.markdown("##### Separate Approach Topics.")
+                    st.markdown(f"<span style='font-size: {font_size+2}pt;'>This approach did not utilize topics extraction</span>", unsafe_allow_html=True)
 
-                    for topic in combined_topics:
-                        with st.expander(f"{topic.get('topic_name')} (Score: {topic.get('relevance_score', 'N/A')})"):
-                            st.write(topic.get('topic_description', 'No description available'))
+                    if not separate_topics:
+                        st.warning("⚠️ No topics found or could not parse JSON")
+                    else:
+                        for topic in separate_topics:
+                            with st.expander(f"{topic.get('topic_name')} (Score: {topic.get('relevance_score', '0')})"):
+                                st.write(topic.get('topic_description', 'No description available'))
+
+                with col2:
+                    st.markdown("##### Combined Approach Topics")
+                    if not combined_topics:
+                        st.warning("⚠️ No topics found or could not parse JSON")
+                    else:
+                        st.markdown(f"<span style='font-size: {font_size+2}pt;'>Total topics: {len(combined_topics)}</span>", unsafe_allow_html=True)
 
-            st.subheader("Knots from Section Analysis")
+                        for topic in combined_topics:
+                            with st.expander(f"{topic.get('topic_name')} (Score: {topic.get('relevance_score', 'N/A')})"):
+                                st.write(topic.get('topic_description', 'No description available'))
 
-            # Функція для витягування knots_from_section та keywords_named_entities з raw_json
-            def extract_knots_from_section(raw_json, approach="combined"):
-                if not raw_json:
-                    return []
-                
-                all_knots = []
-                json_blocks = []
-                
-                if "```json" in raw_json:
-                    blocks = raw_json.split("```json")
-                    for i, block in enumerate(blocks):
-                        if i > 0:  # Пропускаємо перший елемент (він перед першим ```json)
-                            block_content = block.split("```")[0].strip()
-                            json_blocks.append(block_content)
-                else:
-                    # Якщо немає markdown розмітки, вважаємо весь текст одним JSON
-                    json_blocks = [raw_json]
-                
-                # Обробляємо кожен блок JSON
-                for block in json_blocks:
-                    try:
-                        # Спробуємо спочатку обробити блок як повний JSON
-                        json_data = json.loads(block)
-                        
-                        if "knots_from_section" in json_data:
-                            # Якщо knots_from_section знаходиться в корені JSON
-                            all_knots.extend(json_data["knots_from_section"])
-                        elif "entities" in json_data and "knots_from_section" in json_data["entities"]:
-                            # Якщо knots_from_section знаходиться в entities
-                            all_knots.extend(json_data["entities"]["knots_from_section"])
-                    except json.JSONDecodeError:
-                        # Якщо не вдалося розпарсити як повний JSON, спробуємо знайти відповідні секції
-                        try:
-                            # Шукаємо knots_from_section
-                            start_idx = block.find('"knots_from_section"')
-                            if start_idx != -1:
-                                # Знаходимо початок масиву після knots_from_section
-                                array_start = block.find('[', start_idx)
-                                if array_start != -1:
-                                    # Використовуємо лічильник дужок
-                                    bracket_count = 1
-                                    array_end = array_start + 1
-                                    
-                                    while bracket_count > 0 and array_end < len(block):
-                                        if block[array_end] == '[':
-                                            bracket_count += 1
-                                        elif block[array_end] == ']':
-                                            bracket_count -= 1
-                                        array_end += 1
-                                    
-                                    if bracket_count == 0:
-                                        array_content = block[array_start:array_end]
-                                        try:
-                                            knots_str = f'{{"knots_from_section": {array_content}}}'
-                                            json_data = json.loads(knots_str)
-                                            all_knots.extend(json_data["knots_from_section"])
-                                        except:
-                                            try:
-                                                knots_str = f'{{"entities": {{"knots_from_section": {array_content}}}}}'
-                                                json_data = json.loads(knots_str)
-                                                all_knots.extend(json_data["entities"]["knots_from_section"])
-                                            except:
-                                                pass
-                        except Exception as e:
-                            # Якщо щось пішло не так, спробуємо використати регулярний вираз
-                            try:
-                                import re
-                                # Шукаємо knots_from_section
-                                knots_matches = re.finditer(r'"knots_from_section"\s*:\s*(\[\s*\[.*?\]\s*\])', block, re.DOTALL)
-                                for match in knots_matches:
-                                    try:
-                                        knots_str = f'{{"knots_from_section": {match.group(1)}}}'
-                                        json_data = json.loads(knots_str)
-                                        all_knots.extend(json_data["knots_from_section"])
-                                    except:
-                                        pass
-                            except:
-                                pass
-                
-                return all_knots
+                profiler.section("knots")
+                st.subheader("Knots from Section Analysis")
 
-            separate_knots = extract_knots_from_section(data["separate_approach"].get("raw_json", ""), approach="separate")
-            combined_knots = extract_knots_from_section(data["combined_approach"].get("raw_json", ""), approach="combined")
+                separate_knots = extract_knots_from_json_blocks(data["separate_approach"].get("raw_json", ""))
+                combined_knots = extract_knots_from_json_blocks(data["combined_approach"].get("raw_json", ""))
 
-            # Підраховуємо унікальні сутності для сепарованого підходу
-            separate_all_entities = []
-            for group in separate_knots:
-                separate_all_entities.extend(group)
-            separate_entities_count = len(set(separate_all_entities))
+                # Підраховуємо унікальні сутності для сепарованого підходу
+                separate_all_entities = []
+                for group in separate_knots:
+                    separate_all_entities.extend(group)
+                separate_entities_count = len(set(separate_all_entities))
 
-            separate_all_entities = []
-            for group in separate_knots:
-                separate_all_entities.extend(group)
-            separate_entities_count = len(set(separate_all_entities))
+                separate_all_entities = []
+                for group in separate_knots:
+                    separate_all_entities.extend(group)
+                separate_entities_count = len(set(separate_all_entities))
 
-            # Підраховуємо унікальні сутності для комбінованого підходу
-            combined_all_entities = []
-            for group in combined_knots:
-                combined_all_entities.extend(group)
-            combined_entities_count = len(set(combined_all_entities))
+                # Підраховуємо унікальні сутності для комбінованого підходу
+                combined_all_entities = []
+                for group in combined_knots:
+                    combined_all_entities.extend(group)
+                combined_entities_count = len(set(combined_all_entities))
 
 
 
-            col1, col2 = st.columns(2)
+                col1, col2 = st.columns(2)
 
-            with col1:
-                st.markdown("##### Separate Approach Knots from Section")
-                if not separate_knots:
-                    st.warning("⚠️ No knots found or could not parse JSON")
-                else:
-                    # Підраховуємо загальну кількість сутностей та унікальних сутностей
-                    all_entities = []
-                    for group in separate_knots:
-                        all_entities.extend(group)
+                with col1:
+                    st.markdown("##### Separate Approach Knots from Section")
+                    if not separate_knots:
+                        st.warning("⚠️ No knots found or could not parse JSON")
+                    else:
+                        # Підраховуємо загальну кількість сутностей та унікальних сутностей
+                        all_entities = []
+                        for group in separate_knots:
+                            all_entities.extend(group)
                     
-                    total_entities = len(all_entities)
-                    unique_entities = len(set(all_entities))
-                    duplicate_count = total_entities - unique_entities
-                    duplicate_percentage = 1 - (unique_entities / total_entities) if total_entities > 0 else 0
+                        total_entities = len(all_entities)
+                        unique_entities = len(set(all_entities))
+                        duplicate_count = total_entities - unique_entities
+                        duplicate_percentage = 1 - (unique_entities / total_entities) if total_entities > 0 else 0
                     
-                    # Порівнюємо з загальною кількістю сутностей
-                    knots_match = "✅" if separate_entities_count == len(set(all_entities)) else "❌"
-                    st.write(f"Total raw entities: {total_entities}, Unique entities: {unique_entities}, Sections: {len(separate_knots)}")
-                    # st.write(f"Knots count: {separate_entities_count}, Unique knots from sections: {len(set(all_entities))} {knots_match}")
+                        # Порівнюємо з загальною кількістю сутностей
+                        knots_match = "✅" if separate_entities_count == len(set(all_entities)) else "❌"
+                        st.write(f"Total raw entities: {total_entities}, Unique entities: {unique_entities}, Sections: {len(separate_knots)}")
+                        # st.write(f"Knots count: {separate_entities_count}, Unique knots from sections: {len(set(all_entities))} {knots_match}")
                     
-                    if len(separate_knots) > 50:
-                        with st.expander(f"Show all {len(separate_knots)} sections"):
-                            st.markdown("""
-                            <div style="max-height: 400px; overflow-y: scroll;">
-                            """, unsafe_allow_html=True)
-                            
-                            for i, knot_group in enumerate(separate_knots):
-                                st.markdown(f"**Section {i+1}** ({len(knot_group)} entities)")
-                                st.write(", ".join(knot_group))
-                                st.markdown("---")
-                            
-                            st.markdown("</div>", unsafe_allow_html=True)
+                        knot_groups_table(separate_knots, key=f"{tab_name}_separate_knots")
+
+                with col2:
+                    st.markdown("##### Combined Approach Knots from Section")
+                    if not combined_knots:
+                        st.warning("⚠️ No knots found or could not parse JSON")
                     else:
-                        # Показуємо групи сутностей як раніше
-                        for i, knot_group in enumerate(separate_knots):
-                            with st.expander(f"Section {i+1} ({len(knot_group)} entities)"):
-                                st.write(", ".join(knot_group))
-
-            with col2:
-                st.markdown("##### Combined Approach Knots from Section")
-                if not combined_knots:
-                    st.warning("⚠️ No knots found or could not parse JSON")
-                else:
-                    # Підраховуємо загальну кількість сутностей та унікальних сутностей
-                    all_entities = []
-                    for group in combined_knots:
-                        all_entities.extend(group)
+                        # Підраховуємо загальну кількість сутностей та унікальних сутностей
+                        all_entities = []
+                        for group in combined_knots:
+                            all_entities.extend(group)
                     
-                    total_entities = len(all_entities)
-                    unique_entities = len(set(all_entities))
-                    duplicate_count = total_entities - unique_entities
-                    duplicate_percentage = 1 - (unique_entities / total_entities) if total_entities > 0 else 0
+                        total_entities = len(all_entities)
+                        unique_entities = len(set(all_entities))
+                        duplicate_count = total_entities - unique_entities
+                        duplicate_percentage = 1 - (unique_entities / total_entities) if total_entities > 0 else 0
                     
-                    knots_match = "✅" if combined_entities_count == len(set(all_entities)) else "❌"
+                        knots_match = "✅" if combined_entities_count == len(set(all_entities)) else "❌"
                     
-                    st.write(f"Total raw entities: {total_entities}, Unique entities: {unique_entities}, Sections: {len(combined_knots)}")
-                    # st.write(f"Knots count: {combined_entities_count}, Unique knots from sections: {len(set(all_entities))} {knots_match}")
+                        st.write(f"Total raw entities: {total_entities}, Unique entities: {unique_entities}, Sections: {len(combined_knots)}")
+                        # st.write(f"Knots count: {combined_entities_count}, Unique knots from sections: {len(set(all_entities))} {knots_match}")
                     
-                    if len(combined_knots) > 50:
-                        with st.expander(f"Show all {len(combined_knots)} sections"):
-                            st.markdown("""
-                            <div style="max-height: 400px; overflow-y: scroll;">
-                            """, unsafe_allow_html=True)
-                            
-                            for i, knot_group in enumerate(combined_knots):
-                                st.markdown(f"**Section {i+1}** ({len(knot_group)} entities)")
-                                st.write(", ".join(knot_group))
-                                st.markdown("---")
-                            
-                            st.markdown("</div>", unsafe_allow_html=True)
-                    else:
-                        # Показуємо групи сутностей як раніше
-                        for i, knot_group in enumerate(combined_knots):
-                            with st.expander(f"Section {i+1} ({len(knot_group)} entities)"):
-                                st.write(", ".join(knot_group))
+                        knot_groups_table(combined_knots, key=f"{tab_name}_combined_knots")
 
-# Загальний підсумок за межами циклу по табах
-st.markdown("---")
-st.header("Overall Comparison Summary (All Files)")
+    profiler.section("summary")
+    # Загальний підсумок за межами циклу по табах
+    st.markdown("---")
+    st.header("Overall Comparison Summary (All Files)")
 
-# Створюємо графік для порівняння підходів
-col1, col2 = st.columns(2)
+    # Створюємо графік для порівняння підходів
+    col1, col2 = st.columns(2)
 
-with col1:
-    st.subheader("Performance Comparison Across All Files")
+    with col1:
+        st.subheader("Performance Comparison Across All Files")
     
-    # Обчислюємо середні значення для всіх файлів
-    if all_separate_metrics and all_combined_metrics:
-        # Обчислюємо середні значення метрик
-        avg_separate_time = sum(m["execution_time"] for m in all_separate_metrics.values()) / len(all_separate_metrics)
-        avg_combined_time = sum(m["execution_time"] for m in all_combined_metrics.values()) / len(all_combined_metrics)
-        avg_separate_cost = sum(m["cost"] for m in all_separate_metrics.values()) / len(all_separate_metrics)
-        avg_combined_cost = sum(m["cost"] for m in all_combined_metrics.values()) / len(all_combined_metrics)
-        avg_separate_tokens = sum(m["total_tokens"] for m in all_separate_metrics.values()) / len(all_separate_metrics)
-        avg_combined_tokens = sum(m["total_tokens"] for m in all_combined_metrics.values()) / len(all_combined_metrics)
+        # Обчислюємо середні значення для всіх файлів
+        if all_separate_metrics and all_combined_metrics:
+            # Обчислюємо середні значення метрик
+            avg_separate_time = sum(m["execution_time"] for m in all_separate_metrics.values()) / len(all_separate_metrics)
+            avg_combined_time = sum(m["execution_time"] for m in all_combined_metrics.values()) / len(all_combined_metrics)
+            avg_separate_cost = sum(m["cost"] for m in all_separate_metrics.values()) / len(all_separate_metrics)
+            avg_combined_cost = sum(m["cost"] for m in all_combined_metrics.values()) / len(all_combined_metrics)
+            avg_separate_tokens = sum(m["total_tokens"] for m in all_separate_metrics.values()) / len(all_separate_metrics)
+            avg_combined_tokens = sum(m["total_tokens"] for m in all_combined_metrics.values()) / len(all_combined_metrics)
         
-        # Обчислюємо відсоткові різниці
-        time_diff_pct = ((avg_separate_time - avg_combined_time) / avg_separate_time) * 100 if avg_separate_time > 0 else 0
-        cost_diff_pct = ((avg_separate_cost - avg_combined_cost) / avg_separate_cost) * 100 if avg_separate_cost > 0 else 0
-        tokens_diff_pct = ((avg_separate_tokens - avg_combined_tokens) / avg_separate_tokens) * 100 if avg_separate_tokens > 0 else 0
+            # Обчислюємо відсоткові різниці
+            time_diff_pct = ((avg_separate_time - avg_combined_time) / avg_separate_time) * 100 if avg_separate_time > 0 else 0
+            cost_diff_pct = ((avg_separate_cost - avg_combined_cost) / avg_separate_cost) * 100 if avg_separate_cost > 0 else 0
+            tokens_diff_pct = ((avg_separate_tokens - avg_combined_tokens) / avg_separate_tokens) * 100 if avg_separate_tokens > 0 else 0
         
-        # Створюємо DataFrame для порівняння
-        metrics_df = pd.DataFrame({
-            "Metric": ["Execution Time (s)", "Cost ($)", "Total Tokens"],
-            "Avg Separate": [avg_separate_time, avg_separate_cost, avg_separate_tokens],
-            "Avg Combined": [avg_combined_time, avg_combined_cost, avg_combined_tokens],
-            "Avg Difference %": [time_diff_pct, cost_diff_pct, tokens_diff_pct]
-        })
+            # Створюємо DataFrame для порівняння
+            metrics_df = pd.DataFrame({
+                "Metric": ["Execution Time (s)", "Cost ($)", "Total Tokens"],
+                "Avg Separate": [avg_separate_time, avg_separate_cost, avg_separate_tokens],
+                "Avg Combined": [avg_combined_time, avg_combined_cost, avg_combined_tokens],
+                "Avg Difference %": [time_diff_pct, cost_diff_pct, tokens_diff_pct]
+            })
         
-        st.table(metrics_df.set_index("Metric"))
+            st.table(metrics_df.set_index("Metric"))
         
-        # Показуємо деталі для кожного файлу
-        with st.expander("Show details for each file"):
-            for file_name in all_separate_metrics.keys():
-                st.subheader(file_name)
-                file_separate = all_separate_metrics[file_name]
-                file_combined = all_combined_metrics[file_name]
+            # Показуємо деталі для кожного файлу
+            with st.expander("Show details for each file"):
+                for file_name in all_separate_metrics.keys():
+                    st.subheader(file_name)
+                    file_separate = all_separate_metrics[file_name]
+                    file_combined = all_combined_metrics[file_name]
                 
-                file_time_diff = ((file_separate["execution_time"] - file_combined["execution_time"]) / file_separate["execution_time"]) * 100 if file_separate["execution_time"] > 0 else 0
-                file_cost_diff = ((file_separate["cost"] - file_combined["cost"]) / file_separate["cost"]) * 100 if file_separate["cost"] > 0 else 0
-                file_tokens_diff = ((file_separate["total_tokens"] - file_combined["total_tokens"]) / file_separate["total_tokens"]) * 100 if file_separate["total_tokens"] > 0 else 0
+                    file_time_diff = ((file_separate["execution_time"] - file_combined["execution_time"]) / file_separate["execution_time"]) * 100 if file_separate["execution_time"] > 0 else 0
+                    file_cost_diff = ((file_separate["cost"] - file_combined["cost"]) / file_separate["cost"]) * 100 if file_separate["cost"] > 0 else 0
+                    file_tokens_diff = ((file_separate["total_tokens"] - file_combined["total_tokens"]) / file_separate["total_tokens"]) * 100 if file_separate["total_tokens"] > 0 else 0
                 
-                file_df = pd.DataFrame({
-                    "Metric": ["Execution Time (s)", "Cost ($)", "Total Tokens"],
-                    "Separate": [file_separate["execution_time"], file_separate["cost"], file_separate["total_tokens"]],
-                    "Combined": [file_combined["execution_time"], file_combined["cost"], file_combined["total_tokens"]],
-                    "Difference %": [file_time_diff, file_cost_diff, file_tokens_diff]
-                })
+                    file_df = pd.DataFrame({
+                        "Metric": ["Execution Time (s)", "Cost ($)", "Total Tokens"],
+                        "Separate": [file_separate["execution_time"], file_separate["cost"], file_separate["total_tokens"]],
+                        "Combined": [file_combined["execution_time"], file_combined["cost"], file_combined["total_tokens"]],
+                        "Difference %": [file_time_diff, file_cost_diff, file_tokens_diff]
+                    })
                 
-                st.table(file_df.set_index("Metric"))
-        
-        # Створюємо графік порівняння для середніх значень
-        fig, ax = plt.subplots(figsize=(10, 6))
-        x = range(3)
-        width = 0.35
+                    st.table(file_df.set_index("Metric"))
         
-        # Нормалізуємо дані для графіка
-        normalized_separate = [
-            avg_separate_time / max(avg_separate_time, avg_combined_time) if max(avg_separate_time, avg_combined_time) > 0 else 0,
-            avg_separate_cost / max(avg_separate_cost, avg_combined_cost) if max(avg_separate_cost, avg_combined_cost) > 0 else 0,
-            avg_separate_tokens / max(avg_separate_tokens, avg_combined_tokens) if max(avg_separate_tokens, avg_combined_tokens) > 0 else 0
-        ]
+            # Створюємо графік порівняння для середніх значень
+            # Нормалізуємо дані для графіка
+            normalized_separate = [
+                avg_separate_time / max(avg_separate_time, avg_combined_time) if max(avg_separate_time, avg_combined_time) > 0 else 0,
+                avg_separate_cost / max(avg_separate_cost, avg_combined_cost) if max(avg_separate_cost, avg_combined_cost) > 0 else 0,
+                avg_separate_tokens / max(avg_separate_tokens, avg_combined_tokens) if max(avg_separate_tokens, avg_combined_tokens) > 0 else 0
+            ]
         
-        normalized_combined = [
-            avg_combined_time / max(avg_separate_time, avg_combined_time) if max(avg_separate_time, avg_combined_time) > 0 else 0,
-            avg_combined_cost / max(avg_separate_cost, avg_combined_cost) if max(avg_separate_cost, avg_combined_cost) > 0 else 0,
-            avg_combined_tokens / max(avg_separate_tokens, avg_combined_tokens) if max(avg_separate_tokens, avg_combined_tokens) > 0 else 0
-        ]
+            normalized_combined = [
+                avg_combined_time / max(avg_separate_time, avg_combined_time) if max(avg_separate_time, avg_combined_time) > 0 else 0,
+                avg_combined_cost / max(avg_separate_cost, avg_combined_cost) if max(avg_separate_cost, avg_combined_cost) > 0 else 0,
+                avg_combined_tokens / max(avg_separate_tokens, avg_combined_tokens) if max(avg_separate_tokens, avg_combined_tokens) > 0 else 0
+            ]
         
-        ax.bar([i - width/2 for i in x], normalized_separate, width, label='Separate Approach')
-        ax.bar([i + width/2 for i in x], normalized_combined, width, label='Combined Approach')
-        
-        ax.set_ylabel('Normalized Value')
-        ax.set_title('Average Performance Metrics Comparison (All Files)')
-        ax.set_xticks(x)
-        ax.set_xticklabels(["Time", "Cost", "Tokens"])
-        ax.legend()
-        
-        st.pyplot(fig)
-    else:
-        st.warning("No data available for performance comparison")
+            grouped_bar_chart(
+                ["Time", "Cost", "Tokens"],
+                [("Separate Approach", normalized_separate), ("Combined Approach", normalized_combined)],
+                title="Average Performance Metrics Comparison (All Files)",
+                ylabel="Normalized Value"
+            )
+        else:
+            st.warning("No data available for performance comparison")
 
-with col2:
-    st.subheader("Analysis Quality Comparison Across All Files")
-    
-    # Всі ключі вже в нижньому регістрі, оскільки ми змінили спосіб додавання сутностей
-    all_separate_entities = set(all_separate_entities_dict.keys())
-    all_combined_entities = set(all_combined_entities_dict.keys())
-    
-    # Знаходимо сутності, які зустрічаються в обох підходах В ОДНОМУ І ТОМУ Ж ФАЙЛІ
-    true_common_entities = set()
-    for entity_lower in all_separate_entities.intersection(all_combined_entities):
-        # Перевіряємо, чи є спільні файли, де ця сутність зустрічається в обох підходах
-        common_files = separate_entities_by_file.get(entity_lower, set()).intersection(
-            combined_entities_by_file.get(entity_lower, set())
-        )
-        if common_files:  # Якщо є хоча б один спільний файл
-            true_common_entities.add(entity_lower)
-    
-    # Оновлюємо набори для унікальних сутностей
-    only_separate = all_separate_entities - true_common_entities
-    only_combined = all_combined_entities - true_common_entities
-    common_all_files = true_common_entities
+    with col2:
+        st.subheader("Analysis Quality Comparison Across All Files")
     
-    # Підраховуємо загальну кількість унікальних сутностей з урахуванням дублікатів між файлами
-    total_separate_entities = sum(count[0] for count in all_separate_entities_dict.values())
-    total_combined_entities = sum(count[0] for count in all_combined_entities_dict.values())
+        # Всі ключі вже в нижньому регістрі, оскільки ми змінили спосіб додавання сутностей
+        all_separate_entities = set(all_separate_entities_dict.keys())
+        all_combined_entities = set(all_combined_entities_dict.keys())
     
-    # Створюємо DataFrame для порівняння кількості сутностей і тем
-    quality_df = pd.DataFrame({
-        "Metric": [ "Total Entities", "Topics"],
-        "All Separate": [ total_separate_entities, len(all_separate_topics)],
-        "All Combined": [ total_combined_entities, len(all_combined_topics)]
-    })
+        # Знаходимо сутності, які зустрічаються в обох підходах В ОДНОМУ І ТОМУ Ж ФАЙЛІ
+        true_common_entities = common_entities_in_same_file(separate_entities_by_file, combined_entities_by_file)
     
+        # Оновлюємо набори для унікальних сутностей
+        only_separate = all_separate_entities - true_common_entities
+        only_combined = all_combined_entities - true_common_entities
+        common_all_files = true_common_entities
     
-    st.table(quality_df.set_index("Metric"))
+        # Підраховуємо загальну кількість унікальних сутностей з урахуванням дублікатів між файлами
+        total_separate_entities = sum(count[0] for count in all_separate_entities_dict.values())
+        total_combined_entities = sum(count[0] for count in all_combined_entities_dict.values())
     
-    # Показуємо діаграму Венна для всіх файлів
-    st.markdown("##### Entity Overlap Analysis (All Files)")
-    col1, col2 = st.columns([1, 1])
+        # Створюємо DataFrame для порівняння кількості сутностей і тем
+        quality_df = pd.DataFrame({
+            "Metric": [ "Total Entities", "Topics"],
+            "All Separate": [ total_separate_entities, len(all_separate_topics)],
+            "All Combined": [ total_combined_entities, len(all_combined_topics)]
+        })
     
-    with col1:
-        st.markdown(f"Common entities: {len(common_all_files)}")
-        st.markdown(f"Only in separate: {len(only_separate)}")
-        st.markdown(f"Only in combined: {len(only_combined)}")  
-    with col2:
-        try:
-            venn = venn2(subsets=(
-                len(only_separate),
-                len(only_combined),
-                len(common_all_files)
-            ), set_labels=('Separate', 'Combined'))
-        except Exception as e:
-            st.error(f"Error creating Venn diagram: {str(e)}")
     
-    # Створюємо графік порівняння
-    fig, ax = plt.subplots(figsize=(10, 6))
-    x = range(2)
-    width = 0.35
+        st.table(quality_df.set_index("Metric"))
     
-    ax.bar([i - width/2 for i in x], [len(all_separate_entities), len(all_separate_topics)], width, label='Separate Approach')
-    ax.bar([i + width/2 for i in x], [len(all_combined_entities), len(all_combined_topics)], width, label='Combined Approach')
+        # Показуємо діаграму Венна для всіх файлів
+        st.markdown("##### Entity Overlap Analysis (All Files)")
+        col1, col2 = st.columns([1, 1])
     
-    ax.set_ylabel('Count')
-    ax.set_title('Entities and Topics Comparison (All Files)')
-    ax.set_xticks(x)
-    ax.set_xticklabels(["Entities", "Topics"])
-    ax.legend()
+        with col1:
+            st.markdown(f"Common entities: {len(common_all_files)}")
+            st.markdown(f"Only in separate: {len(only_separate)}")
+            st.markdown(f"Only in combined: {len(only_combined)}")  
+        with col2:
+            try:
+                venn2_chart(
+                    (len(only_separate), len(only_combined), len(common_all_files)),
+                    ("Separate", "Combined"),
+                    figsize=(4, 4)
+                )
+            except Exception as e:
+                st.error(f"Error creating Venn diagram: {str(e)}")
     
-    st.pyplot(fig)
+        # Створюємо графік порівняння
+        grouped_bar_chart(
+            ["Entities", "Topics"],
+            [
+                ("Separate Approach", [len(all_separate_entities), len(all_separate_topics)]),
+                ("Combined Approach", [len(all_combined_entities), len(all_combined_topics)])
+            ],
+            title="Entities and Topics Comparison (All Files)",
+            ylabel="Count"
+        )
     
-    # Додаємо висновки
-    st.markdown("""
-    ### Key Findings (Across All Files):
+        # Додаємо висновки
+        st.markdown("""
+        ### Key Findings (Across All Files):
     
-    1. **Execution Cost**: The combined approach shows significant cost savings compared to the separate approach.
+        1. **Execution Cost**: The combined approach shows significant cost savings compared to the separate approach.
     
-    2. **Execution Time**: Processing time is reduced with the combined approach.
+        2. **Execution Time**: Processing time is reduced with the combined approach.
     
-    3. **Entity Coverage**: The analysis shows differences in entity extraction between approaches. In most cases, the combined approach extracts more entities and identifies more sections. The combined approach rarely generates entities with proper capitalization (first letter capitalized)
-    """)
+        3. **Entity Coverage**: The analysis shows differences in entity extraction between approaches. In most cases, the combined approach extracts more entities and identifies more sections. The combined approach rarely generates entities with proper capitalization (first letter capitalized)
+        """)
 
-st.markdown("---")
-st.caption("File Analysis Comparison Dashboard")
+    st.markdown("---")
+    st.caption("File Analysis Comparison Dashboard")
 
 
-st.header("File Examples")
+    profiler.section("file_examples")
+    st.header("File Examples")
 
-# List of files to load
-file_samples = [
-    {"name": "File 1", "path": "samples/technical_test_doc_1.txt"},
-    {"name": "File 2", "path": "samples/technical_test_doc_2.txt"},
-    {"name": "File 3", "path": "samples/technical_test_doc_3.txt"},
+    # List of files to load
+    file_samples = [
+        {"name": "File 1", "path": "samples/technical_test_doc_1.txt"},
+        {"name": "File 2", "path": "samples/technical_test_doc_2.txt"},
+        {"name": "File 3", "path": "samples/technical_test_doc_3.txt"},
 
-]
+    ]
 
-# Load files
-loaded_files = {}
-for file_info in file_samples:
-    try:
-        # First try to import from samples module
-        module_name = file_info["path"].split("/")[-1].replace(".txt", "")
-        try:
-            module = __import__(f"samples.{module_name}", fromlist=[module_name])
-            loaded_files[file_info["name"]] = getattr(module, module_name)
-        except (ImportError, AttributeError):
-            # If import fails, try to read the file directly
-            try:
-                with open(file_info["path"], "r", encoding="utf-8") as f:
-                    loaded_files[file_info["name"]] = f.read()
-            except:
-                continue
-    except Exception as e:
-        st.warning(f"Failed to load file {file_info['name']}: {str(e)}")
-
-if loaded_files:
-    # Create tabs for each loaded file
-    file_tabs = st.tabs(list(loaded_files.keys()))
+    # Keep only the files that exist; their content is read page by page by the viewer
+    available_files = [file_info for file_info in file_samples if os.path.exists(file_info["path"])]
+
+    if available_files:
+        # Create tabs for each available file
+        file_tabs = st.tabs([file_info["name"] for file_info in available_files])
     
-    # Display content of each file
-    for i, (file_name, file_tab) in enumerate(zip(loaded_files.keys(), file_tabs)):
-        with file_tab:
-            try:
-                st.subheader(file_name)
-                
-                file_content = loaded_files[file_name]
-                st.text_area("Raw Document (first 15000 characters)", file_content[:15000] + ("..." if len(file_content) > 5000 else ""), height=400)
-                
-            except Exception as e:
-                st.error(f"Error displaying file {file_name}: {str(e)}")
-else:
-    st.warning("Could not load any files. Make sure the files exist in the samples/ directory.")
\ No newline at end of file
+        # Display content of each file
+        for file_info, file_tab in zip(available_files, file_tabs):
+            with file_tab:
+                st.subheader(file_info["name"])
+                document_viewer(file_info["path"], key=f"doc_{file_info['name']}")
+    else:
+        st.warning("Could not load any files. Make sure the files exist in the samples/ directory.")
+
+    profiler.section("prediction")
+    st.header("Cost and Latency Prediction")
+    st.markdown("""
+    Predicted tokens, execution time and cost of a document for each approach and chunking threshold, from models fitted
+    on all stored runs. Use it to pick 16k or 32k chunking, or separate or combined, before paying for a trial run
+    (`python -m pipeline.predictor` does the same from the command line).
+    """)
+    what_if_panel(file_samples, key="file_what_if")
+
+    cache_stats_sidebar()
@@ -0,0 +1,93 @@
+import streamlit as st
+import os
+import pandas as pd
+from dashboard.profiling import page_profiler
+from dashboard.shared_cache import results_index, cache_stats_sidebar
+from pipeline.prompt_cache import run_set
+from pipeline.regression import DEFAULT_CONFIDENCE, DEFAULT_THRESHOLDS, METRICS, MIN_PAIRS, gate, previous_version
+
+st.set_page_config(
+    page_title="Regression Gate",
+    page_icon="🚦",
+    layout="wide"
+)
+
+with page_profiler("regression_gate") as profiler:
+    profiler.section("load")
+
+    st.title("Regression Gate")
+    st.markdown("""
+    Is a new run more expensive or slower than the one it replaces? Documents present in both runs are paired, and for
+    every metric the change is the geometric mean of the per-document ratios with a bootstrap interval. A metric fails
+    when the whole interval is above its threshold, and warns when only the estimate is. The same check runs in CI with
+    `python -m pipeline.regression CANDIDATE [--baseline BASELINE]`, which exits with 1 on a failed verdict.
+    """)
+
+    records = results_index()
+    cache_stats_sidebar()
+    totals = records[records["stage"] == "total"]
+    sources = sorted({run_set(record) for record in totals.to_dict("records")})
+    approaches = {source: sorted(totals[[run_set(record) == source for record in totals.to_dict("records")]]
+                                 ["approach"].dropna().unique())
+                  for source in sources}
+    if not sources:
+        st.info("No runs in `results/` yet.")
+        st.stop()
+
+    VERDICT_BANNERS = {"pass": st.success, "warn": st.warning, "fail": st.error, "insufficient": st.info}
+    ALL_APPROACHES = "All approaches"
+
+    col1, col2 = st.columns(2)
+    with col1:
+        candidate = st.selectbox("Candidate", sources, index=len(sources) - 1)
+        candidate_approach = st.selectbox("Candidate approach", [ALL_APPROACHES] + approaches[candidate])
+    with col2:
+        previous = previous_version(candidate, sources)
+        baseline = st.selectbox("Baseline", sources, index=sources.index(previous) if previous else 0,
+                                help="Defaults to the previous prompt version of the candidate file")
+        baseline_approach = st.selectbox("Baseline approach", [ALL_APPROACHES] + approaches[baseline])
+
+    with st.sidebar:
+        st.subheader("Thresholds")
+        thresholds = {metric: st.number_input(f"{metric} (%)", min_value=0.0, max_value=500.0, step=1.0,
+                                              value=DEFAULT_THRESHOLDS[metric] * 100) / 100
+                      for metric in METRICS}
+        confidence = st.slider("Confidence", 0.5, 0.99, DEFAULT_CONFIDENCE, 0.01)
+
+
+    def spec(source, approach):
+        return source if approach == ALL_APPROACHES else f"{source}:{approach}"
+
+
+    profiler.section("gate")
+    result = gate(records, spec(candidate, candidate_approach), spec(baseline, baseline_approach), thresholds,
+                  confidence)
+    VERDICT_BANNERS[result["verdict"]](f"**{result['verdict'].upper()}**: {result['candidate']} against "
+                                       f"{result['baseline']}, {result['pairs']} paired documents")
+
+    st.subheader("Metrics")
+    metrics_df = pd.DataFrame([{
+        "Metric": metric,
+        "Baseline Mean": values["baseline_mean"],
+        "Candidate Mean": values["candidate_mean"],
+        "Change": f"{values['change']:+.1%}" if values["change"] is not None else "-",
+        "Interval": f"[{values['low']:+.1%}, {values['high']:+.1%}]" if values["change"] is not None else "-",
+        "Threshold": f"{values['threshold']:+.0%}",
+        "Pairs": values["pairs"],
+        "Status": values["status"],
+    } for metric, values in result["metrics"].items()])
+    st.dataframe(metrics_df, hide_index=True, width="stretch")
+    st.caption(f"{confidence:.0%} bootstrap intervals over the paired documents. A metric with fewer than "
+               f"{MIN_PAIRS} paired values, e.g. `execution_time` of runs without timings, is skipped.")
+
+    if result["documents"]:
+        st.subheader("Per-Document Changes")
+        documents_df = pd.DataFrame(result["documents"])
+        documents_df["document"] = documents_df["document"].map(lambda document: os.path.basename(str(document)))
+        for metric in METRICS:
+            documents_df[metric] = documents_df[metric].map(lambda change: f"{change:+.1%}"
+                                                            if change is not None and pd.notna(change) else "-")
+        st.dataframe(documents_df, hide_index=True, width="stretch")
+
+    st.markdown("---")
+    st.caption("Regression Gate Dashboard")
@@ -0,0 +1,121 @@
+import streamlit as st
+import glob
+import os
+import time
+import pandas as pd
+from dashboard.charts import gantt_chart
+from dashboard.profiling import page_profiler
+from pipeline.tracing import SPAN_KINDS, TRACE_DIR, inherit, read_trace, time_breakdown
+
+st.set_page_config(
+    page_title="Run Traces",
+    page_icon="⏱️",
+    layout="wide"
+)
+
+with page_profiler("run_traces") as profiler:
+    st.title("Run Traces")
+    st.markdown("""
+    Span-level timeline of a `pipeline.runner` run: for every document, the time each model call waited in the rate
+    limiter, waited for its first token and generated, and the time spent parsing and post-processing the chunks.
+    Record a trace with `python -m pipeline.runner ... --trace`; traces are kept in `indexes/traces/` as
+    OpenTelemetry JSON.
+    """)
+
+    # Кольори за видом роботи, однакові на діаграмі й у таблиці
+    SPAN_COLORS = {
+        "queue_wait": "#d62728",
+        "request": "#1f77b4",
+        "generation": "#aec7e8",
+        "journal": "#7f7f7f",
+        "chunking": "#9467bd",
+        "parse": "#2ca02c",
+        "merge": "#ff7f0e",
+        "save": "#8c564b",
+    }
+    MAX_ROWS = 40
+
+
+    @st.cache_data(show_spinner=False)
+    def load_trace(path, mtime):
+        # The mtime is only part of the cache key
+        return inherit(read_trace(path), "document")
+
+
+    trace_files = sorted(glob.glob(os.path.join(TRACE_DIR, "*.json")), key=os.path.getmtime, reverse=True)
+    if not trace_files:
+        st.info("No traces yet. Run the pipeline with `--trace`, for example "
+                "`python -m pipeline.runner samples/real_file --backend stub --trace`.")
+        st.stop()
+
+    profiler.section("load")
+    selected = st.selectbox(
+        "Trace", trace_files,
+        format_func=lambda path: f"{os.path.basename(path)} "
+                                 f"({time.strftime('%Y-%m-%d %H:%M', time.localtime(os.path.getmtime(path)))})")
+    spans = load_trace(selected, os.path.getmtime(selected))
+    root = next((item for item in spans if item["name"] == "run"), None)
+    start = min(item["start"] for item in spans)
+    end = max(item["end"] for item in spans)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Wall Time", f"{end - start:.1f}s")
+    col2.metric("Documents", sum(item["name"] == "document" for item in spans))
+    col3.metric("Model Calls", sum(item["name"] == "call" for item in spans))
+    col4.metric("Workers", root.get("workers", 1) if root else 1)
+
+    profiler.section("breakdown")
+    st.subheader("Where the Time Goes")
+    breakdown = time_breakdown(spans)
+    busy = sum(breakdown.values())
+    if busy:
+        breakdown_df = pd.DataFrame({
+            "Work": list(breakdown),
+            "Seconds": [round(seconds, 3) for seconds in breakdown.values()],
+            "Share": [f"{seconds / busy:.1%}" for seconds in breakdown.values()],
+            "Spans": [", ".join(name for name, kind in SPAN_KINDS.items() if kind == work) for work in breakdown],
+        }).sort_values("Seconds", ascending=False)
+        st.dataframe(breakdown_df, hide_index=True, width="stretch")
+        st.caption("Seconds are summed over all documents, so with several workers they add up to more than the wall "
+                   "time. `waiting` is time queued in the rate limiter; `model` is the request until the first token "
+                   "plus the generation.")
+
+    profiler.section("gantt")
+    st.subheader("Timeline")
+    documents = [item["document"] for item in sorted(spans, key=lambda item: item["start"])
+                 if item["name"] == "document"]
+    shown = st.multiselect("Documents", documents, default=documents[:MAX_ROWS],
+                           format_func=os.path.basename)
+    leaves = [item for item in spans if item["name"] in SPAN_COLORS and item["document"] in shown]
+    if leaves:
+        rows = {document: i for i, document in enumerate(shown)}
+        gantt_chart([os.path.basename(document) for document in shown],
+                    [(rows[item["document"]], item["start"] - start, item["end"] - item["start"], item["name"])
+                     for item in leaves],
+                    colors=SPAN_COLORS, figsize=(12, max(2, 0.35 * len(shown) + 1)))
+    else:
+        st.info("No spans for the selected documents.")
+
+    profiler.section("calls")
+    st.subheader("Slowest Calls")
+    calls = [item for item in spans if item["name"] == "call"]
+    if calls:
+        children = {}
+        for item in spans:
+            children.setdefault(item.get("parent_id"), {})[item["name"]] = item["end"] - item["start"]
+        calls_df = pd.DataFrame([{
+            "Document": os.path.basename(str(call["document"])),
+            "Stage": call.get("stage"),
+            "Chunk": call.get("chunk"),
+            "Seconds": round(call["end"] - call["start"], 3),
+            "Queue Wait": round(children.get(call["span_id"], {}).get("queue_wait", 0.0), 3),
+            "First Token": round(children.get(call["span_id"], {}).get("request", 0.0), 3),
+            "Generation": round(children.get(call["span_id"], {}).get("generation", 0.0), 3),
+            "Input Tokens": call.get("input_tokens"),
+            "Output Tokens": call.get("output_tokens"),
+            "Replayed": "journal" in children.get(call["span_id"], {}),
+        } for call in calls]).sort_values("Seconds", ascending=False)
+        st.dataframe(calls_df.head(50), hide_index=True, width="stretch")
+
+    st.markdown("---")
+    st.caption("Run Traces Dashboard")
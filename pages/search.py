@@ -0,0 +1,89 @@
+import streamlit as st
+import os
+import time
+import pandas as pd
+from dashboard.profiling import page_profiler
+from pipeline.search_index import SearchIndex, build_index, FIELDS, INDEX_DIR, META_FILE, MAX_PREFIX_EXPANSION
+
+st.set_page_config(
+    page_title="Search",
+    page_icon="🔎",
+    layout="wide"
+)
+
+with page_profiler("search") as profiler:
+    st.title("Search Samples and Model Outputs")
+    st.markdown("""
+    Search across the sample documents, the real emails, the ingested email corpus and everything the models produced in
+    `results/`: denoised text, extracted knots, topics and raw outputs. The index is rebuilt after corpus ingest and
+    pipeline runs.
+
+    **Query syntax**: terms are combined with AND, `OR` separates alternatives, `-term` or `NOT term` excludes a term,
+    and `term*` matches every word starting with `term`. For example: `deepseek-v3.1`, `aurora OR cloudsync`, `pricing -deepseek`, `medic*`.
+    """)
+
+
+    @st.cache_resource(show_spinner=False)
+    def load_index(meta_mtime):
+        # The mtime is only part of the cache key, so a rebuilt index is picked up automatically
+        return SearchIndex.load(INDEX_DIR)
+
+
+    meta_path = os.path.join(INDEX_DIR, META_FILE)
+
+    with st.sidebar:
+        st.subheader("Search Index")
+        if os.path.exists(meta_path):
+            st.caption(f"Built {time.strftime('%Y-%m-%d %H:%M', time.localtime(os.path.getmtime(meta_path)))}")
+        if st.button("Rebuild index"):
+            with st.spinner("Indexing samples and results..."):
+                build_index()
+
+    if not os.path.exists(meta_path):
+        st.info("The search index has not been built yet. Use **Rebuild index** in the sidebar or run `python -m pipeline.search_index build`.")
+        st.stop()
+
+    profiler.section("load")
+    index = load_index(os.path.getmtime(meta_path))
+
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        query = st.text_input("Query", placeholder="deepseek-v3.1")
+    with col2:
+        fields = st.multiselect("Fields", FIELDS, help="Leave empty to search all fields")
+
+    profiler.section("search")
+    if query:
+        start = time.perf_counter()
+        truncated = []
+        hits = index.search(query, fields=fields or None, truncated=truncated)
+        elapsed = (time.perf_counter() - start) * 1000
+        if truncated:
+            st.warning(f"Partial results: {', '.join(f'`{term}`' for term in truncated)} matched more than "
+                       f"{MAX_PREFIX_EXPANSION} terms and only the first {MAX_PREFIX_EXPANSION} were searched. "
+                       f"Use a longer prefix.")
+
+        st.caption(f"{len(hits)} documents in {elapsed:.2f} ms ({len(index.docs)} documents, {len(index.terms)} terms indexed)")
+
+        if hits:
+            results_df = pd.DataFrame([
+                {
+                    "Field": index.docs[doc_id]["field"],
+                    "Source": index.docs[doc_id]["source"],
+                    "Run": index.docs[doc_id]["path"],
+                    "Preview": index.docs[doc_id]["preview"],
+                }
+                for doc_id in hits
+            ])
+
+            # Which sources matched, grouped by field
+            st.subheader("Matches by Field")
+            st.bar_chart(results_df["Field"].value_counts())
+
+            st.subheader("Matching Documents")
+            st.dataframe(results_df, hide_index=True, width="stretch")
+        else:
+            st.info("No documents match the query")
+
+    st.markdown("---")
+    st.caption("Search Dashboard")
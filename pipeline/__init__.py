@@ -0,0 +1,6 @@
+"""Data processing used by the dashboard and the command line tools.
+
+Modules in this package must not import Streamlit: they are also run as
+``python -m pipeline.<module>`` from the repository root, where the local
+``streamlit.py`` entry point would shadow the real package.
+"""
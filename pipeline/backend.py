@@ -0,0 +1,351 @@
+"""Chat completion backends for the pipeline runner.
+
+``OpenAIBackend`` talks to any OpenAI-compatible ``/chat/completions``
+endpoint with the standard library only; it is configured through
+``LLM_BASE_URL``, ``LLM_API_KEY`` (or ``OPENAI_API_KEY``) and ``LLM_MODEL``.
+``StubBackend`` answers offline with canned responses and estimated token
+counts, for dry runs of the pipeline without a key.
+
+``complete`` returns a dict with the response ``text`` and the same metrics
+as ``results/`` (``input_tokens``, ``output_tokens``, ``execution_time``,
+``cost``), plus ``cached_input_tokens``, the part of the input the provider
+read from its prompt cache (``pipeline.prompt_cache``). ``stream`` returns a
+``CompletionStream``: iterate it for the text as it is generated, ``close``
+it to stop generation early, and ``result`` gives the same dict as
+``complete``.
+"""
+import http.client
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from pipeline import pricing
+from pipeline.prompt_cache import PrefixCache
+from pipeline.prompts import DOCUMENT_START
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+# Ціни в pipeline/pricing.py відповідають цій моделі
+DEFAULT_MODEL = "gpt-4.1-nano"
+DEFAULT_TIMEOUT = 120
+
+
+# Обрив з'єднання чи таймаут під час читання відповіді, вже після заголовків
+READ_ERRORS = (OSError, http.client.HTTPException)
+
+
+class BackendError(Exception):
+    """A request failed; ``status`` is the HTTP status when there was one"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def _metrics(text, input_tokens, output_tokens, execution_time, cached_input_tokens=0):
+    return {
+        "text": text,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_input_tokens": cached_input_tokens,
+        "execution_time": execution_time,
+        "cost": pricing.cost(input_tokens, output_tokens, cached_input_tokens),
+    }
+
+
+def _usage_metrics(text, usage, execution_time):
+    """Metrics from an OpenAI ``usage`` object; cached tokens are under ``prompt_tokens_details``"""
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    return _metrics(text, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), execution_time, cached)
+
+
+class CompletionStream:
+    """Text pieces of a streamed completion
+
+    ``usage`` is filled in by backends that report it at the end of the
+    stream; otherwise, and always after ``close``, the token counts are
+    estimated from the text (``estimated_tokens`` in the result).
+    ``time_to_first_token`` is the wait for the first piece.
+    """
+
+    def __init__(self, messages, on_close=None, cached_input_tokens=0):
+        self.messages = messages
+        self.cached_input_tokens = cached_input_tokens
+        self.pieces = iter(())
+        self.parts = []
+        self.usage = None
+        self.cancelled = False
+        self.start = time.perf_counter()
+        self.first_piece = None
+        self.end = None
+        self.on_close = on_close
+
+    def __iter__(self):
+        for piece in self.pieces:
+            if self.first_piece is None:
+                self.first_piece = time.perf_counter()
+            self.parts.append(piece)
+            yield piece
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def close(self):
+        """Stop generation; the pieces received so far are kept"""
+        if self.end is None:
+            self.end = time.perf_counter()
+            self.cancelled = True
+        if hasattr(self.pieces, "close"):
+            self.pieces.close()
+        if self.on_close:
+            self.on_close()
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def result(self):
+        text = self.text
+        execution_time = (self.end or time.perf_counter()) - self.start
+        if self.usage and not self.cancelled:
+            metrics = _usage_metrics(text, self.usage, execution_time)
+        else:
+            input_tokens = sum(pricing.estimate_tokens(message["content"]) for message in self.messages)
+            metrics = _metrics(text, input_tokens, pricing.estimate_tokens(text), execution_time,
+                               self.cached_input_tokens)
+            metrics["estimated_tokens"] = True
+        if self.first_piece is not None:
+            metrics["time_to_first_token"] = self.first_piece - self.start
+        return metrics
+
+
+class OpenAIBackend:
+    name = "openai"
+
+    def __init__(self, model=None, base_url=None, api_key=None, timeout=DEFAULT_TIMEOUT):
+        self.model = model or os.environ.get("LLM_MODEL", DEFAULT_MODEL)
+        self.base_url = (base_url or os.environ.get("LLM_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.api_key = api_key or os.environ.get("LLM_API_KEY") or os.environ.get("OPENAI_API_KEY")
+        self.timeout = timeout
+        if not self.api_key:
+            raise BackendError("Set LLM_API_KEY or OPENAI_API_KEY, or use the stub backend")
+
+    def request(self, path, stage=None, data=None, method="POST", content_type="application/json"):
+        """Open ``base_url + path``; the caller reads and closes the response"""
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        if data is not None:
+            headers["Content-Type"] = content_type
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data, method=method, headers=headers)
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            raise BackendError(f"{stage or 'request'} failed: HTTP {e.code} {e.read()[:500]!r}", e.code) from e
+        except (urllib.error.URLError, TimeoutError) as e:
+            raise BackendError(f"{stage or 'request'} failed: {str(e)}") from e
+
+    def _open(self, body, stage):
+        return self.request("/chat/completions", stage, json.dumps(body).encode("utf-8"))
+
+    def complete(self, messages, stage=None):
+        start = time.perf_counter()
+        with self._open({"model": self.model, "messages": messages, "temperature": 0}, stage) as response:
+            try:
+                payload = json.load(response)
+            except READ_ERRORS as e:
+                raise BackendError(f"{stage or 'request'} failed while reading: {e!r}") from e
+        execution_time = time.perf_counter() - start
+        text = payload["choices"][0]["message"]["content"] or ""
+        return _usage_metrics(text, payload.get("usage", {}), execution_time)
+
+    def stream(self, messages, stage=None):
+        body = {"model": self.model, "messages": messages, "temperature": 0, "stream": True,
+                "stream_options": {"include_usage": True}}
+        stream = CompletionStream(messages)
+        response = self._open(body, stage)
+        # Закрите з'єднання зупиняє генерацію на сервері
+        stream.on_close = response.close
+        stream.pieces = self._events(response, stream, stage)
+        return stream
+
+    @staticmethod
+    def _events(response, stream, stage=None):
+        """Content deltas of a server-sent event stream; the usage arrives in the last event
+
+        A connection that breaks while the stream is read raises ``BackendError``
+        without a status, so it is retried like a failed request.
+        """
+        with response:
+            try:
+                yield from OpenAIBackend._read_events(response, stream)
+            except READ_ERRORS as e:
+                raise BackendError(f"{stage or 'request'} stream interrupted: {e!r}") from e
+
+    @staticmethod
+    def _read_events(response, stream):
+        """Parses the event lines of ``_events``"""
+        for line in response:
+            line = line.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            payload = json.loads(data)
+            if payload.get("usage"):
+                stream.usage = payload["usage"]
+            for choice in payload.get("choices") or []:
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    yield content
+
+
+class StubBackend:
+    """Offline backend: fixed answers per stage, token counts estimated from the text
+
+    Prompt prefixes go through a simulated provider cache (``PrefixCache``,
+    with prefixes of at least ``cache_min_tokens``): cached input tokens are
+    billed at the cached price and skip the simulated prefill time of
+    ``prefill_latency`` seconds per 1,000 input tokens. Packed requests get
+    the canned answer once per document. With ``rpm_limit``/``tpm_limit`` it
+    answers HTTP 429 like a provider when a request does not fit in the
+    minute's quota, which is replenished continuously. A ``tail_share`` of
+    the requests take ``tail_factor`` times the usual latency, like the slow
+    tail of a real provider.
+
+    For load tests ``latency`` is the mean of a ``latency_distribution``
+    (``fixed``, ``exponential`` or ``lognormal`` with ``latency_sigma``),
+    the answer is generated at ``tokens_per_second``, an ``error_rate`` of
+    the requests fail with HTTP 500 and a ``truncation_rate`` of the answers
+    are cut off halfway, as when the output hits its token limit.
+    """
+    name = "stub"
+
+    DEFAULT_RESPONSES = {
+        "category": "BUSINESS_CORPORATE",
+    }
+    DEFAULT_RESPONSE = '{"category": null, "extracted_data": {}}'
+    LATENCY_DISTRIBUTIONS = ("fixed", "exponential", "lognormal")
+    _DOCUMENT_RE = re.compile("^" + re.escape(DOCUMENT_START).replace(r"\{id\}", r"(\w+)") + "$", re.MULTILINE)
+
+    def __init__(self, responses=None, latency=0.0, stream_chunk_chars=16, stream_delay=0.0, prefill_latency=0.0,
+                 cache_min_tokens=None, rpm_limit=None, tpm_limit=None, tail_share=0.0, tail_factor=10.0,
+                 seed=None, latency_distribution="fixed", latency_sigma=0.5, tokens_per_second=None,
+                 error_rate=0.0, truncation_rate=0.0):
+        if latency_distribution not in self.LATENCY_DISTRIBUTIONS:
+            raise BackendError(f"Unknown latency distribution: {latency_distribution}")
+        self.responses = {**self.DEFAULT_RESPONSES, **(responses or {})}
+        self.latency = latency
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_delay = stream_delay
+        self.prefill_latency = prefill_latency
+        self.prompt_cache = PrefixCache() if cache_min_tokens is None else PrefixCache(cache_min_tokens)
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.tail_share = tail_share
+        self.tail_factor = tail_factor
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.truncation_rate = truncation_rate
+        self._random = random.Random(seed)
+        # Як у провайдера: хвилинна квота, що поповнюється безперервно
+        self._quota = {"requests": rpm_limit or 0, "tokens": tpm_limit or 0}
+        self._quota_updated = time.monotonic()
+        self._quota_lock = threading.Lock()
+
+    def _check_quota(self, tokens):
+        """Take a request from the minute's quota; HTTP 429 when it does not fit"""
+        limits = [(name, limit, amount) for name, limit, amount in
+                  (("requests", self.rpm_limit, 1), ("tokens", self.tpm_limit, tokens)) if limit]
+        if not limits:
+            return
+        with self._quota_lock:
+            now = time.monotonic()
+            for name, limit, _ in limits:
+                self._quota[name] = min(limit, self._quota[name] + (now - self._quota_updated) * limit / 60)
+            self._quota_updated = now
+            if any(self._quota[name] < amount for name, _, amount in limits):
+                raise BackendError("rate limit exceeded: HTTP 429", 429)
+            for name, _, amount in limits:
+                self._quota[name] -= amount
+
+    def _answer(self, messages, stage):
+        text = self._canned(messages, stage)
+        if self.truncation_rate and self._random.random() < self.truncation_rate:
+            return text[:len(text) // 2]
+        return text
+
+    def _canned(self, messages, stage):
+        text = self.responses.get(stage, self.DEFAULT_RESPONSE)
+        ids = self._DOCUMENT_RE.findall(messages[-1]["content"])
+        if not ids:
+            return text
+        if stage == "category":
+            return "\n".join(f"{doc_id}: {text}" for doc_id in ids)
+        try:
+            answer = json.loads(text)
+        except ValueError:
+            answer = None
+        return json.dumps({"documents": {doc_id: answer for doc_id in ids}})
+
+    def _latency(self):
+        """Seconds of a request before prefill, drawn from the latency distribution with mean ``latency``"""
+        if not self.latency or self.latency_distribution == "fixed":
+            return self.latency
+        if self.latency_distribution == "exponential":
+            return self._random.expovariate(1 / self.latency)
+        # mu так, щоб середнє лишалося latency
+        return self._random.lognormvariate(math.log(self.latency) - self.latency_sigma ** 2 / 2, self.latency_sigma)
+
+    def _generation_time(self, text):
+        return pricing.estimate_tokens(text) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _request(self, messages):
+        """(input tokens, cached input tokens, seconds before the first token) of a request"""
+        input_tokens = sum(pricing.estimate_tokens(message["content"]) for message in messages)
+        self._check_quota(input_tokens)
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise BackendError("simulated server error: HTTP 500", 500)
+        cached = self.prompt_cache.lookup(messages)
+        delay = self._latency() + self.prefill_latency * (input_tokens - cached) / 1000
+        if self.tail_share and self._random.random() < self.tail_share:
+            delay *= self.tail_factor
+        return input_tokens, cached, delay
+
+    def complete(self, messages, stage=None):
+        start = time.perf_counter()
+        input_tokens, cached, delay = self._request(messages)
+        text = self._answer(messages, stage)
+        delay += self._generation_time(text)
+        if delay:
+            time.sleep(delay)
+        return _metrics(text, input_tokens, pricing.estimate_tokens(text), time.perf_counter() - start, cached)
+
+    def stream(self, messages, stage=None):
+        """The canned response in pieces of ``stream_chunk_chars``, ``stream_delay`` seconds apart"""
+        _, cached, delay = self._request(messages)
+        stream = CompletionStream(messages, cached_input_tokens=cached)
+        stream.pieces = self._pieces(self._answer(messages, stage), delay)
+        return stream
+
+    def _pieces(self, text, delay):
+        if delay:
+            time.sleep(delay)
+        for i in range(0, len(text), self.stream_chunk_chars):
+            piece = text[i:i + self.stream_chunk_chars]
+            pause = self.stream_delay + self._generation_time(piece)
+            if pause:
+                time.sleep(pause)
+            yield piece
+
+
+BACKENDS = {"openai": OpenAIBackend, "stub": StubBackend}
+
+
+def get_backend(name="openai", **options):
+    return BACKENDS[name](**options)
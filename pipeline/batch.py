@@ -0,0 +1,226 @@
+"""Batch jobs: many chat completions submitted as one JSONL file.
+
+A batch is a file of requests in the OpenAI batch format, one per line, each
+with a ``custom_id``; the endpoint processes it in the background and returns
+a file of answers with the same ids. Nothing stays open while it runs, so a
+run over thousands of documents holds no connections, and batch requests are
+billed at ``BATCH_DISCOUNT`` of the interactive price.
+
+``OpenAIBatchEndpoint`` uses the ``/files`` and ``/batches`` API of an
+OpenAI-compatible server. ``LocalBatchEndpoint`` is a stand-in that keeps
+batches in a directory and answers them with any backend (the stub for dry
+runs) when they are polled. Both are used the same way::
+
+    batch_id = endpoint.submit("requests.jsonl")
+    wait(endpoint, batch_id)
+    endpoint.fetch(batch_id, "output.jsonl")
+    for custom_id, completion in read_outputs("output.jsonl"):
+        ...
+
+``pipeline.runner --batch`` builds the request files and turns the answers
+back into results.
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+
+from pipeline import pricing
+from pipeline.backend import BackendError
+
+BATCH_DIR = os.path.join("indexes", "batches")
+# Батчі OpenAI коштують половину звичайної ціни
+BATCH_DISCOUNT = 0.5
+COMPLETION_WINDOW = "24h"
+POLL_INTERVAL = 30
+DONE_STATUSES = ("completed", "failed", "expired", "cancelled")
+_ID_SEPARATOR = "/"
+
+
+def custom_id(index, stage, chunk=0):
+    """Id of one request: document index, stage and chunk"""
+    return _ID_SEPARATOR.join((str(index), stage, str(chunk)))
+
+
+def parse_custom_id(value):
+    """(document index, stage, chunk) of a ``custom_id``"""
+    index, stage, chunk = value.split(_ID_SEPARATOR)
+    return int(index), stage, int(chunk)
+
+
+def request_line(request_id, messages, model):
+    return {"custom_id": request_id, "method": "POST", "url": "/v1/chat/completions",
+            "body": {"model": model, "messages": messages, "temperature": 0}}
+
+
+def write_requests(path, requests):
+    """Write ``(custom_id, messages, model)`` tuples as a batch file, one at a time; returns the count"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for request_id, messages, model in requests:
+            f.write(json.dumps(request_line(request_id, messages, model), ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def completion_metrics(text, usage):
+    """The metrics of ``pipeline.backend`` for one batch answer, at the batch price"""
+    input_tokens = usage.get("prompt_tokens", 0)
+    output_tokens = usage.get("completion_tokens", 0)
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    return {
+        "text": text,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_input_tokens": cached,
+        # Окремий запит у батчі не має власного часу виконання
+        "execution_time": 0.0,
+        "cost": pricing.cost(input_tokens, output_tokens, cached) * BATCH_DISCOUNT,
+    }
+
+
+def read_outputs(path):
+    """``(custom_id, completion)`` for every answer in a batch output file; failed requests get an ``error``"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            body = response.get("body") or {}
+            if item.get("error") or response.get("status_code", 200) >= 400 or not body.get("choices"):
+                completion = completion_metrics("", {})
+                completion["error"] = item.get("error") or body.get("error") or f"HTTP {response.get('status_code')}"
+            else:
+                completion = completion_metrics(body["choices"][0]["message"]["content"] or "",
+                                                body.get("usage") or {})
+            yield item["custom_id"], completion
+
+
+def wait(endpoint, batch_id, interval=POLL_INTERVAL, timeout=None, progress=None):
+    """Poll until the batch is done; returns its last status"""
+    start = time.monotonic()
+    while True:
+        status = endpoint.poll(batch_id)
+        if progress:
+            progress(status)
+        if status["status"] in DONE_STATUSES:
+            return status
+        if timeout is not None and time.monotonic() - start > timeout:
+            raise BackendError(f"batch {batch_id} not done after {timeout}s: {status['status']}")
+        time.sleep(interval)
+
+
+class OpenAIBatchEndpoint:
+    """Batches on an OpenAI-compatible server, through the connection settings of an ``OpenAIBackend``"""
+
+    def __init__(self, backend, completion_window=COMPLETION_WINDOW):
+        self.backend = backend
+        self.model = backend.model
+        self.completion_window = completion_window
+
+    def _json(self, path, body=None, method="POST"):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        with self.backend.request(path, "batch", data, method) as response:
+            return json.load(response)
+
+    def submit(self, input_path):
+        boundary = uuid.uuid4().hex
+        with open(input_path, "rb") as f:
+            content = f.read()
+        data = (f'--{boundary}\r\nContent-Disposition: form-data; name="purpose"\r\n\r\nbatch\r\n'
+                f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+                f'filename="{os.path.basename(input_path)}"\r\nContent-Type: application/jsonl\r\n\r\n'
+                ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+        with self.backend.request("/files", "batch upload", data,
+                                  content_type=f"multipart/form-data; boundary={boundary}") as response:
+            file_id = json.load(response)["id"]
+        batch = self._json("/batches", {"input_file_id": file_id, "endpoint": "/v1/chat/completions",
+                                        "completion_window": self.completion_window})
+        return batch["id"]
+
+    def poll(self, batch_id):
+        batch = self._json(f"/batches/{batch_id}", method="GET")
+        return {"status": batch["status"], "counts": batch.get("request_counts") or {},
+                "output_file_id": batch.get("output_file_id"), "error_file_id": batch.get("error_file_id")}
+
+    def fetch(self, batch_id, output_path):
+        """Download the answers (and the failed requests) of a finished batch into ``output_path``"""
+        status = self.poll(batch_id)
+        with open(output_path, "wb") as out:
+            for file_id in (status["output_file_id"], status["error_file_id"]):
+                if file_id:
+                    with self.backend.request(f"/files/{file_id}/content", "batch download",
+                                              method="GET") as response:
+                        shutil.copyfileobj(response, out)
+        return output_path
+
+
+class LocalBatchEndpoint:
+    """File-based stand-in for a batch endpoint: ``directory/<batch id>/`` holds the input, status and output
+
+    The batch is answered by ``backend`` one line at a time when it is first
+    polled, the way a remote endpoint would work through it in the background.
+    """
+
+    def __init__(self, backend, directory=BATCH_DIR, model="local"):
+        self.backend = backend
+        self.directory = directory
+        self.model = model
+
+    def _path(self, batch_id, name):
+        return os.path.join(self.directory, batch_id, name)
+
+    def _write_status(self, batch_id, status):
+        with open(self._path(batch_id, "status.json"), "w", encoding="utf-8") as f:
+            json.dump(status, f)
+
+    def submit(self, input_path):
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(self.directory, batch_id))
+        shutil.copyfile(input_path, self._path(batch_id, "input.jsonl"))
+        self._write_status(batch_id, {"status": "validating", "counts": {}, "created_at": time.time()})
+        return batch_id
+
+    def poll(self, batch_id):
+        with open(self._path(batch_id, "status.json"), "r", encoding="utf-8") as f:
+            status = json.load(f)
+        if status["status"] == "validating":
+            status = self._process(batch_id, status)
+        return status
+
+    def _process(self, batch_id, status):
+        completed = failed = 0
+        with open(self._path(batch_id, "input.jsonl"), "r", encoding="utf-8") as requests, \
+                open(self._path(batch_id, "output.jsonl"), "w", encoding="utf-8") as out:
+            for line in requests:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                item = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                        "response": None, "error": None}
+                try:
+                    _, stage, _ = parse_custom_id(request["custom_id"])
+                    completion = self.backend.complete(request["body"]["messages"], stage=stage)
+                except (BackendError, ValueError) as e:
+                    item["error"] = {"message": str(e)}
+                    failed += 1
+                else:
+                    usage = {"prompt_tokens": completion["input_tokens"],
+                             "completion_tokens": completion["output_tokens"],
+                             "prompt_tokens_details": {"cached_tokens": completion.get("cached_input_tokens", 0)}}
+                    item["response"] = {"status_code": 200, "body": {
+                        "choices": [{"message": {"role": "assistant", "content": completion["text"]}}],
+                        "usage": usage}}
+                    completed += 1
+                out.write(json.dumps(item, ensure_ascii=False) + "\n")
+        status = {**status, "status": "completed", "completed_at": time.time(),
+                  "counts": {"total": completed + failed, "completed": completed, "failed": failed}}
+        self._write_status(batch_id, status)
+        return status
+
+    def fetch(self, batch_id, output_path):
+        shutil.copyfile(self._path(batch_id, "output.jsonl"), output_path)
+        return output_path
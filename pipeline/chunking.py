@@ -0,0 +1,195 @@
+"""Split documents into chunks and choose the chunking threshold per document.
+
+``split_chunks`` packs whole sections (Markdown or HTML headings, horizontal
+rules) into chunks of at most the threshold, and falls back to paragraphs,
+lines and finally a hard cut for sections that do not fit.
+
+``choose_threshold`` picks a threshold for one document from the stored
+runs. Cost and time come from ``pipeline.predictor``. Quality is the number of
+unique knots extracted; how much it changes with the number of chunks differs
+per document (``file_comparison_1`` extracts about as many at 32k as at 16k,
+``file_comparison_3`` a third fewer), so the chunk elasticity of quality is
+taken from the recorded document closest in structure density and size::
+
+    python -m pipeline.chunking samples/technical_test_doc_3.txt --approach separate
+"""
+import argparse
+import math
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from pipeline.predictor import QUALITY_COLUMN, SAMPLES_DIR, RunPredictor, document_records
+from pipeline.results_index import build_results_index
+
+THRESHOLD_CANDIDATES = (16000, 32000)
+# Ваги критеріїв: кожен рахується відносно найкращого кандидата, тож 1.0 — рівна вага
+OBJECTIVES = {
+    "balanced": {"cost": 1.0, "execution_time": 1.0, "quality": 1.0},
+    "cost": {"cost": 1.0, "execution_time": 0.0, "quality": 0.0},
+    "latency": {"cost": 0.0, "execution_time": 1.0, "quality": 0.0},
+    "quality": {"cost": 0.0, "execution_time": 0.0, "quality": 1.0},
+}
+DEFAULT_OBJECTIVE = "balanced"
+
+_SECTION_RE = re.compile(r"^(#{1,6}\s|-{3,}\s*$|\*{3,}\s*$|<h[1-6][\s>])", re.IGNORECASE)
+
+
+def is_section_break(line):
+    return bool(_SECTION_RE.match(line.lstrip()))
+
+
+def structure_density(text, chars_per_token):
+    """Section breaks (headings, rules) per 1,000 tokens"""
+    tokens = len(text) / chars_per_token
+    if not tokens:
+        return 0.0
+    breaks = sum(1 for line in text.splitlines() if is_section_break(line))
+    return breaks * 1000 / tokens
+
+
+def _sections(text):
+    section = []
+    for line in text.splitlines(keepends=True):
+        if section and is_section_break(line):
+            yield "".join(section)
+            section = []
+        section.append(line)
+    if section:
+        yield "".join(section)
+
+
+def _split_oversized(piece, max_chars):
+    """Paragraphs, then lines, then fixed slices of a piece longer than ``max_chars``"""
+    for separator in ("\n\n", "\n"):
+        parts = piece.split(separator)
+        pieces = [part for part in [part + separator for part in parts[:-1]] + [parts[-1]] if part]
+        # Шматок, що лише закінчується роздільником, так не ділиться — пробуємо дрібніший
+        if len(pieces) > 1:
+            return [p for part in pieces for p in _fit(part, max_chars)]
+    return [piece[i:i + max_chars] for i in range(0, len(piece), max_chars)]
+
+
+def _fit(piece, max_chars):
+    return [piece] if len(piece) <= max_chars else _split_oversized(piece, max_chars)
+
+
+def split_chunks(text, max_tokens, chars_per_token):
+    """Chunks of at most ``max_tokens`` estimated tokens, cut at the strongest boundary available"""
+    max_chars = max(1, int(max_tokens * chars_per_token))
+    if len(text) <= max_chars:
+        return [text]
+    chunks, current = [], ""
+    for section in _sections(text):
+        for piece in _fit(section, max_chars):
+            if current and len(current) + len(piece) > max_chars:
+                chunks.append(current)
+                current = ""
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _log_chunks(runs):
+    return np.log([max(1, math.ceil(d / t)) for d, t in zip(runs["document_tokens"], runs["chunking_threshold"])])
+
+
+def quality_curves(records, chars_per_token, root="."):
+    """Per recorded document and approach: size, structure density and chunk elasticity of quality
+
+    The elasticity ``s`` is the slope of log(knots) over log(chunks) across
+    the thresholds the document was run with: quality ∝ chunks^s.
+    """
+    curves = []
+    documents = document_records(records).dropna(subset=[QUALITY_COLUMN])
+    for (document, approach), runs in documents.groupby(["document", "approach"]):
+        path = os.path.join(root, SAMPLES_DIR, os.path.basename(str(document)))
+        log_chunks = _log_chunks(runs)
+        if not os.path.isfile(path) or np.ptp(log_chunks) == 0:
+            continue
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            density = structure_density(f.read(), chars_per_token)
+        slope = np.polyfit(log_chunks, np.log(runs[QUALITY_COLUMN].astype(float)), 1)[0]
+        curves.append({"document": document, "approach": approach, "document_tokens": runs["document_tokens"].iloc[0],
+                       "structure_density": density, "elasticity": float(slope)})
+    return curves
+
+
+def nearest_curve(curves, approach, document_tokens, density):
+    """The curve of the recorded document most similar in structure density and size"""
+    candidates = [curve for curve in curves if curve["approach"] == approach]
+    # Порожній документ не має розміру, з яким можна порівняти
+    if not candidates or document_tokens <= 0:
+        return None
+    return min(candidates, key=lambda curve: abs(math.log((density + 1) / (curve["structure_density"] + 1)))
+               + abs(math.log(document_tokens / curve["document_tokens"])))
+
+
+def choose_threshold(text, approach, predictor, curves, candidates=THRESHOLD_CANDIDATES,
+                     objective=DEFAULT_OBJECTIVE):
+    """Threshold with the lowest weighted score for one document, with every candidate's prediction
+
+    Each candidate is scored by its cost and time relative to the cheapest and
+    fastest candidate and by the best candidate's quality relative to its own,
+    weighted by ``OBJECTIVES[objective]``. Ties go to the larger threshold
+    (fewer calls). An empty document is predicted as a one-token one, without
+    a quality reference, so it never stops a run.
+    """
+    document_tokens = predictor.document_tokens(text)
+    density = structure_density(text, predictor.chars_per_token)
+    curve = nearest_curve(curves, approach, document_tokens, density)
+    elasticity = curve["elasticity"] if curve else 0.0
+    rows = []
+    for threshold in sorted(set(candidates)):
+        chunks = max(1, len(split_chunks(text, threshold, predictor.chars_per_token)))
+        # Порожній документ — один виклик з самим промптом, як документ в один токен
+        row = predictor.predict(max(1, document_tokens), approach, threshold, chunks)
+        row["relative_quality"] = chunks ** elasticity
+        rows.append(row)
+    best = {"cost": min(r["cost"] for r in rows), "execution_time": min(r["execution_time"] for r in rows),
+            "quality": max(r["relative_quality"] for r in rows)}
+    weights = OBJECTIVES[objective]
+    for row in rows:
+        row["relative_quality"] /= best["quality"]
+        row["score"] = (weights["cost"] * row["cost"] / best["cost"]
+                        + weights["execution_time"] * row["execution_time"] / best["execution_time"]
+                        + weights["quality"] / row["relative_quality"])
+    chosen = min(rows, key=lambda r: (round(r["score"], 6), -r["chunking_threshold"]))
+    return {
+        "threshold": chosen["chunking_threshold"],
+        "objective": objective,
+        "document_tokens": document_tokens,
+        "structure_density": round(density, 2),
+        "quality_reference": curve["document"] if curve else None,
+        "quality_elasticity": round(elasticity, 3),
+        "predicted": chosen,
+        "candidates": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Choose the chunking threshold for documents")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--approach", default="separate")
+    parser.add_argument("--candidates", type=int, nargs="+", default=list(THRESHOLD_CANDIDATES))
+    parser.add_argument("--objective", choices=sorted(OBJECTIVES), default=DEFAULT_OBJECTIVE)
+    args = parser.parse_args()
+
+    records = pd.DataFrame(build_results_index())
+    predictor = RunPredictor.fit(records)
+    curves = quality_curves(records, predictor.chars_per_token)
+    for path in args.paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            choice = choose_threshold(f.read(), args.approach, predictor, curves, args.candidates, args.objective)
+        print(f"{path}: {choice['threshold']} ({choice['document_tokens']:,} tokens, "
+              f"{choice['structure_density']} breaks per 1k tokens, quality like {choice['quality_reference']})")
+        for row in choice["candidates"]:
+            print(f"  {row['chunking_threshold']:>7} {row['chunks']:>3} chunks  ${row['cost']:.4f}  "
+                  f"{row['execution_time']:6.0f}s  quality {row['relative_quality']:.2f}  score {row['score']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
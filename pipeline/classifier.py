@@ -0,0 +1,260 @@
+"""Local document category classifier: hashed n-grams and a linear model.
+
+The original approach spends a model call on the category alone (about 1,400
+input tokens for a 5 token answer). This classifier predicts the same labels
+offline; the runner skips the model call when it is confident and falls back
+to the model otherwise.
+
+Training data are the sample documents whose category the model already
+returned in ``results/`` (see ``labeled_samples``). Word unigrams and bigrams
+are hashed into ``HASH_DIMENSIONS`` buckets, and a softmax regression is
+trained on whole documents plus overlapping windows of them. Training is an
+explicit step; the runner and ``predict`` only load the saved model from
+``indexes/`` and stop with a hint when it is missing::
+
+    python -m pipeline.classifier evaluate     # leave-one-document-group-out
+    python -m pipeline.classifier train
+    python -m pipeline.classifier predict samples/real_file/medical_real.txt
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+from pipeline.prompts import CATEGORIES, CATEGORY_PROMPT, SCHEMAS
+
+CLASSIFIER_PATH = os.environ.get("CATEGORY_CLASSIFIER", os.path.join("indexes", "category_classifier.npz"))
+HASH_DIMENSIONS = 2 ** 18
+WINDOW_WORDS = 200
+EPOCHS = 60
+LEARNING_RATE = 0.5
+L2 = 1e-4
+# Нижче цієї впевненості категорію визначає модель
+DEFAULT_THRESHOLD = 0.6
+
+# Category runs in results/ that have no file name, and the samples they were run on
+CATEGORY_RUN_SAMPLES = {
+    "business_and_corporate_.json": "business_and_corporate_test_doc.txt",
+    "healthcare_medical.json": "healthcare_medical_test_doc.txt",
+    "it_software.json": "it_test_doc.txt",
+    "legal_government.json": "legal_government_test_doc.txt",
+    "scientific_research.json": "academic_test_doc.txt",
+}
+
+# Службові слова однаково часті в усіх категоріях і лише зсувають модель до найбільшого класу
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each either etc few for from further had has have having he her here
+hers herself him himself his how however i if in into is it its itself just may me might more most must my myself no
+nor not now of off on once only or other our ours ourselves out over own per same shall she should so some such than
+that the their theirs them themselves then there these they this those through to too under until up upon us very via
+was we were what when where whether which while who whom why will with within without would yet you your yours
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9'_-]+")
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def read_text(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def document_group(path):
+    """Variants of one document (clean, real, with noise, HTML) share a group"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"_(real|with_noise)", "", stem)
+
+
+def labeled_samples(root="."):
+    """(sample path, label, group) for every sample the model has categorized"""
+    samples = {}
+    for path in glob.glob(os.path.join(root, "results", "real_file", "*_result.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        label = data.get("file_category")
+        # file_path у результатах — шлях на іншій машині, тож зразок шукаємо за ім'ям результату
+        stem = os.path.basename(path)[:-len("_result.json")]
+        candidates = sorted(glob.glob(os.path.join(root, "samples", "real_file", stem + ".*")))
+        if label in CATEGORIES and candidates:
+            samples[candidates[0]] = label
+    for result_name, sample_name in CATEGORY_RUN_SAMPLES.items():
+        result_path = os.path.join(root, "results", result_name)
+        sample_path = os.path.join(root, "samples", sample_name)
+        if os.path.exists(result_path) and os.path.exists(sample_path):
+            with open(result_path, "r", encoding="utf-8") as f:
+                label = json.load(f).get("original_approach", {}).get("file_category")
+            if label in CATEGORIES:
+                samples[sample_path] = label
+    return [(path, label, document_group(path)) for path, label in sorted(samples.items())]
+
+
+def tokenize(text):
+    return [word for word in _TOKEN_RE.findall(_TAG_RE.sub(" ", text).lower()) if word not in STOP_WORDS]
+
+
+def features(text):
+    """Sparse (indices, values): log-scaled counts of hashed unigrams and bigrams, L2-normalized"""
+    words = tokenize(text)
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not grams:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    hashed = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.int64, count=len(grams))
+    indices, counts = np.unique(hashed % HASH_DIMENSIONS, return_counts=True)
+    values = np.log1p(counts).astype(np.float32)
+    values /= np.linalg.norm(values)
+    return indices, values
+
+
+def windows(text, size=WINDOW_WORDS):
+    """The whole text plus overlapping windows of ``size`` words, for training"""
+    words = _TAG_RE.sub(" ", text).split()
+    chunks = [text]
+    for start in range(0, max(1, len(words) - size // 2), size // 2):
+        chunks.append(" ".join(words[start:start + size]))
+    return chunks
+
+
+class CategoryClassifier:
+    def __init__(self, labels, weights=None, bias=None):
+        self.labels = list(labels)
+        self.weights = weights if weights is not None else np.zeros((len(self.labels), HASH_DIMENSIONS), np.float32)
+        self.bias = bias if bias is not None else np.zeros(len(self.labels), np.float32)
+
+    def _probabilities(self, indices, values):
+        logits = self.weights[:, indices] @ values + self.bias
+        logits -= logits.max()
+        exp = np.exp(logits)
+        return exp / exp.sum()
+
+    def fit(self, texts, labels, epochs=EPOCHS, learning_rate=LEARNING_RATE, l2=L2, seed=0):
+        """Softmax regression with plain SGD over the sparse examples
+
+        Examples are weighted so that every class contributes equally; long
+        documents produce many windows and would otherwise decide the prior.
+        The bias stays at zero for the same reason.
+        """
+        examples = [features(text) for text in texts]
+        targets = [self.labels.index(label) for label in labels]
+        counts = np.bincount(targets, minlength=len(self.labels))
+        weights = [len(targets) / (len(self.labels) * counts[target]) for target in targets]
+        order = np.random.default_rng(seed)
+        for epoch in range(epochs):
+            rate = learning_rate / (1 + epoch * 0.1)
+            for i in order.permutation(len(examples)):
+                indices, values = examples[i]
+                gradient = self._probabilities(indices, values)
+                gradient[targets[i]] -= 1
+                gradient *= weights[i]
+                self.weights[:, indices] -= rate * (np.outer(gradient, values) + l2 * self.weights[:, indices])
+        return self
+
+    def predict_proba(self, text):
+        return dict(zip(self.labels, self._probabilities(*features(text)).tolist()))
+
+    def predict(self, text):
+        """(label, confidence)"""
+        probabilities = self._probabilities(*features(text))
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+    def save(self, path=CLASSIFIER_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, labels=np.array(self.labels), weights=self.weights, bias=self.bias)
+
+    @classmethod
+    def load(cls, path=CLASSIFIER_PATH):
+        data = np.load(path)
+        return cls([str(label) for label in data["labels"]], data["weights"], data["bias"])
+
+
+def seed_texts():
+    """(text, label) per category from the category prompt and the extraction template field names"""
+    descriptions = dict(line.split(" - ", 1) for line in CATEGORY_PROMPT.splitlines() if " - " in line)
+    seeds = []
+    for label, schema in SCHEMAS.items():
+        fields = " ".join(_field_names(schema)).replace("_", " ")
+        seeds.append((f"{CATEGORIES[label].replace('_', ' ')} {descriptions.get(label, '')} {fields}", label))
+    return seeds
+
+
+def _field_names(schema):
+    for key, value in schema.items():
+        yield key
+        if isinstance(value, dict):
+            yield from _field_names(value)
+
+
+def train(samples):
+    texts, labels = [], []
+    for text, label in seed_texts():
+        texts.append(text)
+        labels.append(label)
+    for path, label, _ in samples:
+        for chunk in windows(read_text(path)):
+            texts.append(chunk)
+            labels.append(label)
+    return CategoryClassifier(sorted(CATEGORIES)).fit(texts, labels)
+
+
+def load_classifier(path=CLASSIFIER_PATH):
+    """The saved classifier; ``python -m pipeline.classifier train`` creates it"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No category classifier at {path}; train it first with "
+                                f"`python -m pipeline.classifier train`")
+    return CategoryClassifier.load(path)
+
+
+def evaluate(samples, threshold=DEFAULT_THRESHOLD):
+    """Leave-one-group-out predictions: every document is classified by a model that never saw its group"""
+    rows = []
+    for group in sorted({group for _, _, group in samples}):
+        held_out = [sample for sample in samples if sample[2] == group]
+        classifier = train([sample for sample in samples if sample[2] != group])
+        for path, label, _ in held_out:
+            predicted, confidence = classifier.predict(read_text(path))
+            rows.append({"document": os.path.basename(path), "label": label, "predicted": predicted,
+                         "confidence": confidence, "local": confidence >= threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and evaluate the local category classifier")
+    parser.add_argument("command", choices=["train", "evaluate", "predict"])
+    parser.add_argument("paths", nargs="*", help="predict: documents to classify")
+    parser.add_argument("--model", default=CLASSIFIER_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    samples = labeled_samples()
+    if args.command == "train":
+        train(samples).save(args.model)
+        print(f"Trained on {len(samples)} documents, saved to {args.model}")
+    elif args.command == "evaluate":
+        rows = evaluate(samples, args.threshold)
+        for row in rows:
+            mark = "ok" if row["predicted"] == row["label"] else "WRONG"
+            route = "local" if row["local"] else "model"
+            print(f"{row['document']:<40} {row['label']:<20} {row['predicted']:<20} "
+                  f"{row['confidence']:.2f} {route:<6} {mark}")
+        local = [row for row in rows if row["local"]]
+        correct = sum(row["predicted"] == row["label"] for row in rows)
+        local_correct = sum(row["predicted"] == row["label"] for row in local)
+        print(f"accuracy {correct}/{len(rows)}; above threshold {len(local)}/{len(rows)} "
+              f"with {local_correct}/{len(local)} correct")
+    else:
+        try:
+            classifier = load_classifier(args.model)
+        except FileNotFoundError as e:
+            raise SystemExit(str(e))
+        for path in args.paths:
+            label, confidence = classifier.predict(read_text(path))
+            print(f"{path}: {label} ({confidence:.2f})")
+
+
+if __name__ == "__main__":
+    main()
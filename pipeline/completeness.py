@@ -0,0 +1,88 @@
+"""Field-level completeness of ``extracted_data`` trees.
+
+Each result is flattened once into rows of (document, variant, section, field,
+filled). Everything else is a group-by over that table, so scoring any number
+of documents and variants (clean / with_noise / original) is a handful of
+vectorized pandas operations instead of nested loops per version.
+
+The counting rules are the ones the dashboard always used: each field of a
+dict section is one field, a list section counts as a single field, and a
+field is filled when its value is truthy (non-empty string, list or dict).
+"""
+import pandas as pd
+
+TABLE_COLUMNS = ["document", "variant", "section", "field", "filled"]
+LIST_SECTION_FIELD = "(list)"
+
+
+def flatten_extracted_data(extracted_data):
+    """(section, field, filled) triples for one ``extracted_data`` dict"""
+    rows = []
+    for section, section_data in extracted_data.items():
+        if isinstance(section_data, dict):
+            rows.extend((section, field, bool(value)) for field, value in section_data.items())
+        elif isinstance(section_data, list):
+            rows.append((section, LIST_SECTION_FIELD, bool(section_data)))
+    return rows
+
+
+def field_table(results):
+    """Field-level table from ``(document, variant, extracted_data)`` triples"""
+    documents, variants, sections, fields, filled = [], [], [], [], []
+    for document, variant, extracted_data in results:
+        rows = flatten_extracted_data(extracted_data or {})
+        documents.extend([document] * len(rows))
+        variants.extend([variant] * len(rows))
+        for section, field, is_filled in rows:
+            sections.append(section)
+            fields.append(field)
+            filled.append(is_filled)
+    return pd.DataFrame({
+        "document": pd.Categorical(documents),
+        "variant": pd.Categorical(variants),
+        "section": pd.Categorical(sections),
+        "field": pd.Categorical(fields),
+        "filled": pd.array(filled, dtype=bool),
+    }, columns=TABLE_COLUMNS)
+
+
+def completeness_scores(table):
+    """Non-empty fields, total fields and percentage per (document, variant)"""
+    scores = table.groupby(["document", "variant"], observed=True)["filled"].agg(non_empty="sum", total="size")
+    scores["percentage"] = scores["non_empty"] / scores["total"] * 100
+    return scores
+
+
+def completeness_by_variant(scores, document):
+    """``{variant: {"non_empty", "total", "percentage"}}`` for one document"""
+    if document not in scores.index.get_level_values("document"):
+        return {}
+    return {variant: {"non_empty": int(row["non_empty"]), "total": int(row["total"]),
+                      "percentage": float(row["percentage"])}
+            for variant, row in scores.xs(document, level="document").iterrows()}
+
+
+def section_fill_rates(table, document=None):
+    """Percentage of filled fields per section (rows) and variant (columns)"""
+    if document is not None:
+        table = table[table["document"] == document]
+    rates = table.pivot_table(index="section", columns="variant", values="filled",
+                              aggfunc="mean", observed=True)
+    return rates * 100
+
+
+def field_diffs(table, document, variants=None):
+    """Fields that are filled in some variants and empty (or missing) in others
+
+    One row per (section, field) with a boolean column per variant; fields that
+    a variant did not produce at all count as empty.
+    """
+    table = table[table["document"] == document]
+    if variants is not None:
+        table = table[table["variant"].isin(variants)]
+    filled = table.pivot_table(index=["section", "field"], columns="variant", values="filled",
+                               aggfunc="max", observed=True, fill_value=False).astype(bool)
+    if variants is not None:
+        filled = filled.reindex(columns=[v for v in variants if v in filled.columns])
+    differs = filled.any(axis=1) & ~filled.all(axis=1)
+    return filled[differs]
@@ -0,0 +1,481 @@
+"""SQLite store for analysing email corpora of any size.
+
+``ingest`` streams messages from an mbox or a directory of .eml files into
+the ``emails`` table in batches (see ``pipeline/mail_reader.py``). ``analyze`` walks the emails that an analyzer
+has not processed yet, again in batches, and stores per-email token counts,
+cost and entities. The dashboard only runs aggregate and paged queries
+against the store, so neither step nor the page ever holds the whole corpus
+in memory::
+
+    python -m pipeline.corpus ingest mail/inbox.mbox     # also rebuilds the search index
+    python -m pipeline.corpus analyze
+    python -m pipeline.corpus analyze --analyzer model --backend openai
+    python -m pipeline.corpus stats
+
+The ``local`` analyzer needs no model, and its numbers are projections: it
+estimates the cost of the combined email prompt from the message size (fitted
+on ``results/real_email_combined_prompts_v9.json``) and collects entity
+candidates (addresses, web domains and capitalized names). The ``model``
+analyzer sends every email through a backend (``pipeline.backend``) with the
+runner's combined prompt and stores the measured tokens, cost and latency,
+the extracted data and its values as entities. Analyzers are stored side by
+side under their own name.
+
+The dashboard only ingests mailboxes under ``CORPUS_MAIL_DIR`` (``mail/`` by
+default) and only shows the raw bytes of emails from there; anything else is
+ingested from the command line.
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+
+import pandas as pd
+
+from pipeline import pricing
+from pipeline.backend import BACKENDS, BackendError, get_backend
+from pipeline.mail_reader import iter_messages, read_raw
+from pipeline.parsing import parse_json_response
+from pipeline.prompts import combined_messages
+
+CORPUS_DB = os.environ.get("CORPUS_DB", os.path.join("indexes", "corpus.sqlite"))
+CORPUS_MAIL_DIR = os.environ.get("CORPUS_MAIL_DIR", "mail")
+MAILBOX_EXTENSIONS = (".mbox", ".mbx", ".eml")
+DEFAULT_BATCH_SIZE = 500
+MAX_ENTITIES_PER_EMAIL = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    message_id TEXT,
+    sender TEXT,
+    sender_domain TEXT,
+    subject TEXT,
+    date TEXT,
+    size_bytes INTEGER,
+    has_html INTEGER,
+    attachments INTEGER,
+    parts INTEGER,
+    skipped_bytes INTEGER,
+    text_chars INTEGER,
+    estimated_tokens INTEGER,
+    text TEXT,
+    ingested_at REAL,
+    UNIQUE (source, offset)
+);
+CREATE INDEX IF NOT EXISTS emails_domain ON emails (sender_domain);
+CREATE TABLE IF NOT EXISTS analyses (
+    email_id INTEGER NOT NULL REFERENCES emails (id),
+    analyzer TEXT NOT NULL,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    cost REAL,
+    execution_time REAL,
+    result TEXT,
+    analyzed_at REAL,
+    PRIMARY KEY (email_id, analyzer)
+);
+CREATE TABLE IF NOT EXISTS entities (
+    email_id INTEGER NOT NULL REFERENCES emails (id),
+    analyzer TEXT NOT NULL,
+    entity TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entities_lookup ON entities (analyzer, entity);
+CREATE INDEX IF NOT EXISTS entities_email ON entities (email_id, analyzer);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL UNIQUE,
+    name TEXT,
+    format TEXT,
+    size_bytes INTEGER,
+    mtime REAL,
+    lines INTEGER,
+    words INTEGER,
+    text_chars INTEGER,
+    estimated_tokens INTEGER,
+    text TEXT,
+    preprocessed_at REAL
+);
+"""
+
+# Колонки, додані після першої версії схеми: старі бази доповнюються в connect()
+ADDED_COLUMNS = {
+    "emails": {"parts": "INTEGER", "skipped_bytes": "INTEGER", "estimated_tokens": "INTEGER"},
+}
+
+EMAIL_COLUMNS = ["source", "offset", "length", "message_id", "sender", "sender_domain", "subject", "date",
+                 "size_bytes", "has_html", "attachments", "parts", "skipped_bytes", "text_chars",
+                 "estimated_tokens", "text", "ingested_at"]
+DOCUMENT_COLUMNS = ["source", "name", "format", "size_bytes", "mtime", "lines", "words", "text_chars",
+                    "estimated_tokens", "text", "preprocessed_at"]
+
+# Linear fit of the optimized combined prompt on the six real emails:
+# input ~ 5316 + 0.404 * raw bytes, output ~ 190 + 0.007 * raw bytes
+PROMPT_INPUT_TOKENS = 5316
+INPUT_TOKENS_PER_BYTE = 0.404
+OUTPUT_TOKENS_BASE = 190
+OUTPUT_TOKENS_PER_BYTE = 0.007
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_URL_DOMAIN_RE = re.compile(r"https?://(?:www\.)?([\w-]+(?:\.[\w-]+)+)")
+_NAME_RE = re.compile(r"\b[A-Z][a-zA-Z0-9&'-]+(?:[ \t]+[A-Z][a-zA-Z0-9&'-]+){1,3}\b")
+
+
+def connect(path=CORPUS_DB):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column, column_type in columns.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    conn.commit()
+    return conn
+
+
+def email_row(handle, fields):
+    """``emails`` row for one parsed message"""
+    return {**fields, "source": handle.source, "offset": handle.offset, "length": handle.length,
+            "text_chars": len(fields["text"]), "estimated_tokens": pricing.estimate_tokens(fields["text"]),
+            "ingested_at": time.time()}
+
+
+def insert_emails(conn, rows):
+    """Insert a batch of ``emails`` rows; returns how many were new"""
+    before = conn.total_changes
+    conn.executemany(
+        f"INSERT OR IGNORE INTO emails ({', '.join(EMAIL_COLUMNS)}) "
+        f"VALUES ({', '.join(':' + column for column in EMAIL_COLUMNS)})", rows)
+    conn.commit()
+    return conn.total_changes - before
+
+
+def is_known(conn, source, offset):
+    """Whether the message at ``offset`` of ``source`` is already stored
+
+    One lookup in the ``(source, offset)`` index per message, so a re-ingest
+    of a huge mailbox does not load all its offsets into memory.
+    """
+    return conn.execute("SELECT 1 FROM emails WHERE source = ? AND offset = ?", (source, offset)).fetchone() is not None
+
+
+def stored_documents(conn):
+    """``{source: (mtime, size_bytes)}`` of the preprocessed documents"""
+    return {row["source"]: (row["mtime"], row["size_bytes"])
+            for row in conn.execute("SELECT source, mtime, size_bytes FROM documents")}
+
+
+def upsert_documents(conn, rows):
+    conn.executemany(
+        f"INSERT INTO documents ({', '.join(DOCUMENT_COLUMNS)}) "
+        f"VALUES ({', '.join(':' + column for column in DOCUMENT_COLUMNS)}) "
+        f"ON CONFLICT (source) DO UPDATE SET "
+        + ", ".join(f"{column} = excluded.{column}" for column in DOCUMENT_COLUMNS[1:]), rows)
+    conn.commit()
+
+
+def ingest(conn, path, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Stream messages from ``path`` into the store; already ingested messages are skipped"""
+    inserted = seen = 0
+    batch = []
+
+    def flush():
+        nonlocal inserted
+        inserted += insert_emails(conn, batch)
+        batch.clear()
+        if progress:
+            progress(seen, inserted)
+
+    source_path = os.path.abspath(path)
+    # Повторний ingest того ж файлу не парсить вже збережені листи
+    for handle, parsed in iter_messages(source_path, skip=lambda source, offset: is_known(conn, source, offset)):
+        seen += 1
+        if parsed is None:
+            continue
+        batch.append(email_row(handle, parsed))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return seen, inserted
+
+
+def entity_candidates(subject, text):
+    """Addresses, web domains and capitalized names; a cheap stand-in for the model's knots"""
+    content = f"{subject}\n{text}"
+    found = []
+    found.extend(_EMAIL_RE.findall(content))
+    found.extend(_URL_DOMAIN_RE.findall(content))
+    found.extend(_NAME_RE.findall(content))
+    entities = []
+    seen = set()
+    for entity in found:
+        entity = entity.strip().lower()
+        if entity and entity not in seen:
+            seen.add(entity)
+            entities.append(entity)
+        if len(entities) >= MAX_ENTITIES_PER_EMAIL:
+            break
+    return entities
+
+
+def local_analysis(row, backend=None):
+    """Projected tokens and cost of the combined prompt plus entity candidates, without calling a model"""
+    input_tokens = int(PROMPT_INPUT_TOKENS + INPUT_TOKENS_PER_BYTE * row["size_bytes"])
+    output_tokens = int(OUTPUT_TOKENS_BASE + OUTPUT_TOKENS_PER_BYTE * row["size_bytes"])
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cost": pricing.cost(input_tokens, output_tokens),
+        "execution_time": 0.0,
+        "entities": entity_candidates(row["subject"] or "", row["text"] or ""),
+        "result": None,
+    }
+
+
+def _values(node):
+    if isinstance(node, dict):
+        for value in node.values():
+            yield from _values(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _values(value)
+    elif isinstance(node, str) and node.strip():
+        yield node.strip()
+
+
+def model_analysis(row, backend):
+    """Measured tokens, cost and latency of the combined prompt on the email; the extracted values as entities"""
+    completion = backend.complete(combined_messages(f"Subject: {row['subject'] or ''}\n\n{row['text'] or ''}"),
+                                  stage="combined")
+    result = parse_json_response(completion["text"])
+    # Відмова чи інша відповідь без JSON: виклик уже оплачено, тож зберігаємо його з помилкою, без сутностей
+    if not isinstance(result, dict):
+        result = {"error": "Failed to parse JSON from response", "text": completion["text"][:1000]}
+    values = list(dict.fromkeys(_values(result.get("extracted_data", {}))))
+    return {
+        "input_tokens": completion["input_tokens"],
+        "output_tokens": completion["output_tokens"],
+        "cost": completion["cost"],
+        "execution_time": completion["execution_time"],
+        "entities": [value for value in values if len(value) <= 200][:MAX_ENTITIES_PER_EMAIL],
+        "result": result,
+    }
+
+
+ANALYZERS = {"local": local_analysis, "model": model_analysis}
+# Аналізатори, що платять за виклики моделі, запускаються лише з командного рядка
+MODEL_ANALYZERS = {"model"}
+
+
+def analyze(conn, analyzer="local", batch_size=DEFAULT_BATCH_SIZE, limit=None, progress=None, backend=None):
+    """Run ``analyzer`` over every email it has not processed yet, one batch at a time; returns how many were stored
+
+    Model analyzers need a ``backend``. An email whose call fails is left
+    unanalysed, so the next run tries it again; an answer that is not JSON is
+    stored with an ``error`` result, since its call was paid for.
+    """
+    analyze_one = ANALYZERS[analyzer]
+    if analyzer in MODEL_ANALYZERS and backend is None:
+        raise ValueError(f"The '{analyzer}' analyzer needs a backend")
+    done = stored = 0
+    last_id = 0
+    while limit is None or done < limit:
+        size = batch_size if limit is None else min(batch_size, limit - done)
+        rows = conn.execute(
+            "SELECT e.id, e.subject, e.text, e.size_bytes FROM emails e "
+            "WHERE e.id > ? AND NOT EXISTS (SELECT 1 FROM analyses a WHERE a.email_id = e.id AND a.analyzer = ?) "
+            "ORDER BY e.id LIMIT ?", (last_id, analyzer, size)).fetchall()
+        if not rows:
+            break
+        analyses, entities = [], []
+        for row in rows:
+            try:
+                result = analyze_one(row, backend)
+            except BackendError as e:
+                print(f"email {row['id']}: {str(e)}")
+                continue
+            analyses.append((row["id"], analyzer, result["input_tokens"], result["output_tokens"], result["cost"],
+                             result["execution_time"], json.dumps(result["result"]) if result["result"] else None,
+                             time.time()))
+            entities.extend((row["id"], analyzer, entity) for entity in result["entities"])
+        conn.executemany("INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?, ?)", analyses)
+        conn.executemany("INSERT INTO entities VALUES (?, ?, ?)", entities)
+        conn.commit()
+        done += len(rows)
+        stored += len(analyses)
+        last_id = rows[-1]["id"]
+        if progress:
+            progress(done)
+    return stored
+
+
+def corpus_summary(conn, analyzer="local"):
+    row = conn.execute(
+        "SELECT COUNT(*) AS emails, COUNT(DISTINCT sender_domain) AS domains, "
+        "COALESCE(SUM(size_bytes), 0) AS size_bytes FROM emails").fetchone()
+    analysed = conn.execute(
+        "SELECT COUNT(*) AS analyzed, COALESCE(SUM(cost), 0) AS cost, COALESCE(SUM(input_tokens + output_tokens), 0) "
+        "AS tokens FROM analyses WHERE analyzer = ?", (analyzer,)).fetchone()
+    return {**dict(row), **dict(analysed)}
+
+
+def analyzers_in_store(conn):
+    return [row[0] for row in conn.execute("SELECT DISTINCT analyzer FROM analyses ORDER BY analyzer")]
+
+
+def histogram(conn, column, bucket, analyzer="local"):
+    """Counts per ``bucket``-wide bin of an ``analyses`` or ``emails`` column, computed in SQL"""
+    table = "analyses" if column in ("input_tokens", "output_tokens", "cost") else "emails"
+    where = "WHERE analyzer = ?" if table == "analyses" else ""
+    params = (bucket, bucket, analyzer) if table == "analyses" else (bucket, bucket)
+    return pd.read_sql_query(
+        f"SELECT CAST({column} / ? AS INTEGER) * ? AS bucket, COUNT(*) AS emails FROM {table} {where} "
+        "GROUP BY 1 ORDER BY 1", conn, params=params)
+
+
+def top_entities(conn, analyzer="local", limit=50):
+    return pd.read_sql_query(
+        "SELECT entity, COUNT(DISTINCT email_id) AS emails FROM entities WHERE analyzer = ? "
+        "GROUP BY entity ORDER BY emails DESC, entity LIMIT ?", conn, params=(analyzer, limit))
+
+
+def cost_by_domain(conn, analyzer="local", limit=50):
+    return pd.read_sql_query(
+        "SELECT e.sender_domain AS domain, COUNT(*) AS emails, SUM(a.cost) AS cost, AVG(a.cost) AS avg_cost, "
+        "SUM(a.input_tokens + a.output_tokens) AS tokens FROM emails e JOIN analyses a ON a.email_id = e.id "
+        "WHERE a.analyzer = ? GROUP BY e.sender_domain ORDER BY cost DESC LIMIT ?",
+        conn, params=(analyzer, limit))
+
+
+def _email_filter(query, domain):
+    clauses, params = [], []
+    if query:
+        clauses.append("(subject LIKE ? OR sender LIKE ?)")
+        params.extend([f"%{query}%", f"%{query}%"])
+    if domain:
+        clauses.append("sender_domain = ?")
+        params.append(domain)
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def count_emails(conn, query=None, domain=None):
+    where, params = _email_filter(query, domain)
+    return conn.execute(f"SELECT COUNT(*) FROM emails {where}", params).fetchone()[0]
+
+
+def list_emails(conn, query=None, domain=None, offset=0, limit=50):
+    """One page of emails (without their text) matching a subject/sender search and a domain"""
+    where, params = _email_filter(query, domain)
+    return pd.read_sql_query(
+        f"SELECT id, date, sender, subject, size_bytes, attachments FROM emails {where} "
+        "ORDER BY id LIMIT ? OFFSET ?", conn, params=params + [limit, offset])
+
+
+def get_email(conn, email_id):
+    row = conn.execute("SELECT * FROM emails WHERE id = ?", (email_id,)).fetchone()
+    if row is None:
+        return None
+    email_data = dict(row)
+    email_data["analyses"] = [dict(a) for a in conn.execute(
+        "SELECT analyzer, input_tokens, output_tokens, cost, execution_time, result FROM analyses "
+        "WHERE email_id = ?", (email_id,))]
+    email_data["entities"] = {}
+    for entity in conn.execute("SELECT analyzer, entity FROM entities WHERE email_id = ?", (email_id,)):
+        email_data["entities"].setdefault(entity["analyzer"], []).append(entity["entity"])
+    return email_data
+
+
+def list_documents(conn):
+    """Preprocessed documents with their stats, without the text"""
+    return pd.read_sql_query(
+        "SELECT id, name, format, size_bytes, lines, words, text_chars, estimated_tokens, source FROM documents "
+        "ORDER BY name, source", conn)
+
+
+def get_document(conn, document_id):
+    row = conn.execute("SELECT * FROM documents WHERE id = ?", (document_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def mailboxes(directory=CORPUS_MAIL_DIR):
+    """Mailbox files and directories of .eml files directly under ``directory``, for the dashboard to offer"""
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and name.lower().endswith(MAILBOX_EXTENSIONS):
+            found.append(path)
+        elif os.path.isdir(path) and any(entry.lower().endswith(".eml") for entry in os.listdir(path)):
+            found.append(path)
+    return found
+
+
+def in_mail_dir(path, directory=CORPUS_MAIL_DIR):
+    """Whether ``path`` resolves (symlinks included) to somewhere inside ``directory``"""
+    root = os.path.realpath(directory)
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+
+def raw_email(email_data, max_bytes=None):
+    """Raw message bytes re-read from the original mailbox"""
+    length = email_data["length"] if max_bytes is None else min(email_data["length"], max_bytes)
+    return read_raw(email_data["source"], email_data["offset"], length)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest and analyse email corpora")
+    parser.add_argument("--db", default=CORPUS_DB)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Add an mbox file or a directory of .eml files")
+    ingest_parser.add_argument("path")
+    ingest_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    analyze_parser = subparsers.add_parser("analyze", help="Analyse emails that have not been analysed yet")
+    analyze_parser.add_argument("--analyzer", default="local", choices=sorted(ANALYZERS))
+    analyze_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    analyze_parser.add_argument("--limit", type=int)
+    analyze_parser.add_argument("--backend", choices=sorted(BACKENDS), default="openai",
+                                help="Backend of the model analyzers")
+    stats_parser = subparsers.add_parser("stats", help="Show corpus totals")
+    stats_parser.add_argument("--analyzer", default="local")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    start = time.perf_counter()
+    if args.command == "ingest":
+        seen, inserted = ingest(conn, args.path, args.batch_size,
+                                progress=lambda seen, inserted: print(f"{seen} messages read, {inserted} new", end="\r"))
+        print(f"{seen} messages read, {inserted} new in {time.perf_counter() - start:.1f}s")
+        if inserted:
+            # search_index читає це сховище, тож імпорт тут, а не на рівні модуля
+            from pipeline.search_index import build_index
+            index = build_index(corpus_db=args.db)
+            print(f"search index rebuilt: {len(index.docs)} documents")
+    elif args.command == "analyze":
+        backend = None
+        if args.analyzer in MODEL_ANALYZERS:
+            try:
+                backend = get_backend(args.backend)
+            except BackendError as e:
+                raise SystemExit(str(e))
+        done = analyze(conn, args.analyzer, args.batch_size, args.limit,
+                       progress=lambda done: print(f"{done} emails analysed", end="\r"), backend=backend)
+        print(f"{done} emails analysed with '{args.analyzer}' in {time.perf_counter() - start:.1f}s")
+    else:
+        for key, value in corpus_summary(conn, args.analyzer).items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
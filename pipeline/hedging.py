@@ -0,0 +1,317 @@
+"""Hedged requests and latency-aware retries against the tail latency of the provider.
+
+The same call can take twice as long from one run to the next (compare the
+same emails across ``_v5``, ``_v6`` and ``_v7``). ``HedgedBackend`` sends a
+duplicate of a request that has not finished after the stage's usual p95
+latency and takes whichever answer completes first; the other one is closed,
+which stops its generation. A request still unanswered after the stage's
+timeout (``TIMEOUT_FACTOR`` times its p99) is abandoned and retried after a
+jittered exponential backoff, with the timeout doubled, as are connection
+errors, HTTP 429 and 5xx answers. Both clocks start when the request is
+sent, so the wait for a ``RateLimitedBackend`` underneath neither triggers a
+hedge nor a timeout.
+
+``LatencyPolicy`` learns the per-stage latencies from the call records of the
+results index, and switches to the calls of the current run once there are
+enough of them. A duplicate costs
+tokens, so every call records them: ``hedged`` duplicates sent, ``retries``,
+and the ``wasted_tokens``/``wasted_cost`` of the requests whose answers were
+thrown away (their input and the output received before they were closed).
+The waste is counted once a closed request has stopped; one that does not
+stop within ``CANCEL_GRACE`` seconds is added to ``stats`` when it does.
+``execution_time`` is the time until the answer, hedges and retries
+included::
+
+    backend = HedgedBackend(get_backend("openai"), LatencyPolicy.from_records(build_results_index()))
+"""
+import math
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+from pipeline import pricing
+from pipeline.backend import DEFAULT_TIMEOUT, READ_ERRORS, BackendError
+from pipeline.predictor import call_records, chunk_count
+
+HEDGE_QUANTILE = 0.95
+TIMEOUT_QUANTILE = 0.99
+# Таймаут — кратне p99: повільний, але живий запит не варто обривати
+TIMEOUT_FACTOR = 3
+MIN_TIMEOUT = 30.0
+# Менше спостережень — перцентилі ненадійні, беруться латентності всіх етапів
+MIN_SAMPLES = 5
+MAX_SAMPLES = 500
+RETRY_LIMIT = 2
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+ALL_STAGES = "*"
+# Скільки чекати, доки закрита спроба зупиниться, щоб порахувати її токени
+CANCEL_GRACE = 1.0
+
+
+def quantile(values, q):
+    """Nearest-rank quantile of a non-empty sequence"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP, rng=random):
+    """Seconds before retry ``attempt`` (from 0): full jitter over an exponential ceiling"""
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retryable(error):
+    """Connection errors and timeouts (no status), HTTP 429 and 5xx are worth another try"""
+    return error.status is None or error.status == 429 or error.status >= 500
+
+
+class LatencyPolicy:
+    """Per-stage latencies, and the hedge delay and timeout that follow from them; thread-safe"""
+
+    def __init__(self, samples=None, hedge_quantile=HEDGE_QUANTILE, timeout_quantile=TIMEOUT_QUANTILE,
+                 timeout_factor=TIMEOUT_FACTOR):
+        self.hedge_quantile = hedge_quantile
+        self.timeout_quantile = timeout_quantile
+        self.timeout_factor = timeout_factor
+        self.history = {stage: list(values) for stage, values in (samples or {}).items()}
+        self.observed = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_records(cls, records, **options):
+        """Latencies of the single calls in the results index, per stage
+
+        A run recorded only as a total was one call of its approach (the
+        ``combined`` stage of the runner), unless its document spans several
+        chunks.
+        """
+        calls = call_records(records)
+        single = [pd.isna(tokens) or pd.isna(threshold) or chunk_count(tokens, threshold) == 1
+                  for tokens, threshold in zip(calls["document_tokens"], calls["chunking_threshold"])]
+        calls = calls[single]
+        stages = calls["stage"].where(calls["stage"] != "total", calls["approach"])
+        samples = {stage: list(group["execution_time"]) for stage, group in calls.groupby(stages)}
+        samples[ALL_STAGES] = list(calls["execution_time"])
+        return cls(samples, **options)
+
+    def _latencies(self, stage):
+        """The run's own latencies of the stage once there are enough, else the history"""
+        for key in (stage, ALL_STAGES):
+            for samples in (self.observed, self.history):
+                values = samples.get(key)
+                if values is not None and len(values) >= MIN_SAMPLES:
+                    return list(values)
+        return None
+
+    def hedge_after(self, stage):
+        """Seconds after which a duplicate is sent; None when there is too little history"""
+        with self._lock:
+            latencies = self._latencies(stage)
+        return quantile(latencies, self.hedge_quantile) if latencies else None
+
+    def timeout(self, stage):
+        with self._lock:
+            latencies = self._latencies(stage)
+        if not latencies:
+            return DEFAULT_TIMEOUT
+        return max(MIN_TIMEOUT, self.timeout_factor * quantile(latencies, self.timeout_quantile))
+
+    def observe(self, stage, seconds):
+        """Add a latency of the current run"""
+        with self._lock:
+            for key in (stage, ALL_STAGES):
+                self.observed.setdefault(key, deque(maxlen=MAX_SAMPLES)).append(seconds)
+
+
+class _Attempt:
+    """One request of a race, streamed to the end (or until cancelled) in a thread of its own
+
+    Puts ``("sent", attempt)`` on ``events`` once the request is sent (after
+    any rate limiter wait) and ``("done", attempt)`` when it has finished.
+    """
+
+    def __init__(self, backend, messages, stage, events):
+        self.messages = messages
+        self.stream = None
+        self.completion = None
+        self.error = None
+        self.cancelled = False
+        self.start = None
+        self._finished = False
+        self._on_finish = None
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, args=(backend, stage, events), daemon=True)
+        self.thread.start()
+
+    def _run(self, backend, stage, events):
+        try:
+            self.stream = backend.stream(self.messages, stage=stage)
+            self.start = time.perf_counter()
+            events.put(("sent", self))
+            # Скасована спроба закривається на наступному фрагменті, що зупиняє генерацію
+            for _ in self.stream:
+                if self.cancelled:
+                    break
+            if self.cancelled:
+                self.stream.close()
+            self.completion = self.stream.result()
+        except BackendError as e:
+            self.error = e
+        except READ_ERRORS as e:
+            # Обрив посеред потоку: без статусу, тож спроба повторюється
+            self.error = BackendError(f"{stage or 'request'} stream interrupted: {e!r}")
+        finally:
+            if self.completion is None and self.error is None:
+                self.error = BackendError(f"{stage or 'request'} ended without a completion")
+            with self._lock:
+                self._finished = True
+                on_finish = self._on_finish
+            events.put(("done", self))
+            if on_finish:
+                on_finish(self)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def when_finished(self, callback):
+        """Call ``callback(attempt)`` once the thread has finished: now, or from the thread later"""
+        with self._lock:
+            if not self._finished:
+                self._on_finish = callback
+                return
+        callback(self)
+
+    def spent(self):
+        """(input, output) tokens used so far; nothing before the request was sent"""
+        if self.stream is None or self.error is not None:
+            return 0, 0
+        if self.completion is not None:
+            return self.completion["input_tokens"], self.completion["output_tokens"]
+        input_tokens = sum(pricing.estimate_tokens(message["content"]) for message in self.messages)
+        return input_tokens, pricing.estimate_tokens(self.stream.text)
+
+
+class HedgedBackend:
+    """A backend whose calls are hedged after the stage's p95 latency and retried after its timeout"""
+
+    def __init__(self, backend, policy, hedge=True, retries=RETRY_LIMIT, rng=None):
+        self.backend = backend
+        self.policy = policy
+        self.hedge = hedge
+        self.retries = retries
+        self.rng = rng or random.Random()
+        self.name = backend.name
+        self.model = getattr(backend, "model", None)
+        self.latencies = []
+        self.calls = self.hedges = self.hedge_wins = self.retried = 0
+        self.wasted_tokens = 0
+        self.wasted_cost = 0.0
+        self._lock = threading.Lock()
+
+    def _race(self, messages, stage, timeout):
+        """(winning attempt or None, attempts sent, error) of one request and its hedge"""
+        events = queue.Queue()
+        attempts = [_Attempt(self.backend, messages, stage, events)]
+        hedge_after = self.policy.hedge_after(stage) if self.hedge else None
+        finished = []
+        while True:
+            primary = attempts[0]
+            wait = None
+            # Поки запит чекає в обмежувачі, годинники хеджування й таймауту стоять
+            if primary.start is not None:
+                elapsed = time.perf_counter() - primary.start
+                if elapsed >= timeout:
+                    return None, attempts, BackendError(f"{stage or 'request'} timed out after {timeout:.0f}s")
+                wait = timeout - elapsed
+                if hedge_after is not None and len(attempts) == 1:
+                    if elapsed >= hedge_after:
+                        attempts.append(_Attempt(self.backend, messages, stage, events))
+                        continue
+                    wait = min(wait, hedge_after - elapsed)
+            try:
+                kind, attempt = events.get(timeout=wait)
+            except queue.Empty:
+                continue
+            if kind == "sent":
+                continue
+            if attempt.completion is not None:
+                return attempt, attempts, None
+            finished.append(attempt)
+            # Помилка однієї спроби не кінець, поки інша ще жива
+            if len(finished) == len(attempts):
+                return None, attempts, attempt.error
+
+    def _waste(self, losers):
+        """(input, output) tokens of the closed attempts that have stopped; the rest are recorded when they stop"""
+        for attempt in losers:
+            attempt.cancel()
+        wasted_input = wasted_output = 0
+        deadline = time.perf_counter() + CANCEL_GRACE
+        for attempt in losers:
+            attempt.thread.join(max(0.0, deadline - time.perf_counter()))
+            if attempt.thread.is_alive():
+                attempt.when_finished(lambda late: self._record(0, 0, 0, *late.spent(), None))
+                continue
+            spent_input, spent_output = attempt.spent()
+            wasted_input += spent_input
+            wasted_output += spent_output
+        return wasted_input, wasted_output
+
+    def complete(self, messages, stage=None):
+        start = time.perf_counter()
+        timeout = self.policy.timeout(stage)
+        hedged = wasted_input = wasted_output = 0
+        for attempt_number in range(self.retries + 1):
+            if attempt_number:
+                time.sleep(backoff_delay(attempt_number - 1, rng=self.rng))
+            winner, attempts, error = self._race(messages, stage, timeout)
+            hedged += len(attempts) - 1
+            spent_input, spent_output = self._waste([attempt for attempt in attempts if attempt is not winner])
+            wasted_input += spent_input
+            wasted_output += spent_output
+            if winner is not None:
+                break
+            if not retryable(error) or attempt_number == self.retries:
+                self._record(0, hedged, attempt_number, wasted_input, wasted_output, None)
+                raise error
+            if error.status is None:
+                timeout *= 2
+        primary = attempts[0]
+        # Програла основна спроба — її латентність не менша за час до відповіді дубля
+        self.policy.observe(stage, winner.completion["execution_time"] if winner is primary
+                            else time.perf_counter() - primary.start)
+        completion = winner.completion
+        completion["execution_time"] = time.perf_counter() - start
+        completion["hedged"] = hedged
+        completion["retries"] = attempt_number
+        completion["wasted_tokens"] = wasted_input + wasted_output
+        completion["wasted_cost"] = pricing.cost(wasted_input, wasted_output)
+        self._record(1, hedged, attempt_number, wasted_input, wasted_output, completion["execution_time"],
+                     winner is not primary)
+        return completion
+
+    def _record(self, calls, hedged, retries, wasted_input, wasted_output, latency, hedge_won=False):
+        with self._lock:
+            self.calls += calls
+            self.hedges += hedged
+            self.hedge_wins += hedge_won
+            self.retried += retries
+            self.wasted_tokens += wasted_input + wasted_output
+            self.wasted_cost += pricing.cost(wasted_input, wasted_output)
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def stream(self, messages, stage=None):
+        """Not hedged: the pieces of a stream go to the caller as they arrive"""
+        return self.backend.stream(messages, stage=stage)
+
+    def stats(self):
+        stats = {"calls": self.calls, "hedges": self.hedges, "hedge_wins": self.hedge_wins,
+                 "retries": self.retried, "wasted_tokens": self.wasted_tokens, "wasted_cost": self.wasted_cost}
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            stats[name] = quantile(self.latencies, q) if self.latencies else None
+        return stats
@@ -0,0 +1,202 @@
+"""Append-only journal of completed model calls, so an interrupted run resumes where it stopped.
+
+A sweep over every sample, prompt version and chunking threshold takes hours;
+without a journal a crash means paying for all of it again. ``RunJournal``
+appends one JSON line per completed call, flushed to disk before the answer
+is used: the document, approach, stage and chunk it belongs to, a hash of the
+exact request and the completion (raw text and metrics). ``JournaledBackend``
+looks every request up first and answers from the journal when it was made
+before, so rerunning the same command replays the finished calls for free
+and only pays for the rest::
+
+    journal = RunJournal("results/runs/journal.jsonl")
+    backend = journal.backend(get_backend("openai"), document=path, approach="original")
+
+Replayed completions carry ``journaled: True``. ``compact`` drops the calls
+of the documents whose results have been written, since the result files hold
+everything they recorded, and removes the journal once nothing is left; the
+calls of documents that failed stay for the next run. A line cut short by a
+crash is skipped when the journal is read and cut off when it is opened for
+recording, so the next entry starts on a line of its own.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+
+from pipeline.backend import CompletionStream
+
+JOURNAL_NAME = "journal.jsonl"
+
+
+def request_hash(messages, model=None):
+    """Hash of a request: the same prompt to the same model is the same call"""
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def read_journal(path):
+    """Entries of a journal file; a missing file has none and a torn last line is skipped"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and "request" in entry and "completion" in entry:
+                yield entry
+
+
+def _drop_torn_tail(path, block=4096):
+    """Truncate ``path`` after its last newline, removing a line a crash left unfinished"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - block)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b"\n")
+            if newline >= 0:
+                pos = start + newline + 1
+                break
+            pos = start
+        if pos < end:
+            f.truncate(pos)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _documents(entry):
+    """The documents a journaled call belongs to: one, or every document of a pack"""
+    document = entry.get("document")
+    return document if isinstance(document, list) else [document]
+
+
+class RunJournal:
+    """The completed calls of a run, kept in memory and appended to ``path``; thread-safe"""
+
+    def __init__(self, path):
+        self.path = path
+        # Інакше перший новий запис приклеївся б до обірваного рядка і теж загубився
+        _drop_torn_tail(path)
+        self.entries = {entry["request"]: entry for entry in read_journal(path)}
+        self.loaded = len(self.entries)
+        self.replayed = self.recorded = 0
+        self.replayed_cost = 0.0
+        self._lock = threading.Lock()
+
+    def lookup(self, request):
+        """A copy of the journaled completion of a request, or None"""
+        with self._lock:
+            entry = self.entries.get(request)
+            if entry is None:
+                return None
+            self.replayed += 1
+            self.replayed_cost += entry["completion"].get("cost", 0.0)
+        return {**entry["completion"], "journaled": True}
+
+    def record(self, request, completion, **labels):
+        """Append a completed call; it is on disk when this returns"""
+        entry = {**labels, "request": request, "completion": completion}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[request] = entry
+            self.recorded += 1
+
+    def backend(self, backend, **labels):
+        """``backend`` answering from this journal; ``labels`` (document, approach) go into every entry"""
+        return JournaledBackend(backend, self, **labels)
+
+    def compact(self, documents=None):
+        """Drop the calls of ``documents`` (all calls when None), whose results are written
+
+        A packed call belongs to several documents and stays until all of them
+        are written. The journal file is rewritten, or removed when it is empty.
+        """
+        with self._lock:
+            if documents is None:
+                kept = {}
+            else:
+                documents = set(documents)
+                kept = {request: entry for request, entry in self.entries.items()
+                        if not set(_documents(entry)) <= documents}
+            if kept:
+                with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                    for entry in kept.values():
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(self.path + ".tmp", self.path)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+            self.entries = kept
+
+    def stats(self):
+        return {"loaded": self.loaded, "replayed": self.replayed, "recorded": self.recorded,
+                "replayed_cost": self.replayed_cost}
+
+
+class _ReplayStream(CompletionStream):
+    """A journaled completion as a stream of one piece"""
+
+    def __init__(self, messages, completion):
+        super().__init__(messages)
+        self.pieces = iter([completion["text"]])
+        self.completion = completion
+
+    def result(self):
+        return dict(self.completion)
+
+
+class JournaledBackend:
+    """A backend that replays calls found in a ``RunJournal`` and records the others"""
+
+    def __init__(self, backend, journal, **labels):
+        self.backend = backend
+        self.journal = journal
+        self.labels = labels
+        self.name = backend.name
+        self.model = getattr(backend, "model", None)
+        # Чанки етапу йдуть по черзі, тож номер чанка — лічильник викликів етапу
+        self._chunks = Counter()
+
+    def _request(self, messages, stage):
+        chunk = self._chunks[stage]
+        self._chunks[stage] += 1
+        labels = {**self.labels, "stage": stage, "chunk": chunk}
+        return request_hash(messages, f"{self.name}:{self.model}"), labels
+
+    def complete(self, messages, stage=None):
+        request, labels = self._request(messages, stage)
+        completion = self.journal.lookup(request)
+        if completion is None:
+            completion = self.backend.complete(messages, stage=stage)
+            self.journal.record(request, completion, **labels)
+        return completion
+
+    def stream(self, messages, stage=None):
+        """A replayed stream, or the backend's stream recorded when its ``result`` is taken"""
+        request, labels = self._request(messages, stage)
+        completion = self.journal.lookup(request)
+        if completion is not None:
+            return _ReplayStream(messages, completion)
+        stream = self.backend.stream(messages, stage=stage)
+        result = stream.result
+
+        def recorded_result():
+            completion = result()
+            self.journal.record(request, completion, **labels)
+            return completion
+
+        stream.result = recorded_result
+        return stream
@@ -0,0 +1,228 @@
+"""Load test of the pipeline against the stub backend: throughput and latency at a given arrival rate.
+
+Documents of the sample corpus arrive one after another as a Poisson process
+of ``rate`` documents a second and are run, like ``pipeline.runner`` runs
+them, by ``workers`` threads against a ``StubBackend`` with the configured
+latency distribution, generation speed, error and truncation rates. A
+document that arrives while every worker is busy waits; its queueing delay
+is the time from its arrival to the start of its run, its latency the time
+from its arrival to its result. After ``duration`` seconds no more documents
+arrive and the ones still waiting are counted as the backlog. They stay in
+the delay and latency percentiles with the time they had waited by then, so
+with a backlog the percentiles are lower bounds (``latency_censored``)
+instead of leaving out exactly the slowest documents.
+
+Every rate of a sweep gives one point of the curve: the achieved documents
+a second, the queueing delay and the p50/p95/p99 latency. Past the capacity
+of the workers the throughput flattens while the queueing delay and the
+backlog grow, so the ceiling of each approach is read off the curve::
+
+    python -m pipeline.load_test samples --rate 0.5 1 2 4 8 --workers 4 --latency 1.5
+    python -m pipeline.load_test samples --approach original combined --rate 1 2 4 --error-rate 0.02 --slo 10
+
+The points are saved as JSON to ``indexes/load_tests/``.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline.backend import BackendError, StubBackend
+from pipeline.hedging import quantile
+from pipeline.runner import iter_documents, run_combined, run_original
+
+LOAD_TEST_DIR = os.path.join("indexes", "load_tests")
+APPROACHES = ["original", "combined"]
+DEFAULT_DURATION = 30.0
+DEFAULT_WORKERS = 4
+QUANTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+def arrival_times(rate, duration, rng=random):
+    """Seconds from the start at which documents arrive: a Poisson process of ``rate`` a second"""
+    times = []
+    t = rng.expovariate(rate)
+    while t < duration:
+        times.append(t)
+        t += rng.expovariate(rate)
+    return times
+
+
+def run_once(path, backend, approach="original", chunking_threshold=None):
+    """Run one document as the runner does; (outcome, cost), the outcome ``ok``, ``error`` or ``failed_output``"""
+    try:
+        if approach == "combined":
+            result = run_combined(path, backend, chunking_threshold)
+        else:
+            result = run_original(path, backend, chunking_threshold=chunking_threshold)
+    except BackendError:
+        return "error", 0.0
+    # Обрізана відповідь не розбирається: невідома категорія або помилка розбору JSON
+    failed = "error" in result["extracted_data"]
+    return "failed_output" if failed else "ok", result["metrics"]["total"]["cost"]
+
+
+def summarize(samples, rate, workers, duration, elapsed, waiting=(), cutoff=None):
+    """One point of the curve from the per-document samples
+
+    ``waiting`` are the arrival times of the backlog, cancelled at ``cutoff``
+    seconds; their delay and latency count as ``cutoff - arrival``.
+    """
+    done = [sample for sample in samples if sample["outcome"] != "error"]
+    backlog = len(waiting)
+    censored = [cutoff - arrival for arrival in waiting]
+    point = {"rate": rate, "workers": workers, "duration": duration, "elapsed": elapsed,
+             "arrived": len(samples) + backlog, "arrival_rate": (len(samples) + backlog) / duration,
+             "completed": len(done),
+             "errors": len(samples) - len(done),
+             "failed_outputs": sum(sample["outcome"] == "failed_output" for sample in samples),
+             "backlog": backlog, "latency_censored": bool(backlog),
+             "throughput": len(done) / elapsed if elapsed else 0.0,
+             "mean_service_time": sum(s["finish"] - s["start"] for s in samples) / len(samples) if samples else None,
+             "mean_cost": sum(sample["cost"] for sample in done) / len(done) if done else None}
+    delays = [s["start"] - s["arrival"] for s in samples] + censored
+    latencies = [s["finish"] - s["arrival"] for s in done] + censored
+    for name, q in QUANTILES.items():
+        point[f"queue_delay_{name}"] = quantile(delays, q) if delays else None
+        point[f"latency_{name}"] = quantile(latencies, q) if latencies else None
+    return point
+
+
+def run_load(paths, rate, backend, approach="original", workers=DEFAULT_WORKERS, duration=DEFAULT_DURATION,
+             chunking_threshold=None, seed=None):
+    """Offer ``rate`` documents a second for ``duration`` seconds, cycling through ``paths``; one curve point"""
+    rng = random.Random(seed)
+    arrivals = arrival_times(rate, duration, rng)
+    samples = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def process(path, arrival):
+        started = time.perf_counter() - start
+        outcome, cost = run_once(path, backend, approach, chunking_threshold)
+        sample = {"document": path, "arrival": arrival, "start": started, "finish": time.perf_counter() - start,
+                  "outcome": outcome, "cost": cost}
+        with lock:
+            samples.append(sample)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = []
+    try:
+        for i, arrival in enumerate(arrivals):
+            # Відкритий цикл: документи надходять за розкладом, хоч би якою була черга
+            wait = arrival - (time.perf_counter() - start)
+            if wait > 0:
+                time.sleep(wait)
+            futures.append((executor.submit(process, paths[i % len(paths)], arrival), arrival))
+        remaining = duration - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+    finally:
+        cutoff = time.perf_counter() - start
+        # Документи, що так і не почались, лишаються в перцентилях з часом очікування до зупинки
+        waiting = [arrival for future, arrival in futures if future.cancel()]
+        executor.shutdown(wait=True)
+    return summarize(samples, rate, workers, duration, time.perf_counter() - start, waiting, cutoff)
+
+
+def capacity(points, slo=None):
+    """The highest throughput of a curve and, with an ``slo`` on the p95 latency, the highest rate that met it
+
+    A rate meets the SLO when nothing was left waiting and its p95 latency is
+    at most ``slo`` seconds.
+    """
+    ceiling = max((point["throughput"] for point in points), default=0.0)
+    sustained = None
+    if slo is not None:
+        met = [point["rate"] for point in points
+               if not point["backlog"] and point["latency_p95"] is not None and point["latency_p95"] <= slo]
+        sustained = max(met, default=None)
+    return {"ceiling": ceiling, "sustained_rate": sustained}
+
+
+def format_point(point):
+    def seconds(value):
+        if value is None:
+            return "      -"
+        # З беклогом перцентилі — нижні межі
+        return f"≥{value:5.2f}s" if point["latency_censored"] else f"{value:6.2f}s"
+
+    return (f"{point['rate']:6.2f}/s  {point['arrival_rate']:6.2f}/s  {point['throughput']:6.2f}/s  "
+            f"{point['completed']:>5}  {point['errors']:>5}  "
+            f"{point['failed_outputs']:>6}  {point['backlog']:>7}  "
+            + "  ".join(seconds(point[f"queue_delay_{name}"]) for name in ("p50", "p95")) + "  "
+            + "  ".join(seconds(point[f"latency_{name}"]) for name in QUANTILES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and latency of the pipeline under load, "
+                                                 "against the stub backend")
+    parser.add_argument("paths", nargs="+", help="Documents or directories of documents, replayed in a cycle")
+    parser.add_argument("--rate", type=float, nargs="+", required=True, help="Arrival rates, documents a second")
+    parser.add_argument("--approach", choices=APPROACHES, nargs="+", default=["original"])
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Documents processed in parallel")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Seconds of arrivals per rate")
+    parser.add_argument("--chunking-threshold", type=int, help="Split documents longer than this many tokens")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mean seconds per call before generation")
+    parser.add_argument("--latency-distribution", choices=StubBackend.LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Sigma of the lognormal distribution")
+    parser.add_argument("--prefill-latency", type=float, default=0.0, help="Seconds per 1,000 input tokens")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0, help="Generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls that fail with HTTP 500")
+    parser.add_argument("--truncation-rate", type=float, default=0.0, help="Share of answers cut off halfway")
+    parser.add_argument("--tail-share", type=float, default=0.0, help="Share of calls that take ten times as long")
+    parser.add_argument("--slo", type=float, help="p95 latency target in seconds, for the sustained rate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the points to this file ('-' for stdout; default indexes/load_tests/)")
+    args = parser.parse_args()
+
+    paths = list(iter_documents(args.paths))
+    if not paths:
+        raise SystemExit("No documents found")
+    stub_options = {"latency": args.latency, "latency_distribution": args.latency_distribution,
+                    "latency_sigma": args.latency_sigma, "prefill_latency": args.prefill_latency,
+                    "tokens_per_second": args.tokens_per_second, "error_rate": args.error_rate,
+                    "truncation_rate": args.truncation_rate, "tail_share": args.tail_share}
+    report = {"documents": len(paths), "workers": args.workers, "duration": args.duration,
+              "chunking_threshold": args.chunking_threshold, "stub": stub_options, "approaches": {}}
+    quiet = args.json == "-"
+    for approach in args.approach:
+        if not quiet:
+            print(f"{approach}, {args.workers} workers, {len(paths)} documents")
+            print("  offered   arrived  achieved   done  errors  failed  backlog  queue p50 p95     "
+                  "latency p50 p95 p99")
+        points = []
+        for rate in sorted(args.rate):
+            # Новий бекенд на кожну точку, щоб кеш префіксів не переносився між ними
+            backend = StubBackend(seed=args.seed, **stub_options)
+            point = run_load(paths, rate, backend, approach, args.workers, args.duration, args.chunking_threshold,
+                             args.seed)
+            points.append(point)
+            if not quiet:
+                print(format_point(point))
+        report["approaches"][approach] = {"points": points, **capacity(points, args.slo)}
+        if not quiet:
+            limits = report["approaches"][approach]
+            line = f"  ceiling {limits['ceiling']:.2f} documents/s"
+            if args.slo is not None:
+                line += (f", sustained {limits['sustained_rate']:.2f}/s within p95 {args.slo:g}s"
+                         if limits["sustained_rate"] is not None else f", no rate met p95 {args.slo:g}s")
+            print(line)
+
+    if quiet:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    path = args.json or os.path.join(LOAD_TEST_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""Stream emails from an mbox file, a single .eml file or a directory of .eml files.
+
+Files are read line by line as bytes and every message is fed incrementally to
+an ``email.feedparser.BytesFeedParser``. Only the text/plain and text/html
+parts reach the parser (each capped at ``MAX_TEXT_BYTES``); the bodies of
+attachments and other parts are skipped at the line level without being
+buffered or decoded, so memory use does not grow with the size of the mailbox
+or of its attachments::
+
+    python -m pipeline.mail_reader mail/inbox.mbox --memory
+
+Messages are yielded as a lightweight ``MessageHandle`` (source path, byte
+offset and length) plus the parsed fields; ``read_raw`` re-reads the raw bytes
+of one message later when they are needed, e.g. for the raw view.
+"""
+import argparse
+import os
+import time
+import tracemalloc
+from collections import namedtuple
+from email import policy
+from email.feedparser import BytesFeedParser
+from email.parser import BytesHeaderParser
+from email.utils import parseaddr
+
+from pipeline.parsing import get_plain_text
+
+MessageHandle = namedtuple("MessageHandle", ["source", "offset", "length"])
+
+TEXT_TYPES = ("text/plain", "text/html")
+# Досить для будь-якого тексту листа; решту частини відкидаємо
+MAX_TEXT_BYTES = 1024 * 1024
+MAX_HEADER_BYTES = 256 * 1024
+# Довші рядки читаються частинами, щоб один рядок без \n не зайняв усю пам'ять
+MAX_LINE_BYTES = 64 * 1024
+READ_CHUNK_BYTES = 1024 * 1024
+FEED_BATCH_BYTES = 64 * 1024
+
+
+class StreamingMessageParser:
+    """Feed one message line by line; ``close`` returns the parsed fields
+
+    A small MIME state machine follows the part headers and boundaries and
+    forwards to the feed parser only the headers, the boundaries and the
+    bodies of text parts. Everything else is counted and dropped.
+    """
+
+    def __init__(self, max_text_bytes=MAX_TEXT_BYTES):
+        self.max_text_bytes = max_text_bytes
+        self.parser = BytesFeedParser(policy=policy.default)
+        self.boundaries = []
+        self.state = "headers"
+        self.header_lines = []
+        self.header_bytes = 0
+        self.text_bytes = 0
+        self.size_bytes = 0
+        self.skipped_bytes = 0
+        self.attachments = 0
+        self.parts = 0
+        self.truncated = False
+        # Рядки для парсера збираються пачками: feed() на кожен рядок дорогий
+        self.pending = []
+        self.pending_bytes = 0
+
+    def _forward(self, line):
+        self.pending.append(line)
+        self.pending_bytes += len(line)
+        if self.pending_bytes >= FEED_BATCH_BYTES:
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.parser.feed(b"".join(self.pending))
+            self.pending = []
+            self.pending_bytes = 0
+
+    def feed(self, line):
+        size = len(line)
+        self.size_bytes += size
+        if self.state == "headers":
+            self._feed_header(line)
+            return
+        if self.boundaries and line.startswith(b"--") and self._feed_boundary(line):
+            return
+        if self.state == "skip":
+            self.skipped_bytes += size
+            return
+        if self.state == "text":
+            if self.text_bytes + size > self.max_text_bytes:
+                self.truncated = True
+                self.skipped_bytes += size
+                return
+            self.text_bytes += size
+        # Текстові частини, преамбула та епілог multipart ідуть у парсер
+        self.pending.append(line)
+        self.pending_bytes += size
+        if self.pending_bytes >= FEED_BATCH_BYTES:
+            self._flush()
+
+    def _feed_header(self, line):
+        self.header_bytes += len(line)
+        blank = not line.strip()
+        # Порожній рядок завершує заголовки навіть після ліміту, інакше парсер сприйме тіло за заголовки
+        if self.header_bytes <= MAX_HEADER_BYTES or blank:
+            self._forward(line)
+            self.header_lines.append(line)
+        if not blank:
+            return
+        headers = BytesHeaderParser(policy=policy.compat32).parsebytes(b"".join(self.header_lines))
+        self.header_lines = []
+        self.header_bytes = 0
+        self.text_bytes = 0
+        content_type = headers.get_content_type()
+        is_attachment = headers.get_content_disposition() == "attachment"
+        if is_attachment:
+            self.attachments += 1
+        if headers.get_content_maintype() == "multipart" and headers.get_param("boundary"):
+            self.boundaries.append(headers.get_param("boundary").encode("ascii", errors="replace"))
+            self.state = "preamble"
+            return
+        self.parts += 1
+        if content_type in TEXT_TYPES and not is_attachment:
+            self.state = "text"
+        else:
+            self.state = "skip"
+
+    def _feed_boundary(self, line):
+        marker = line.rstrip(b"\r\n")
+        for depth in range(len(self.boundaries) - 1, -1, -1):
+            boundary = b"--" + self.boundaries[depth]
+            if marker == boundary:
+                del self.boundaries[depth + 1:]
+                self._forward(line)
+                self.state = "headers"
+                return True
+            if marker == boundary + b"--":
+                del self.boundaries[depth:]
+                self._forward(line)
+                self.state = "preamble"
+                return True
+        return False
+
+    def close(self):
+        if self.state == "headers" and self.header_lines:
+            # Лист без тіла: заголовки мають закінчитися порожнім рядком
+            self._forward(b"\n")
+        self._flush()
+        msg = self.parser.close()
+        plain, html = None, None
+        for part in msg.walk():
+            if part.is_multipart() or part.get_content_disposition() == "attachment":
+                continue
+            content_type = part.get_content_type()
+            if content_type == "text/plain" and plain is None:
+                plain = _part_text(part)
+            elif content_type == "text/html" and html is None:
+                html = _part_text(part)
+
+        text = plain if plain and plain.strip() else (get_plain_text(html) if html else "")
+        sender = str(msg.get("From", ""))
+        address = parseaddr(sender)[1].lower()
+        return {
+            "message_id": str(msg.get("Message-ID", "")).strip(),
+            "sender": sender,
+            "sender_domain": address.rsplit("@", 1)[1] if "@" in address else "",
+            "subject": str(msg.get("Subject", "")),
+            "date": str(msg.get("Date", "")),
+            "size_bytes": self.size_bytes,
+            "has_html": html is not None,
+            "attachments": self.attachments,
+            "parts": self.parts,
+            "skipped_bytes": self.skipped_bytes,
+            "truncated": self.truncated,
+            "text": text,
+        }
+
+
+def _part_text(part):
+    try:
+        return part.get_content()
+    except (LookupError, ValueError):
+        payload = part.get_payload(decode=True) or b""
+        return payload.decode("utf-8", errors="replace")
+
+
+def _iter_lines(f, limit=None):
+    """(line, starts_line) pairs read in chunks; lines longer than ``MAX_LINE_BYTES`` come in pieces
+
+    With ``limit`` at most that many bytes are read from the current position.
+    """
+    starts_line = True
+    rest = b""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        chunk = f.read(READ_CHUNK_BYTES if remaining is None else min(READ_CHUNK_BYTES, remaining))
+        if not chunk:
+            break
+        if remaining is not None:
+            remaining -= len(chunk)
+        lines = (rest + chunk).splitlines(keepends=True)
+        rest = lines.pop() if not lines[-1].endswith(b"\n") else b""
+        for line in lines:
+            yield line, starts_line
+            starts_line = line.endswith(b"\n")
+        while len(rest) > MAX_LINE_BYTES:
+            yield rest[:MAX_LINE_BYTES], starts_line
+            starts_line = False
+            rest = rest[MAX_LINE_BYTES:]
+    if rest:
+        yield rest, starts_line
+
+
+def iter_mbox(path, skip=None, max_text_bytes=MAX_TEXT_BYTES):
+    """(handle, fields) for each message of an mbox file
+
+    A message starts at a ``From `` line after a blank line. When
+    ``skip(source, offset)`` is true the message is scanned past without parsing.
+    """
+    with open(path, "rb") as f:
+        start = None
+        parser = None
+        previous_blank = True
+        position = 0
+        for line, starts_line in _iter_lines(f):
+            if starts_line and previous_blank and line.startswith(b"From "):
+                if start is not None:
+                    yield _finish(path, start, position - start, parser)
+                start = position
+                parser = None if skip and skip(path, start) else StreamingMessageParser(max_text_bytes)
+            elif parser is not None:
+                parser.feed(line)
+            previous_blank = starts_line and line in (b"\n", b"\r\n")
+            position += len(line)
+        if start is not None:
+            yield _finish(path, start, position - start, parser)
+
+
+def _finish(path, offset, length, parser):
+    return MessageHandle(path, offset, length), (parser.close() if parser is not None else None)
+
+
+def iter_eml_file(path, skip=None, max_text_bytes=MAX_TEXT_BYTES):
+    if skip and skip(path, 0):
+        yield MessageHandle(path, 0, os.path.getsize(path)), None
+        return
+    parser = StreamingMessageParser(max_text_bytes)
+    with open(path, "rb") as f:
+        for line, _ in _iter_lines(f):
+            parser.feed(line)
+    yield _finish(path, 0, parser.size_bytes, parser)
+
+
+def iter_eml_dir(path, skip=None, max_text_bytes=MAX_TEXT_BYTES):
+    for directory, subdirectories, files in os.walk(path):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".eml"):
+                yield from iter_eml_file(os.path.join(directory, name), skip, max_text_bytes)
+
+
+def iter_messages(path, skip=None, max_text_bytes=MAX_TEXT_BYTES):
+    """(handle, fields) from an mbox file, a .eml file or a directory of .eml files
+
+    ``fields`` is ``None`` for messages excluded by ``skip(source, offset)``.
+    """
+    if os.path.isdir(path):
+        return iter_eml_dir(path, skip, max_text_bytes)
+    if path.lower().endswith(".eml"):
+        return iter_eml_file(path, skip, max_text_bytes)
+    return iter_mbox(path, skip, max_text_bytes)
+
+
+def _mbox_offsets(path):
+    """Offsets of the ``From `` lines that follow a blank line, then the file size
+
+    Found with ``bytes.find`` over chunks instead of a Python loop per line.
+    """
+    marker = b"\nFrom "
+    with open(path, "rb") as f:
+        position = 0
+        # Хвіст попереднього чанку: роздільник може потрапити на межу чанків
+        tail = b"\n\n"
+        while True:
+            chunk = f.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            data = tail + chunk
+            # Збіги, що цілком лежать у хвості, вже знайдено в попередньому чанку
+            index = data.find(marker, max(0, len(tail) - len(marker) + 1))
+            while index != -1:
+                if data[index - 1:index] == b"\n" or data[index - 2:index] == b"\n\r":
+                    yield position - len(tail) + index + 1
+                index = data.find(marker, index + 1)
+            position += len(chunk)
+            tail = data[-(len(marker) + 1):]
+    yield position
+
+
+def iter_handles(path, skip=None):
+    """Handles of the messages in ``path``; messages are located but not parsed"""
+    if os.path.isdir(path) or path.lower().endswith(".eml"):
+        handles = (handle for handle, _ in iter_messages(path, skip=lambda source, offset: True))
+    else:
+        handles = _mbox_handles(path, _mbox_offsets(path))
+    for handle in handles:
+        if not (skip and skip(handle.source, handle.offset)):
+            yield handle
+
+
+def _mbox_handles(path, offsets):
+    previous = next(offsets)
+    for offset in offsets:
+        yield MessageHandle(path, previous, offset - previous)
+        previous = offset
+
+
+def parse_handle(handle, max_text_bytes=MAX_TEXT_BYTES):
+    """Fields of one message streamed back from its source, e.g. in a worker process"""
+    parser = StreamingMessageParser(max_text_bytes)
+    with open(handle.source, "rb") as f:
+        f.seek(handle.offset)
+        lines = _iter_lines(f, handle.length)
+        for line, _ in lines:
+            # Рядок-роздільник mbox "From " не є частиною листа
+            if not line.startswith(b"From "):
+                parser.feed(line)
+            break
+        for line, _ in lines:
+            parser.feed(line)
+    return parser.close()
+
+
+def parse_message(data, max_text_bytes=MAX_TEXT_BYTES):
+    """Parsed fields of one raw message given as bytes or str"""
+    if isinstance(data, str):
+        data = data.encode("utf-8", errors="surrogateescape")
+    parser = StreamingMessageParser(max_text_bytes)
+    for line in data.splitlines(keepends=True):
+        parser.feed(line)
+    return parser.close()
+
+
+def read_raw(source, offset, length):
+    """Raw bytes of one message, as located by ``MessageHandle``"""
+    with open(source, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan a mailbox and report message counts")
+    parser.add_argument("path")
+    parser.add_argument("--memory", action="store_true", help="Also report peak traced memory (much slower)")
+    args = parser.parse_args()
+
+    if args.memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    messages = total_bytes = skipped_bytes = attachments = 0
+    for handle, fields in iter_messages(args.path):
+        messages += 1
+        total_bytes += handle.length
+        skipped_bytes += fields["skipped_bytes"]
+        attachments += fields["attachments"]
+    elapsed = time.perf_counter() - start
+    print(f"{messages} messages, {total_bytes / 1024 / 1024:.1f} MB in {elapsed:.1f}s")
+    print(f"{attachments} attachments, {skipped_bytes / 1024 / 1024:.1f} MB of non-text parts skipped")
+    if args.memory:
+        print(f"peak traced memory {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MB")
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Pack several small documents into one request.
+
+Every call resends the instruction prompt, which dominates the input of small
+documents (emails, File 2). ``pack_documents`` bins documents up to a token
+budget, first fit in decreasing size; the ``packed_*`` prompts of
+``pipeline.prompts`` put each document between delimiters with its id, and
+``split_packed`` takes the per-document answers back out of the response.
+
+The metrics of a packed call are split between its documents with
+``attribute``: input tokens (and time) in proportion to each document's size,
+output tokens in proportion to the length of its answer, and the cost
+recomputed from the attributed tokens so the parts add up to the call.
+"""
+import json
+
+from pipeline import pricing
+from pipeline.parsing import parse_json_response
+
+DEFAULT_PACK_BUDGET = 8000
+PACKED_KEY = "documents"
+
+
+def pack_documents(sizes, budget=DEFAULT_PACK_BUDGET):
+    """Bins of keys from ``{key: tokens}`` whose sizes add up to at most ``budget``
+
+    Keys keep their input order inside a bin; a document over the budget gets
+    a bin of its own.
+    """
+    bins = []
+    for key in sorted(sizes, key=lambda k: -sizes[k]):
+        for packed in bins:
+            if packed["tokens"] + sizes[key] <= budget:
+                packed["keys"].append(key)
+                packed["tokens"] += sizes[key]
+                break
+        else:
+            bins.append({"keys": [key], "tokens": sizes[key]})
+    order = {key: i for i, key in enumerate(sizes)}
+    return [sorted(packed["keys"], key=order.get) for packed in bins]
+
+
+def document_ids(keys):
+    """Stable delimiter ids of the documents in a bin: 1, 2, ... in bin order"""
+    return {str(i): key for i, key in enumerate(keys, 1)}
+
+
+def split_packed(response):
+    """``{id: answer}`` from a packed JSON response; missing or unreadable answers are left out"""
+    parsed = parse_json_response(response)
+    answers = parsed.get(PACKED_KEY) if isinstance(parsed, dict) else None
+    if not isinstance(answers, dict):
+        return {}
+    return {str(doc_id): answer for doc_id, answer in answers.items() if isinstance(answer, dict)}
+
+
+def _proportional(total, weights):
+    """``total`` split in proportion to ``weights``: whole numbers for ints (largest remainder), else floats"""
+    weight_sum = sum(weights)
+    if not weight_sum:
+        weights, weight_sum = [1] * len(weights), len(weights)
+    exact = [total * weight / weight_sum for weight in weights]
+    if not isinstance(total, int):
+        return exact
+    parts = [int(value) for value in exact]
+    by_remainder = sorted(range(len(exact)), key=lambda i: parts[i] - exact[i])
+    for i in by_remainder[:total - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+
+def attribute(completion, input_weights, output_weights):
+    """Per-document metrics of one packed call"""
+    inputs = _proportional(completion["input_tokens"], input_weights)
+    cached = _proportional(completion.get("cached_input_tokens", 0), input_weights)
+    outputs = _proportional(completion["output_tokens"], output_weights)
+    times = _proportional(float(completion["execution_time"]), input_weights)
+    return [{
+        "input_tokens": inputs[i],
+        "output_tokens": outputs[i],
+        "execution_time": times[i],
+        "cost": pricing.cost(inputs[i], outputs[i], cached[i]),
+        "cached_input_tokens": cached[i],
+        "packed_documents": len(inputs),
+    } for i in range(len(inputs))]
+
+
+def answer_weight(answer):
+    """Output share of a document: the length of its answer"""
+    return len(json.dumps(answer, ensure_ascii=False)) if answer is not None else 0
@@ -0,0 +1,401 @@
+"""Parsing helpers for model outputs, emails and extracted data.
+
+These used to live inside the page scripts; they are kept here so the pages,
+the command line tools and the benchmarks share one implementation.
+"""
+import email
+import json
+import re
+from collections import Counter
+from email.header import decode_header
+
+
+def parse_json_response(raw_response):
+    """JSON object з відповіді моделі, з ```json обгорткою або без; None, якщо не парситься"""
+    if not raw_response:
+        return None
+    cleaned = raw_response.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else ""
+        cleaned = cleaned.rsplit("```", 1)[0]
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+    # Текст навколо JSON: беремо від першої { до останньої }
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start != -1 and end > start:
+        try:
+            return json.loads(cleaned[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+def extract_knots_from_section(raw_json):
+    """Спеціальна функція для витягування knots_from_section навіть з неповного JSON"""
+    try:
+        # Спочатку спробуємо стандартний підхід через JSON
+        cleaned_json = raw_json.replace("```json\n", "").replace("\n```", "").strip()
+        data = json.loads(cleaned_json)
+        if "entities" in data and "knots_from_section" in data["entities"]:
+            return data["entities"]["knots_from_section"]
+    except:
+        pass
+    
+    # Якщо JSON не парситься, використовуємо регулярний вираз з додатковою обробкою
+    try:
+        # Шукаємо початок секції knots_from_section
+        section_pattern = r'"knots_from_section":\s*\['
+        match = re.search(section_pattern, raw_json)
+        
+        if not match:
+            return []
+        
+        # Знаходимо початкову позицію
+        start_pos = match.end()
+        content = raw_json[start_pos:]
+        
+        # Розбиваємо на рядки і шукаємо групи
+        section_knots = []
+        current_group = []
+        bracket_level = 0
+        
+        for line in content.split('\n'):
+            line = line.strip()
+            
+            # Рахуємо рівень вкладеності дужок
+            if '[' in line:
+                bracket_level += 1
+                if bracket_level == 1:  # Початок нової групи
+                    current_group = []
+            
+            # Знаходимо елементи в лапках
+            if '"' in line and ',' in line:
+                item = line.strip().strip(',').strip('"')
+                if item and bracket_level >= 1:
+                    current_group.append(item)
+            
+            # Закінчення групи
+            if ']' in line:
+                bracket_level -= 1
+                if bracket_level == 0 and current_group:  # Закінчення групи верхнього рівня
+                    section_knots.append(current_group.copy())
+                    current_group = []
+            
+            # Якщо знайшли закриваючу дужку для всього масиву або кінець файлу
+            if bracket_level < 0 or '}' in line or '"topics":' in line:
+                break
+        
+        # Додаємо останню групу, якщо вона не порожня
+        if current_group and bracket_level >= 0:
+            section_knots.append(current_group)
+        
+        return section_knots
+    except Exception as e:
+        print(f"Error extracting knots: {str(e)}")
+        return []
+
+
+def extract_knots_from_json_blocks(raw_json):
+    """knots_from_section з raw_json, що може містити кілька ```json блоків (file comparison)"""
+    if not raw_json:
+        return []
+
+    all_knots = []
+    json_blocks = []
+
+    if "```json" in raw_json:
+        blocks = raw_json.split("```json")
+        for i, block in enumerate(blocks):
+            if i > 0:  # Пропускаємо перший елемент (він перед першим ```json)
+                block_content = block.split("```")[0].strip()
+                json_blocks.append(block_content)
+    else:
+        # Якщо немає markdown розмітки, вважаємо весь текст одним JSON
+        json_blocks = [raw_json]
+
+    # Обробляємо кожен блок JSON
+    for block in json_blocks:
+        try:
+            # Спробуємо спочатку обробити блок як повний JSON
+            json_data = json.loads(block)
+
+            if "knots_from_section" in json_data:
+                # Якщо knots_from_section знаходиться в корені JSON
+                all_knots.extend(json_data["knots_from_section"])
+            elif "entities" in json_data and "knots_from_section" in json_data["entities"]:
+                # Якщо knots_from_section знаходиться в entities
+                all_knots.extend(json_data["entities"]["knots_from_section"])
+        except json.JSONDecodeError:
+            # Якщо не вдалося розпарсити як повний JSON, спробуємо знайти відповідні секції
+            try:
+                # Шукаємо knots_from_section
+                start_idx = block.find('"knots_from_section"')
+                if start_idx != -1:
+                    # Знаходимо початок масиву після knots_from_section
+                    array_start = block.find('[', start_idx)
+                    if array_start != -1:
+                        # Використовуємо лічильник дужок
+                        bracket_count = 1
+                        array_end = array_start + 1
+
+                        while bracket_count > 0 and array_end < len(block):
+                            if block[array_end] == '[':
+                                bracket_count += 1
+                            elif block[array_end] == ']':
+                                bracket_count -= 1
+                            array_end += 1
+
+                        if bracket_count == 0:
+                            array_content = block[array_start:array_end]
+                            try:
+                                knots_str = f'{{"knots_from_section": {array_content}}}'
+                                json_data = json.loads(knots_str)
+                                all_knots.extend(json_data["knots_from_section"])
+                            except:
+                                try:
+                                    knots_str = f'{{"entities": {{"knots_from_section": {array_content}}}}}'
+                                    json_data = json.loads(knots_str)
+                                    all_knots.extend(json_data["entities"]["knots_from_section"])
+                                except:
+                                    pass
+            except Exception as e:
+                # Якщо щось пішло не так, спробуємо використати регулярний вираз
+                try:
+                    # Шукаємо knots_from_section
+                    knots_matches = re.finditer(r'"knots_from_section"\s*:\s*(\[\s*\[.*?\]\s*\])', block, re.DOTALL)
+                    for match in knots_matches:
+                        try:
+                            knots_str = f'{{"knots_from_section": {match.group(1)}}}'
+                            json_data = json.loads(knots_str)
+                            all_knots.extend(json_data["knots_from_section"])
+                        except:
+                            pass
+                except:
+                    pass
+
+    return all_knots
+
+
+def extract_topics(raw_json):
+    """Функція для витягування тем з raw_json (може містити кілька ```json блоків)"""
+    if not raw_json:
+        return []
+
+    # Результуючий список всіх тем
+    all_topics = []
+
+    # Розділяємо на блоки JSON
+    json_blocks = []
+
+    # Перевіряємо, чи є markdown розмітка
+    if "```json" in raw_json:
+        # Розділяємо за markdown блоками
+        blocks = raw_json.split("```json")
+        for i, block in enumerate(blocks):
+            if i > 0:  # Пропускаємо перший елемент (він перед першим ```json)
+                block_content = block.split("```")[0].strip()
+                json_blocks.append(block_content)
+    else:
+        # Якщо немає markdown розмітки, вважаємо весь текст одним JSON
+        json_blocks = [raw_json]
+
+    # Обробляємо кожен блок JSON
+    for block in json_blocks:
+        try:
+            json_data = json.loads(block)
+            if "topics" in json_data:
+                all_topics.extend(json_data.get("topics", []))
+        except json.JSONDecodeError:
+            # Якщо не вдалося розпарсити блок як JSON, спробуємо використати регулярний вираз
+            try:
+                topics_match = re.search(r'"topics"\s*:\s*\[(.*?)\]', block, re.DOTALL)
+                if topics_match:
+                    topics_str = f'{{"topics": [{topics_match.group(1)}]}}'
+                    try:
+                        json_data = json.loads(topics_str)
+                        all_topics.extend(json_data.get("topics", []))
+                    except:
+                        pass
+            except:
+                pass
+
+    # Якщо не знайшли жодної теми, повертаємо порожній список
+    return all_topics
+
+
+def has_excessive_duplicates(entities_list):
+    """Check if there are excessive duplicate entities in the list, indicating extraction issues"""
+    if not entities_list or len(entities_list) == 0:
+        return False
+    
+    # Flatten the nested lists if needed
+    all_entities = []
+    for group in entities_list:
+        all_entities.extend(group)
+    
+    # Count occurrences of each entity
+    entity_counts = Counter(all_entities)
+    
+    # Count total duplicates
+    total_entities = len(all_entities)
+    unique_entities = len(set(all_entities))
+    duplicate_count = total_entities - unique_entities
+    duplicate_percentage = 1 - (unique_entities / total_entities) if total_entities > 0 else 0
+    
+    # Return true if there are significant duplicates (more than 10 and more than 20%)
+    return duplicate_count > 10 and duplicate_percentage > 0.2
+
+
+def get_plain_text(html_content):
+    """Readable plain text from an HTML email body"""
+    html_content = re.sub(r'<style>.*?</style>', '', html_content, flags=re.DOTALL)
+    
+    html_content = re.sub(r'<head>.*?</head>', '', html_content, flags=re.DOTALL)
+    
+    html_content = re.sub(r'<h[1-6][^>]*>(.*?)</h[1-6]>', r'\n\n\1\n', html_content)
+    html_content = re.sub(r'<p[^>]*>(.*?)</p>', r'\n\1\n', html_content)
+    html_content = re.sub(r'<br[^>]*>', '\n', html_content)
+    html_content = re.sub(r'<li[^>]*>(.*?)</li>', r'\n• \1', html_content)
+    html_content = re.sub(r'<ul[^>]*>|</ul>|<ol[^>]*>|</ol>', '\n', html_content)
+    
+    html_content = re.sub(r'<[^>]+>', '', html_content)
+    
+    html_content = html_content.replace('&nbsp;', ' ')
+    html_content = html_content.replace('&amp;', '&')
+    html_content = html_content.replace('&lt;', '<')
+    html_content = html_content.replace('&gt;', '>')
+    html_content = html_content.replace('&quot;', '"')
+    html_content = html_content.replace('&#39;', "'")
+    
+    html_content = re.sub(r'\n\s*\n', '\n\n', html_content)
+    html_content = re.sub(r' +', ' ', html_content)
+    
+    lines = html_content.split('\n')
+    lines = [line.strip() for line in lines]
+    html_content = '\n'.join(lines)
+    
+    return html_content.strip()
+
+
+def extract_email_parts(raw_email):
+    """Extract key parts from a raw email"""
+    
+    # Try to parse using email module first
+    try:
+        # Parse the email
+        msg = email.message_from_string(raw_email)
+        
+        # Extract and decode subject
+        subject = msg.get("Subject", "No subject")
+        decoded_subject = ""
+        for part, encoding in decode_header(subject):
+            if isinstance(part, bytes):
+                try:
+                    decoded_part = part.decode(encoding or 'utf-8', errors='replace')
+                except:
+                    decoded_part = part.decode('utf-8', errors='replace')
+            else:
+                decoded_part = part
+            decoded_subject += decoded_part
+        
+        # Clean up subject (remove =?utf-8?q?= and similar markers)
+        decoded_subject = re.sub(r'=\?utf-8\?q\?|\?=', '', decoded_subject)
+        
+        # Extract sender
+        sender = msg.get("From", "Unknown sender")
+        
+        # Extract date
+        date = msg.get("Date", "Unknown date")
+        
+        # Extract body
+        body = ""
+        if msg.is_multipart():
+            for part in msg.walk():
+                content_type = part.get_content_type()
+                if content_type == "text/plain":
+                    try:
+                        body = part.get_payload(decode=True).decode(part.get_content_charset() or 'utf-8', errors='replace')
+                        break
+                    except:
+                        pass
+                elif content_type == "text/html":
+                    try:
+                        body = part.get_payload(decode=True).decode(part.get_content_charset() or 'utf-8', errors='replace')
+                        # Try to extract text from HTML
+                        body = re.sub(r'<[^>]+>', ' ', body)
+                        body = re.sub(r'\s+', ' ', body)
+                        break
+                    except:
+                        pass
+        else:
+            try:
+                body = msg.get_payload(decode=True).decode(msg.get_content_charset() or 'utf-8', errors='replace')
+            except:
+                body = msg.get_payload()
+        
+        if not body:
+            body = "Email body could not be extracted"
+    except Exception as e:
+        # Fallback to regex if email parsing fails
+        # Extract subject
+        subject_match = re.search(r'Subject: (.*?)\n', raw_email, re.IGNORECASE)
+        decoded_subject = subject_match.group(1) if subject_match else "No subject"
+        decoded_subject = re.sub(r'=\?utf-8\?q\?|\?=', '', decoded_subject)
+        
+        # Extract sender
+        from_match = re.search(r'From: (.*?)\n', raw_email, re.IGNORECASE)
+        sender = from_match.group(1) if from_match else "Unknown sender"
+        
+        # Extract date
+        date_match = re.search(r'Date: (.*?)\n', raw_email, re.IGNORECASE)
+        date = date_match.group(1) if date_match else "Unknown date"
+        
+        # Extract body (simplified approach)
+        # Find a blank line followed by content
+        body_match = re.search(r'\n\s*\n(.*)', raw_email, re.DOTALL)
+        body = body_match.group(1) if body_match else "Email body could not be extracted"
+    
+    # Clean up the subject - remove encoding markers
+    decoded_subject = re.sub(r'=\?utf-8\?q\?|\?=', '', decoded_subject)
+    
+    return {
+        "subject": decoded_subject,
+        "sender": sender,
+        "date": date,
+        "body": body
+    }
+
+
+def add_file_entities(entities, file_name, entity_counts, entities_by_file):
+    """Додає унікальні сутності одного файлу до загальних словників (case-insensitive)
+
+    entity_counts: {entity_lower: [кількість, [оригінальні варіанти]]}
+    entities_by_file: {entity_lower: {file1, file2, ...}}
+    """
+    for entity in entities:
+        entity_lower = entity.lower()
+        if entity_lower in entity_counts:
+            entity_counts[entity_lower][0] += 1
+            # Додаємо оригінальну сутність до списку варіантів написання
+            if entity not in entity_counts[entity_lower][1]:
+                entity_counts[entity_lower][1].append(entity)
+        else:
+            entity_counts[entity_lower] = [1, [entity]]
+
+        # Відстежуємо, в яких файлах зустрічається ця сутність
+        if entity_lower not in entities_by_file:
+            entities_by_file[entity_lower] = set()
+        entities_by_file[entity_lower].add(file_name)
+
+
+def common_entities_in_same_file(separate_entities_by_file, combined_entities_by_file):
+    """Сутності, які зустрічаються в обох підходах В ОДНОМУ І ТОМУ Ж ФАЙЛІ"""
+    true_common_entities = set()
+    for entity_lower in set(separate_entities_by_file).intersection(combined_entities_by_file):
+        # Перевіряємо, чи є спільні файли, де ця сутність зустрічається в обох підходах
+        common_files = separate_entities_by_file[entity_lower].intersection(combined_entities_by_file[entity_lower])
+        if common_files:  # Якщо є хоча б один спільний файл
+            true_common_entities.add(entity_lower)
+    return true_common_entities
@@ -0,0 +1,304 @@
+"""Predict the tokens, time and cost of a run before paying for it.
+
+Three small models are fitted on the results index (``pipeline.results_index``):
+
+* **cost** — input and output prices per million tokens, least squares over
+  every interactive run (they come out as the prices in ``pipeline.pricing``;
+  batch runs are billed at a discount and left out);
+* **latency** — ``execution_time ≈ a + b·input_tokens + c·output_tokens``
+  with non-negative coefficients, over every call-level record, plus a
+  per-approach factor for the approaches with document-level runs;
+* **tokens** — per approach, a power law of the document size and the number
+  of chunks, ``tokens ≈ k · document_tokens^p · chunks^q``, fitted in log space
+  on the file comparison runs. The chunk count is
+  ``ceil(document_tokens / chunking_threshold)``, so any threshold can be
+  asked about, not only the 16k and 32k that were run. The number of unique
+  knots extracted (the quality of a run) is fitted the same way.
+
+``RunPredictor.what_if`` chains them for a new document::
+
+    python -m pipeline.predictor samples/technical_test_doc_3.txt --threshold 16000 32000 64000
+    python -m pipeline.predictor --fit     # coefficients and in-sample errors
+
+With a handful of runs per approach the predictions are estimates for
+choosing a setting, not quotes; ``summary`` reports how far off the fits are
+on the runs they were fitted on.
+"""
+import argparse
+import itertools
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline import pricing
+from pipeline.results_index import BATCH_MODE, build_results_index
+
+DEFAULT_THRESHOLDS = (16000, 32000)
+TOKEN_COLUMNS = ("input_tokens", "output_tokens")
+QUALITY_COLUMN = "knots"
+SAMPLES_DIR = "samples"
+
+
+def _frame(records):
+    return records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+
+
+def interactive_records(records):
+    """Records of interactive calls: batch runs are billed at a discount and have no per-call latency"""
+    df = _frame(records)
+    return df[df["mode"] != BATCH_MODE] if "mode" in df else df
+
+
+def call_records(records):
+    """Records of single stages, plus the totals of runs that have no stage records
+
+    A total is the sum of its stages, so fitting on both would count every
+    call twice. Batch runs are left out (``interactive_records``).
+    """
+    df = interactive_records(records)
+    run_keys = ["source", "document", "approach"]
+    stages = df[df["stage"] != "total"]
+    staged_runs = set(map(tuple, stages[run_keys].values))
+    totals = df[df["stage"] == "total"]
+    unstaged = totals[[key not in staged_runs for key in map(tuple, totals[run_keys].values)]]
+    calls = pd.concat([stages, unstaged], ignore_index=True)
+    return calls[calls["execution_time"] > 0]
+
+
+def document_records(records):
+    """Whole-document runs with a known document size and chunking threshold"""
+    df = _frame(records)
+    documents = df[(df["stage"] == "total") & df["document_tokens"].notna() & df["chunking_threshold"].notna()]
+    return documents[(documents["input_tokens"] > 0) & (documents["output_tokens"] > 0)]
+
+
+def chunk_count(document_tokens, chunking_threshold):
+    return max(1, math.ceil(document_tokens / chunking_threshold))
+
+
+def nonnegative_lstsq(x, y):
+    """Least squares with non-negative coefficients, for the few columns these models have
+
+    The constrained optimum is the plain least squares fit on some subset of
+    the columns, so every subset is fitted with ``np.linalg.lstsq`` and the
+    best one without a negative coefficient is kept (2^columns fits).
+    """
+    best = np.zeros(x.shape[1])
+    best_residual = float(np.sum(y ** 2))
+    for size in range(1, x.shape[1] + 1):
+        for columns in itertools.combinations(range(x.shape[1]), size):
+            coefficients = np.linalg.lstsq(x[:, columns], y, rcond=None)[0]
+            if (coefficients < 0).any():
+                continue
+            residual = float(np.sum((x[:, columns] @ coefficients - y) ** 2))
+            if residual < best_residual:
+                best = np.zeros(x.shape[1])
+                best[list(columns)] = coefficients
+                best_residual = residual
+    return best
+
+
+def fit_prices(records):
+    """(input, output) price per million tokens that explains the recorded costs"""
+    df = interactive_records(records)
+    df = df[df["cost"] > 0]
+    x = df[["input_tokens", "output_tokens"]].to_numpy(dtype=float)
+    prices = nonnegative_lstsq(x, df["cost"].to_numpy(dtype=float))
+    return float(prices[0] * 1_000_000), float(prices[1] * 1_000_000)
+
+
+def fit_latency(records):
+    """Seconds per call, per input token and per output token"""
+    calls = call_records(records)
+    x = np.column_stack([np.ones(len(calls)), calls["input_tokens"], calls["output_tokens"]]).astype(float)
+    coefficients = nonnegative_lstsq(x, calls["execution_time"].to_numpy(dtype=float))
+    return tuple(float(c) for c in coefficients)
+
+
+def fit_token_model(documents):
+    """log(y) = log k + p·log(document_tokens) + q·log(chunks), for input/output tokens and knots"""
+    chunks = [chunk_count(d, t) for d, t in zip(documents["document_tokens"], documents["chunking_threshold"])]
+    x = np.column_stack([np.ones(len(documents)), np.log(documents["document_tokens"].astype(float)),
+                         np.log(chunks)])
+    model = {}
+    columns = list(TOKEN_COLUMNS)
+    if QUALITY_COLUMN in documents and (documents[QUALITY_COLUMN].fillna(0) > 0).all():
+        columns.append(QUALITY_COLUMN)
+    for column in columns:
+        # Якщо в даних один розмір документа чи один поріг, lstsq повертає розв'язок з мінімальною нормою
+        coefficients = np.linalg.lstsq(x, np.log(documents[column].astype(float)), rcond=None)[0]
+        model[column] = tuple(float(c) for c in coefficients)
+    return model
+
+
+def _relative_error(predicted, actual):
+    predicted = np.asarray(predicted, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    return float(np.median(np.abs(predicted - actual) / actual)) if len(actual) else float("nan")
+
+
+class RunPredictor:
+    def __init__(self, prices, latency, token_models, latency_factors=None, threshold_ranges=None,
+                 chars_per_token=pricing.CHARS_PER_TOKEN):
+        self.prices = prices
+        self.latency = latency
+        self.token_models = token_models
+        self.latency_factors = latency_factors or {}
+        self.threshold_ranges = threshold_ranges or {}
+        self.chars_per_token = chars_per_token
+
+    @classmethod
+    def fit(cls, records=None, root="."):
+        """Fit every model on ``records`` (by default the whole results index under ``root``)"""
+        df = _frame(build_results_index(root) if records is None else records)
+        predictor = cls(fit_prices(df), fit_latency(df), {},
+                        chars_per_token=calibrate_chars_per_token(df, root))
+        documents = document_records(df)
+        for approach, runs in documents.groupby("approach"):
+            predictor.token_models[approach] = fit_token_model(runs)
+            thresholds = runs["chunking_threshold"]
+            predictor.threshold_ranges[approach] = (thresholds.min(), thresholds.max())
+            predicted = [predictor.predict_time(i, o) for i, o in zip(runs["input_tokens"], runs["output_tokens"])]
+            predictor.latency_factors[approach] = float(np.median(runs["execution_time"] / predicted))
+        return predictor
+
+    @property
+    def approaches(self):
+        return sorted(self.token_models)
+
+    def predict_cost(self, input_tokens, output_tokens):
+        input_price, output_price = self.prices
+        return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+    def predict_time(self, input_tokens, output_tokens, approach=None):
+        per_call, per_input, per_output = self.latency
+        seconds = per_call + per_input * input_tokens + per_output * output_tokens
+        return seconds * self.latency_factors.get(approach, 1.0)
+
+    def predict_tokens(self, document_tokens, approach, chunking_threshold, chunks=None):
+        chunks = chunks or chunk_count(document_tokens, chunking_threshold)
+        tokens = {}
+        for column, (log_k, p, q) in self.token_models[approach].items():
+            tokens[column] = int(round(math.exp(log_k + p * math.log(document_tokens) + q * math.log(chunks))))
+        return tokens
+
+    def predict(self, document_tokens, approach, chunking_threshold, chunks=None):
+        """Predicted metrics of one run, in the same columns as the results index
+
+        ``chunks`` overrides the chunk count when the document has actually
+        been split (section boundaries rarely fill every chunk).
+        """
+        chunks = chunks or chunk_count(document_tokens, chunking_threshold)
+        tokens = self.predict_tokens(document_tokens, approach, chunking_threshold, chunks)
+        input_tokens, output_tokens = tokens["input_tokens"], tokens["output_tokens"]
+        low, high = self.threshold_ranges.get(approach, (chunking_threshold, chunking_threshold))
+        return {
+            "approach": approach,
+            "chunking_threshold": chunking_threshold,
+            "chunks": chunks,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "execution_time": self.predict_time(input_tokens, output_tokens, approach),
+            "cost": self.predict_cost(input_tokens, output_tokens),
+            QUALITY_COLUMN: tokens.get(QUALITY_COLUMN),
+            # Порогів поза записаним діапазоном у даних не було — це екстраполяція
+            "extrapolated": not low <= chunking_threshold <= high,
+        }
+
+    def what_if(self, document_tokens, thresholds=DEFAULT_THRESHOLDS, approaches=None):
+        """Predictions for every (approach, threshold) combination, cheapest first"""
+        rows = [self.predict(document_tokens, approach, threshold)
+                for approach in (approaches or self.approaches) for threshold in thresholds]
+        return pd.DataFrame(rows).sort_values(["cost", "execution_time"], ignore_index=True)
+
+    def document_tokens(self, text):
+        """Token count of a document, estimated with the chars/token ratio of the recorded runs"""
+        return max(1, round(len(text) / self.chars_per_token)) if text else 0
+
+    def summary(self, records=None, root="."):
+        """Fitted coefficients and the median relative error of each fit on the runs"""
+        df = _frame(build_results_index(root) if records is None else records)
+        priced = df[df["cost"] > 0]
+        calls = call_records(df)
+        documents = document_records(df)
+        rows = [
+            {"model": "cost", "detail": f"${self.prices[0]:.2f} / ${self.prices[1]:.2f} per 1M input/output tokens",
+             "runs": len(priced),
+             "error": _relative_error([self.predict_cost(i, o) for i, o in zip(priced["input_tokens"],
+                                                                                priced["output_tokens"])],
+                                      priced["cost"])},
+            {"model": "latency",
+             "detail": f"{self.latency[0]:.2f}s per call + {self.latency[1] * 1000:.3f}s per 1k input "
+                       f"+ {self.latency[2] * 1000:.3f}s per 1k output tokens",
+             "runs": len(calls),
+             "error": _relative_error([self.predict_time(i, o) for i, o in zip(calls["input_tokens"],
+                                                                                calls["output_tokens"])],
+                                      calls["execution_time"])},
+        ]
+        for approach, runs in documents.groupby("approach"):
+            if approach not in self.token_models:
+                continue
+            predicted = [self.predict(d, approach, t) for d, t in zip(runs["document_tokens"],
+                                                                       runs["chunking_threshold"])]
+            for column in [*self.token_models[approach], "execution_time"]:
+                log_k, p, q = self.token_models[approach].get(column, (0, 0, 0))
+                if column in self.token_models[approach]:
+                    detail = f"{math.exp(log_k):.3g} · document^{p:.2f} · chunks^{q:.2f}"
+                else:
+                    detail = f"latency × {self.latency_factors.get(approach, 1.0):.2f}"
+                rows.append({"model": f"{approach} {column}", "detail": detail, "runs": len(runs),
+                             "error": _relative_error([row[column] for row in predicted], runs[column])})
+        return pd.DataFrame(rows)
+
+
+def calibrate_chars_per_token(records, root="."):
+    """Characters per recorded document token, from the runs whose document is in ``samples/``
+
+    ``pricing.CHARS_PER_TOKEN`` is a rule of thumb; the technical samples run
+    at about five characters per token, and predictions for a new document
+    scale with this ratio.
+    """
+    df = _frame(records)
+    chars = tokens = 0
+    sizes = df.dropna(subset=["document_tokens"]).groupby("document")["document_tokens"].first()
+    for document, document_tokens in sizes.items():
+        path = os.path.join(root, SAMPLES_DIR, os.path.basename(str(document)))
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                chars += len(f.read())
+            tokens += document_tokens
+    return chars / tokens if tokens else pricing.CHARS_PER_TOKEN
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict the tokens, time and cost of a run from the stored results")
+    parser.add_argument("paths", nargs="*", help="Documents to predict for")
+    parser.add_argument("--tokens", type=int, action="append", default=[], help="A document size in tokens")
+    parser.add_argument("--threshold", type=int, nargs="+", default=list(DEFAULT_THRESHOLDS),
+                        help="Chunking thresholds to compare")
+    parser.add_argument("--fit", action="store_true", help="Print the fitted models and their errors")
+    args = parser.parse_args()
+
+    predictor = RunPredictor.fit()
+    if args.fit or not (args.paths or args.tokens):
+        summary = predictor.summary()
+        summary["error"] = summary["error"].map(lambda e: f"{e:.0%}")
+        print(summary.to_string(index=False))
+        print(f"{predictor.chars_per_token:.2f} characters per document token")
+    documents = [(f"{size} tokens", size) for size in args.tokens]
+    for path in args.paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            documents.append((path, predictor.document_tokens(f.read())))
+    for name, size in documents:
+        table = predictor.what_if(size, args.threshold)
+        table["execution_time"] = table["execution_time"].map(lambda s: f"{s:.0f}s")
+        table["cost"] = table["cost"].map(lambda c: f"${c:.4f}")
+        print(f"\n{name}: ~{size:,} document tokens")
+        print(table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
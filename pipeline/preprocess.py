@@ -0,0 +1,184 @@
+"""Preprocess emails and documents in parallel into the corpus store.
+
+MIME parsing, quoted-printable/base64 decoding and HTML stripping are CPU-bound
+pure Python, so they run in a process pool. The parent process only locates
+the work (message handles in a mailbox, file paths) and writes the results to
+``indexes/corpus.sqlite``; workers read their input straight from disk, so
+nothing large is pickled between processes::
+
+    python -m pipeline.preprocess emails mail/inbox.mbox --workers 8
+    python -m pipeline.preprocess files samples samples/real_file
+
+Tasks are submitted to the pool in chunks of ``--chunksize``, with a few
+chunks per worker in flight and a new one submitted as each finishes, which
+keeps every worker busy without queueing a whole mailbox at once. Already
+stored messages and unchanged files are skipped, so the command can be re-run
+after new mail arrives.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from itertools import islice
+
+from pipeline import corpus, pricing
+from pipeline.mail_reader import iter_handles, parse_handle
+from pipeline.parsing import get_plain_text
+
+DEFAULT_CHUNKSIZE = 16
+# Скільки чанків на воркера тримати в роботі одночасно
+CHUNKS_PER_WORKER = 4
+DOCUMENT_EXTENSIONS = {".txt": "text", ".md": "text", ".html": "html", ".htm": "html"}
+
+
+def preprocess_email(handle):
+    """``emails`` row for one message; runs in a worker process"""
+    return corpus.email_row(handle, parse_handle(handle))
+
+
+def preprocess_document(path):
+    """``documents`` row for one text or HTML file; runs in a worker process"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    document_format = DOCUMENT_EXTENSIONS[os.path.splitext(path)[1].lower()]
+    content = raw.decode("utf-8", errors="replace")
+    text = get_plain_text(content) if document_format == "html" else content
+    return {
+        "source": path,
+        "name": os.path.basename(path),
+        "format": document_format,
+        "size_bytes": len(raw),
+        "mtime": os.path.getmtime(path),
+        "lines": text.count("\n") + 1 if text else 0,
+        "words": len(text.split()),
+        "text_chars": len(text),
+        "estimated_tokens": pricing.estimate_tokens(text),
+        "text": text,
+        "preprocessed_at": time.time(),
+    }
+
+
+def _map_chunk(function, chunk):
+    return [function(item) for item in chunk]
+
+
+def parallel_map(function, items, workers, chunksize=DEFAULT_CHUNKSIZE):
+    """``function`` over ``items`` in order, fanned out over ``workers`` processes
+
+    ``items`` is cut into chunks of ``chunksize`` and at most ``CHUNKS_PER_WORKER``
+    chunks per worker are in flight: a new chunk is submitted as soon as the
+    oldest one is collected, so workers never wait for a whole window to drain
+    and a generator over millions of messages never sits in the pool as a whole.
+    """
+    items = iter(items)
+    if workers <= 1:
+        yield from map(function, items)
+        return
+    in_flight = deque()
+    with multiprocessing.Pool(workers) as pool:
+        def submit():
+            chunk = list(islice(items, chunksize))
+            if chunk:
+                in_flight.append(pool.apply_async(_map_chunk, (function, chunk)))
+            return bool(chunk)
+
+        while len(in_flight) < workers * CHUNKS_PER_WORKER and submit():
+            pass
+        while in_flight:
+            results = in_flight.popleft().get()
+            submit()
+            yield from results
+
+
+def preprocess_emails(conn, path, workers, chunksize=DEFAULT_CHUNKSIZE, batch_size=corpus.DEFAULT_BATCH_SIZE,
+                      progress=None):
+    """Parse every new message of a mailbox in parallel; returns (processed, inserted)"""
+    source_path = os.path.abspath(path)
+    handles = iter_handles(source_path, skip=lambda source, offset: corpus.is_known(conn, source, offset))
+    processed = inserted = 0
+    batch = []
+    for row in parallel_map(preprocess_email, handles, workers, chunksize):
+        batch.append(row)
+        processed += 1
+        if len(batch) >= batch_size:
+            inserted += corpus.insert_emails(conn, batch)
+            batch.clear()
+            if progress:
+                progress(processed, inserted)
+    if batch:
+        inserted += corpus.insert_emails(conn, batch)
+    return processed, inserted
+
+
+def _walk_files(path):
+    if not os.path.isdir(path):
+        yield path
+        return
+    for directory, subdirectories, files in os.walk(path):
+        subdirectories.sort()
+        for name in sorted(files):
+            yield os.path.join(directory, name)
+
+
+def iter_document_paths(paths):
+    """Absolute paths of the supported files under ``paths``, each once"""
+    seen = set()
+    for path in paths:
+        for candidate in _walk_files(path):
+            candidate = os.path.abspath(candidate)
+            if os.path.splitext(candidate)[1].lower() in DOCUMENT_EXTENSIONS and candidate not in seen:
+                seen.add(candidate)
+                yield candidate
+
+
+def preprocess_documents(conn, paths, workers, chunksize=DEFAULT_CHUNKSIZE, batch_size=corpus.DEFAULT_BATCH_SIZE,
+                         progress=None):
+    """Extract the text of new or changed files in parallel; returns the number of files processed"""
+    stored = corpus.stored_documents(conn)
+    changed = (path for path in iter_document_paths(paths)
+               if stored.get(path) != (os.path.getmtime(path), os.path.getsize(path)))
+    processed = 0
+    batch = []
+    for row in parallel_map(preprocess_document, changed, workers, chunksize):
+        batch.append(row)
+        processed += 1
+        if len(batch) >= batch_size:
+            corpus.upsert_documents(conn, batch)
+            batch.clear()
+            if progress:
+                progress(processed)
+    if batch:
+        corpus.upsert_documents(conn, batch)
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocess emails and documents into the corpus store")
+    parser.add_argument("--db", default=corpus.CORPUS_DB)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Tasks sent to a worker at once")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    emails_parser = subparsers.add_parser("emails", help="An mbox file, a .eml file or a directory of .eml files")
+    emails_parser.add_argument("path")
+    files_parser = subparsers.add_parser("files", help="Text, Markdown and HTML files or directories of them")
+    files_parser.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    conn = corpus.connect(args.db)
+    start = time.perf_counter()
+    if args.command == "emails":
+        processed, inserted = preprocess_emails(
+            conn, args.path, args.workers, args.chunksize,
+            progress=lambda processed, inserted: print(f"{processed} messages preprocessed", end="\r"))
+        print(f"{processed} messages preprocessed, {inserted} new, with {args.workers} workers "
+              f"in {time.perf_counter() - start:.1f}s")
+    else:
+        processed = preprocess_documents(
+            conn, args.paths, args.workers, args.chunksize,
+            progress=lambda processed: print(f"{processed} files preprocessed", end="\r"))
+        print(f"{processed} files preprocessed with {args.workers} workers in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
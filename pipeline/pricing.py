@@ -0,0 +1,29 @@
+"""Model pricing and rough token estimates shared by the command line tools.
+
+Prices are per million tokens and match the costs recorded in ``results/``
+(e.g. 697 input + 5 output tokens -> $0.000072). Input tokens served from the
+provider's prompt cache are billed at the cached input price.
+"""
+INPUT_PRICE_PER_MILLION = 0.10
+CACHED_INPUT_PRICE_PER_MILLION = 0.025
+OUTPUT_PRICE_PER_MILLION = 0.40
+
+# Plain English text averages about four characters per token
+CHARS_PER_TOKEN = 4
+
+
+def cost(input_tokens, output_tokens, cached_input_tokens=0):
+    """Cost of a call; ``cached_input_tokens`` is the part of ``input_tokens`` read from the prompt cache"""
+    return ((input_tokens - cached_input_tokens) * INPUT_PRICE_PER_MILLION
+            + cached_input_tokens * CACHED_INPUT_PRICE_PER_MILLION
+            + output_tokens * OUTPUT_PRICE_PER_MILLION) / 1_000_000
+
+
+def cache_saving(cached_input_tokens):
+    """How much less ``cached_input_tokens`` cost when read from the prompt cache"""
+    return cached_input_tokens * (INPUT_PRICE_PER_MILLION - CACHED_INPUT_PRICE_PER_MILLION) / 1_000_000
+
+
+def estimate_tokens(text):
+    """Rough token count of plain text, without a tokenizer"""
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
@@ -0,0 +1,83 @@
+"""Summarize the dashboard profile trace written by ``dashboard/profiling.py``.
+
+Every profiled rerun appends one JSON line with per-section timings. This
+report groups them by release, page and section so rerun latency can be
+compared between releases::
+
+    python -m pipeline.profile_report
+    python -m pipeline.profile_report --page file_comparison --release a1b2c3d
+"""
+import argparse
+import json
+import os
+import statistics
+
+TRACE_FILE = os.environ.get("DASHBOARD_PROFILE_TRACE", os.path.join("profiles", "page_timings.jsonl"))
+
+
+def read_trace(path=TRACE_FILE):
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(records):
+    """Rows of (release, page, section, reruns, median ms, p95 ms, median alloc KB) in trace order"""
+    groups = {}
+    for record in records:
+        key = (record["release"], record["page"])
+        groups.setdefault((*key, "(total)"), {"ms": [], "alloc_kb": []})["ms"].append(record["total_ms"])
+        for section in record["sections"]:
+            group = groups.setdefault((*key, section["name"]), {"ms": [], "alloc_kb": []})
+            group["ms"].append(section["ms"])
+            group["alloc_kb"].append(section["alloc_kb"])
+
+    rows = []
+    for (release, page, section), values in groups.items():
+        rows.append({
+            "release": release,
+            "page": page,
+            "section": section,
+            "reruns": len(values["ms"]),
+            "median_ms": statistics.median(values["ms"]),
+            "p95_ms": percentile(values["ms"], 0.95),
+            "median_alloc_kb": statistics.median(values["alloc_kb"]) if values["alloc_kb"] else None,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-release summary of dashboard section timings")
+    parser.add_argument("--trace", default=TRACE_FILE)
+    parser.add_argument("--page")
+    parser.add_argument("--release")
+    args = parser.parse_args()
+
+    records = [r for r in read_trace(args.trace)
+               if (not args.page or r["page"] == args.page) and (not args.release or r["release"] == args.release)]
+    if not records:
+        print("No profiled reruns in the trace")
+        return
+
+    print(f"{'release':<10} {'page':<26} {'section':<16} {'reruns':>6} {'median ms':>10} {'p95 ms':>10} {'alloc KB':>10}")
+    for row in summarize(records):
+        alloc = f"{row['median_alloc_kb']:.0f}" if row["median_alloc_kb"] is not None else "-"
+        print(f"{row['release']:<10} {row['page']:<26} {row['section']:<16} {row['reruns']:>6} "
+              f"{row['median_ms']:>10.1f} {row['p95_ms']:>10.1f} {alloc:>10}")
+
+
+if __name__ == "__main__":
+    main()
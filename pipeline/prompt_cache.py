@@ -0,0 +1,152 @@
+"""Prompt prefix caching: what a call can read from the provider's cache.
+
+Every prompt in ``pipeline.prompts`` is a stable prefix (the system message
+with the instructions and templates) followed by a variable suffix (the
+document or chunk, always the last message). OpenAI-compatible providers
+cache prefixes automatically: once a prefix of at least ``MIN_PREFIX_TOKENS``
+has been seen, later calls that start with it read it from the cache, in
+blocks of ``BLOCK_TOKENS``, at the cached input price (``pipeline.pricing``)
+and without prefilling it again.
+
+``PrefixCache`` simulates that for ``StubBackend``, so the gains can be
+measured offline. ``project_cached_tokens`` bounds them from above for the
+stored runs, which were made without recording cache hits and whose prompts
+are not kept with the results::
+
+    python -m pipeline.prompt_cache
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from pipeline import pricing
+from pipeline.predictor import call_records
+from pipeline.results_index import build_results_index
+
+# Як в OpenAI: префікси від 1024 токенів, кешуються блоками по 128, живуть кілька хвилин без звернень
+MIN_PREFIX_TOKENS = 1024
+BLOCK_TOKENS = 128
+PREFIX_TTL = 300
+MAX_PREFIXES = 256
+
+
+def cacheable_tokens(prefix_tokens, min_tokens=MIN_PREFIX_TOKENS, block_tokens=BLOCK_TOKENS):
+    """Tokens of a prefix that can be served from the cache"""
+    if prefix_tokens < min_tokens:
+        return 0
+    return prefix_tokens // block_tokens * block_tokens
+
+
+def split_messages(messages):
+    """(stable prefix, variable suffix): the suffix is the last message, the document"""
+    return messages[:-1], messages[-1:]
+
+
+def prefix_tokens(messages):
+    prefix, _ = split_messages(messages)
+    return sum(pricing.estimate_tokens(message["content"]) for message in prefix)
+
+
+def prefix_key(messages):
+    """Identifies the stable prefix of a request"""
+    prefix, _ = split_messages(messages)
+    return hashlib.sha256(json.dumps(prefix, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class PrefixCache:
+    """Least recently used prefixes that expire ``ttl`` seconds after their last use"""
+
+    def __init__(self, min_tokens=MIN_PREFIX_TOKENS, ttl=PREFIX_TTL, max_prefixes=MAX_PREFIXES):
+        self.min_tokens = min_tokens
+        self.ttl = ttl
+        self.max_prefixes = max_prefixes
+        self._prefixes = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def lookup(self, messages):
+        """Cached input tokens of a request; the prefix is cached for the next one either way"""
+        tokens = cacheable_tokens(prefix_tokens(messages), self.min_tokens)
+        if not tokens:
+            return 0
+        key = prefix_key(messages)
+        with self._lock:
+            now = time.monotonic()
+            last_used = self._prefixes.pop(key, None)
+            hit = last_used is not None and now - last_used <= self.ttl
+            self._prefixes[key] = now
+            while len(self._prefixes) > self.max_prefixes:
+                self._prefixes.popitem(last=False)
+            if hit:
+                self.hits += 1
+                return tokens
+            self.misses += 1
+            return 0
+
+
+def run_set(record):
+    """Runs that share prompts: one results file, or the whole directory of per-document real_file results"""
+    if record["layout"] == "real_file":
+        return os.path.dirname(record["source"])
+    return record["source"]
+
+
+def project_cached_tokens(records, min_tokens=MIN_PREFIX_TOKENS):
+    """Call records with the cached input tokens and the cost they would have had with prefix caching
+
+    Runs that recorded cache hits keep them (``projected`` is False). For the
+    others, the calls of one stage across the documents of a run set share
+    their instructions, and every call after the first reads them from the
+    cache. The prompts of the stored runs are not known, so the shared prefix
+    is taken as the smallest input of the stage: it includes the shortest
+    document, which makes the projected cached tokens and saving upper bounds
+    and ``effective_cost`` (the recorded cost less the cache discount) a lower
+    bound.
+    """
+    calls = call_records(records).copy()
+    calls["run_set"] = calls.apply(run_set, axis=1)
+    calls["projected"] = calls["cached_input_tokens"].isna()
+    calls["prefix_tokens"] = calls.groupby(["run_set", "approach", "stage"])["input_tokens"].transform("min")
+    first_call = ~calls.duplicated(["run_set", "approach", "stage"])
+    projected = [0 if first else cacheable_tokens(prefix, min_tokens)
+                 for first, prefix in zip(first_call, calls["prefix_tokens"])]
+    calls["cached_input_tokens"] = calls["cached_input_tokens"].fillna(0).where(~calls["projected"], projected)
+    calls["projected"] &= calls["cached_input_tokens"] > 0
+    # Записана вартість уже врахувала кеш там, де він записаний
+    discounted = calls["cached_input_tokens"].where(calls["projected"], 0)
+    calls["effective_cost"] = calls["cost"] - pricing.cache_saving(discounted)
+    return calls
+
+
+def cache_summary(calls):
+    """Per run set and approach: calls, input and cached tokens, recorded and effective cost"""
+    summary = calls.groupby(["run_set", "approach"]).agg(
+        calls=("stage", "size"), input_tokens=("input_tokens", "sum"),
+        cached_input_tokens=("cached_input_tokens", "sum"), cost=("cost", "sum"),
+        effective_cost=("effective_cost", "sum"), projected=("projected", "any")).reset_index()
+    summary["saving"] = 1 - summary["effective_cost"] / summary["cost"].where(summary["cost"] > 0)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Effective cost of the stored runs with prompt prefix caching")
+    parser.add_argument("--min-tokens", type=int, default=MIN_PREFIX_TOKENS,
+                        help="Shortest prefix the provider caches")
+    args = parser.parse_args()
+
+    summary = cache_summary(project_cached_tokens(pd.DataFrame(build_results_index()), args.min_tokens))
+    for row in summary.itertuples():
+        share = row.cached_input_tokens / row.input_tokens if row.input_tokens else 0
+        saving = f"{row.saving:.0%}" if row.saving > 0 else "-"
+        print(f"{row.run_set:45} {row.approach:17} {row.calls:>3} calls  {share:4.0%} cached  "
+              f"${row.cost:.6f} -> ${row.effective_cost:.6f} ({saving}){' upper bound' if row.projected else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Prompts for the file category and extraction stages.
+
+``CATEGORIES`` maps the labels the category prompt answers with to the
+category names used in ``extracted_data``; ``SCHEMAS`` holds the empty
+extraction template of each category, as returned in ``results/``. The
+``*_messages`` helpers build chat messages for ``pipeline.backend``; the
+``packed_*`` ones send several small documents in one request, each between
+``DOCUMENT_START`` and ``DOCUMENT_END`` delimiters with its id.
+"""
+import json
+import re
+
+CATEGORIES = {
+    "BUSINESS_CORPORATE": "business_and_corporate",
+    "HEALTHCARE_MEDICAL": "healthcare_and_medical",
+    "IT_SOFTWARE": "it_and_software",
+    "LEGAL_GOVERNMENT": "legal_and_government",
+    "SCIENTIFIC_RESEARCH": "scientific_and_research",
+}
+
+SCHEMAS = {
+    "BUSINESS_CORPORATE": {
+        "company_details": {"name": None, "address": None, "industry": None, "stakeholders": None},
+        "executive_summary": {"overview": None, "mission": None, "key_objectives": None},
+        "financial_data": {"balance_sheets": None, "income_statements": None, "cash_flow": None},
+        "contracts_agreements": {"terms": None, "conditions": None, "legal_clauses": None},
+        "marketing_strategy": {"branding": None, "customer_testimonials": None, "case_studies": None},
+        "compliance_regulations": {"corporate_policies": None, "legal_disclosures": None},
+        "key_dates_timelines": {"financial_reporting_periods": [], "contract_dates": [],
+                                "product_launch_marketing_campaigns": [], "business_milestones": [],
+                                "shareholder_meeting_dates": []},
+    },
+    "HEALTHCARE_MEDICAL": {
+        "patient_info": {"name": None, "ID": None, "medical_history": None},
+        "diagnosis_treatment": {"prescriptions": [], "procedures": [], "therapy": []},
+        "clinical_trial_data": {"participants": None, "control_groups": None, "results": None},
+        "healthcare_regulations": {"medical_compliance": None, "ethical_considerations": None},
+        "pharmaceutical_docs": {"drug_composition": None, "side_effects": None, "warnings": None},
+        "key_dates_timelines": {"medical_consultation_admission_discharge_dates": [], "clinical_trial_dates": [],
+                                "drug_approval_patent_expiry_dates": []},
+    },
+    "IT_SOFTWARE": {
+        "software_info": {"name": None, "version": None},
+        "installation_setup": {"steps": [], "configuration": {"environment_variables": [], "dependencies": []}},
+        "user_interface_features": {"functionalities": [], "shortcuts": [],
+                                    "compatibility": {"operating_systems": [], "browsers": [], "platforms": []}},
+        "api_documentation": {"endpoints": [], "authentication": [], "code_examples": None},
+        "security_guidelines": {"encryption": [], "compliance_policies": []},
+        "bug_fixes_updates": {"changelog": [], "known_issues": []},
+        "key_dates_timelines": {"software_release_update_schedules": [], "API_deprecation_dates": [],
+                                "cybersecurity_patch_release_dates": []},
+    },
+    "LEGAL_GOVERNMENT": {
+        "title_legal_jurisdiction": {"title": None, "jurisdiction": None},
+        "legal_provisions_regulations": {"rules": None, "policies": None, "enforcement_measures": None},
+        "case_background_rulings": {"legal_arguments": None, "judges_opinion": None, "verdict": None},
+        "compliance_requirements": {"penalties": None, "obligations": None, "permits_licenses": None},
+        "official_notices_reports": {"policy_statements": None, "analysis": None, "public_impact": None},
+        "key_dates_timelines": {"effective_dates_of_laws_policies": [], "court_case_dates": [],
+                                "permit_license_dates": [], "public_policy_dates": []},
+    },
+    "SCIENTIFIC_RESEARCH": {
+        "study_title_author_info": {"title": None, "authors": []},
+        "hypothesis_goals": {"hypothesis": None, "research_goals": []},
+        "experiment_setup_data": {"experiment_description": None, "data_collection_method": None,
+                                  "tools_techniques": []},
+        "statistical_analysis_results": {"methods": None, "results": None},
+        "peer_review_references": {"peer_review": None, "references": []},
+        "environmental_climate_studies": {"impact_assessment": None, "conservation_strategies": None},
+        "key_dates_timelines": {"research_study_period": None, "data_collection_dates": [],
+                                "experiment_validation_dates": [], "publication_dates": []},
+    },
+}
+
+# Для визначення категорії достатньо початку документа
+CATEGORY_SAMPLE_CHARS = 4000
+
+CATEGORY_PROMPT = """You classify documents. Read the document and answer with exactly one of these labels and nothing else:
+
+BUSINESS_CORPORATE - company details, financial statements, contracts, marketing, corporate policies
+HEALTHCARE_MEDICAL - patient records, diagnoses and treatment, clinical trials, pharmaceutical documents
+IT_SOFTWARE - software documentation, installation and configuration, APIs, security guidelines, changelogs
+LEGAL_GOVERNMENT - laws and regulations, court cases and rulings, compliance requirements, official notices
+SCIENTIFIC_RESEARCH - research papers, hypotheses, experiments, statistical results, references"""
+
+EXTRACTION_PROMPT = """You extract structured data from a {category} document.
+Fill in the JSON template below using only information stated in the document. Keep null or an empty list when the
+document does not contain the information; do not invent values. Dates go into key_dates_timelines.
+Answer with JSON only, in the form {{"category": "{category}", "extracted_data": <template>}}.
+
+Template:
+{template}"""
+
+COMBINED_PROMPT = """You extract structured data from documents in one step.
+First decide the document category, one of: {labels}.
+Then fill in the JSON template of that category using only information stated in the document. Keep null or an empty
+list when the document does not contain the information; do not invent values.
+Answer with JSON only, in the form {{"category": "<category name>", "extracted_data": <template>}}.
+
+Templates by category:
+{templates}"""
+
+DOCUMENT_START = "<<<DOCUMENT {id}>>>"
+DOCUMENT_END = "<<<END DOCUMENT {id}>>>"
+
+PACKED_CATEGORY_PROMPT = """The input holds several documents, each between <<<DOCUMENT id>>> and <<<END DOCUMENT id>>>.
+Classify every document separately. Instead of a single label, answer with one line per document, "<id>: <label>",
+and nothing else."""
+
+PACKED_PROMPT = """The input holds several documents, each between <<<DOCUMENT id>>> and <<<END DOCUMENT id>>>.
+Treat every document separately; never mix information from different documents. Answer with JSON only, in the form
+{"documents": {"<id>": <the answer described above for that document>}}, with one entry for every id."""
+
+_PACKED_LABEL_RE = re.compile(r"^[\s`*]*(\w+)[\s`*]*[:=-]\s*(.+)$")
+
+
+def packed_text(documents):
+    """The documents of a packed request, ``{id: text}``, between their delimiters"""
+    return "\n\n".join(f"{DOCUMENT_START.format(id=doc_id)}\n{text}\n{DOCUMENT_END.format(id=doc_id)}"
+                        for doc_id, text in documents.items())
+
+
+def category_messages(text):
+    return [
+        {"role": "system", "content": CATEGORY_PROMPT},
+        {"role": "user", "content": text[:CATEGORY_SAMPLE_CHARS]},
+    ]
+
+
+def extraction_messages(label, text):
+    prompt = EXTRACTION_PROMPT.format(category=CATEGORIES[label], template=json.dumps(SCHEMAS[label], indent=2))
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": text},
+    ]
+
+
+def combined_messages(text):
+    templates = "\n".join(f"{CATEGORIES[label]}: {json.dumps(schema)}" for label, schema in SCHEMAS.items())
+    prompt = COMBINED_PROMPT.format(labels=", ".join(CATEGORIES.values()), templates=templates)
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": text},
+    ]
+
+
+def packed_category_messages(documents):
+    samples = {doc_id: text[:CATEGORY_SAMPLE_CHARS] for doc_id, text in documents.items()}
+    return [
+        {"role": "system", "content": f"{CATEGORY_PROMPT}\n\n{PACKED_CATEGORY_PROMPT}"},
+        {"role": "user", "content": packed_text(samples)},
+    ]
+
+
+def packed_extraction_messages(label, documents):
+    messages = extraction_messages(label, packed_text(documents))
+    messages[0]["content"] += "\n\n" + PACKED_PROMPT
+    return messages
+
+
+def packed_combined_messages(documents):
+    messages = combined_messages(packed_text(documents))
+    messages[0]["content"] += "\n\n" + PACKED_PROMPT
+    return messages
+
+
+def parse_packed_categories(answer):
+    """``{id: label}`` from the "<id>: <label>" lines of a packed category answer"""
+    labels = {}
+    for line in answer.splitlines():
+        match = _PACKED_LABEL_RE.match(line)
+        if match:
+            labels[match.group(1)] = parse_category(match.group(2))
+    return labels
+
+
+def parse_category(answer):
+    """The category label in a model answer, or None"""
+    answer = answer.strip().upper()
+    for label in CATEGORIES:
+        if label in answer:
+            return label
+    return None
@@ -0,0 +1,209 @@
+"""Keep parallel requests under the provider's requests- and tokens-per-minute limits.
+
+``RateLimiter`` admits each request through two token buckets, one counting
+requests (RPM) and one counting tokens (TPM), refilled continuously. Every
+request states its estimated tokens up front (prompt plus expected answer)
+and waits in a queue until both buckets can pay for it; the estimate is
+settled against the actual usage afterwards. While the token bucket has
+headroom the shortest waiting request goes first; when it runs low the
+oldest does, so long documents are not starved.
+
+``RateLimitedBackend`` wraps any backend with a limiter, learns the expected
+answer length per stage, backs off on HTTP 429 and adds the time spent in the
+queue (``queue_wait``) and the queue depth on arrival (``queue_depth``) to
+the metrics of every call::
+
+    backend = RateLimitedBackend(get_backend("openai"), RateLimiter(rpm=500, tpm=200_000))
+"""
+import threading
+import time
+
+from pipeline import pricing
+from pipeline.backend import BackendError
+
+# Скільки секунд квоти можна витратити одним сплеском; провайдери рахують ліміти і на коротших вікнах
+BURST_SECONDS = 10
+# Частка ємності бакета токенів, вище якої першими йдуть короткі запити
+HEADROOM_SHARE = 0.5
+DEFAULT_OUTPUT_TOKENS = 1000
+RETRY_LIMIT = 5
+RETRY_AFTER = 5.0
+MIN_POLL = 0.05
+
+
+class TokenBucket:
+    """``rate_per_minute`` units refilled continuously, at most ``capacity`` stored"""
+
+    def __init__(self, rate_per_minute, capacity=None, now=0.0):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute * BURST_SECONDS / 60
+        self.level = self.capacity
+        self.updated = now
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def seconds_until(self, amount):
+        """Seconds until ``amount`` is available (after ``refill``)"""
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+
+class RateLimiter:
+    """Admission control through an RPM and a TPM bucket; thread-safe"""
+
+    def __init__(self, rpm=None, tpm=None, burst_seconds=BURST_SECONDS, clock=time.monotonic):
+        self.clock = clock
+        now = clock()
+        self.requests = TokenBucket(rpm, max(1.0, rpm * burst_seconds / 60), now) if rpm else None
+        self.tokens = TokenBucket(tpm, tpm * burst_seconds / 60, now) if tpm else None
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = 0
+        self._blocked_until = 0.0
+        self.admitted = self.waited = self.throttled = self.max_depth = 0
+        self.total_wait = self.max_wait = 0.0
+
+    def _buckets(self):
+        return [bucket for bucket in (self.requests, self.tokens) if bucket is not None]
+
+    def _next(self):
+        """The waiter to admit next: the shortest with headroom, else the oldest"""
+        if self.tokens is None or self.tokens.level >= HEADROOM_SHARE * self.tokens.capacity:
+            return min(self._waiting)
+        return min(self._waiting, key=lambda waiter: waiter[1])
+
+    def _seconds_until(self, tokens, now):
+        waits = [self._blocked_until - now]
+        if self.requests is not None:
+            waits.append(self.requests.seconds_until(1))
+        if self.tokens is not None:
+            waits.append(self.tokens.seconds_until(tokens))
+        return max(waits)
+
+    def acquire(self, tokens):
+        """Block until a request of ``tokens`` estimated tokens may be sent; returns (seconds waited, depth)"""
+        with self._condition:
+            self._sequence += 1
+            waiter = (tokens, self._sequence)
+            self._waiting.append(waiter)
+            depth = len(self._waiting)
+            self.max_depth = max(self.max_depth, depth)
+            start = self.clock()
+            waited = 0.0
+            while True:
+                now = self.clock()
+                for bucket in self._buckets():
+                    bucket.refill(now)
+                chosen = self._next()
+                delay = self._seconds_until(chosen[0], now)
+                if chosen == waiter and delay <= 0:
+                    break
+                waited = None
+                # Кожен чекає з таймаутом: з часом бакет поповнюється, і черговість може змінитися
+                self._condition.wait(max(delay, MIN_POLL))
+            self._waiting.remove(waiter)
+            if self.requests is not None:
+                self.requests.level -= 1
+            if self.tokens is not None:
+                self.tokens.level -= min(tokens, self.tokens.capacity)
+            self.admitted += 1
+            if waited is None:
+                waited = now - start
+                self.waited += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self._condition.notify_all()
+        return waited, depth
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once the actual usage of an admitted request is known"""
+        if self.tokens is None:
+            return
+        with self._condition:
+            self.tokens.level = min(self.tokens.capacity,
+                                    self.tokens.level + min(estimated, self.tokens.capacity) - actual)
+            self._condition.notify_all()
+
+    def backoff(self, seconds):
+        """The provider answered 429: admit nothing for ``seconds`` and start the buckets empty"""
+        with self._condition:
+            self.throttled += 1
+            self._blocked_until = max(self._blocked_until, self.clock() + seconds)
+            for bucket in self._buckets():
+                bucket.level = min(bucket.level, 0.0)
+            self._condition.notify_all()
+
+    @property
+    def depth(self):
+        return len(self._waiting)
+
+    def stats(self):
+        return {"admitted": self.admitted, "waited": self.waited, "throttled": self.throttled,
+                "queue_depth": self.depth, "max_queue_depth": self.max_depth,
+                "total_wait": self.total_wait, "max_wait": self.max_wait,
+                "mean_wait": self.total_wait / self.admitted if self.admitted else 0.0}
+
+
+class RateLimitedBackend:
+    """A backend whose calls go through a ``RateLimiter``"""
+
+    def __init__(self, backend, limiter, retries=RETRY_LIMIT, retry_after=RETRY_AFTER):
+        self.backend = backend
+        self.limiter = limiter
+        self.retries = retries
+        self.retry_after = retry_after
+        self.name = backend.name
+        self.model = getattr(backend, "model", None)
+        # Очікувана довжина відповіді на кожному етапі, ковзне середнє фактичних
+        self.output_tokens = {}
+        self._lock = threading.Lock()
+
+    def estimate(self, messages, stage=None):
+        """Tokens a request is expected to use: the prompt plus the usual answer of its stage"""
+        prompt = sum(pricing.estimate_tokens(message["content"]) for message in messages)
+        return prompt + round(self.output_tokens.get(stage, DEFAULT_OUTPUT_TOKENS))
+
+    def _learn(self, stage, output_tokens):
+        with self._lock:
+            previous = self.output_tokens.get(stage)
+            self.output_tokens[stage] = output_tokens if previous is None else 0.8 * previous + 0.2 * output_tokens
+
+    def complete(self, messages, stage=None):
+        estimated = self.estimate(messages, stage)
+        queue_wait = 0.0
+        for attempt in range(self.retries + 1):
+            waited, depth = self.limiter.acquire(estimated)
+            queue_wait += waited
+            try:
+                completion = self.backend.complete(messages, stage=stage)
+            except BackendError as e:
+                self.limiter.settle(estimated, 0)
+                if e.status != 429 or attempt == self.retries:
+                    raise
+                self.limiter.backoff(self.retry_after)
+                continue
+            break
+        self.limiter.settle(estimated, completion["input_tokens"] + completion["output_tokens"])
+        self._learn(stage, completion["output_tokens"])
+        completion["queue_wait"] = queue_wait
+        completion["queue_depth"] = depth
+        return completion
+
+    def stream(self, messages, stage=None):
+        """A stream admitted through the limiter; its usage is settled when it is read to the end or closed"""
+        estimated = self.estimate(messages, stage)
+        waited, depth = self.limiter.acquire(estimated)
+        stream = self.backend.stream(messages, stage=stage)
+        result = stream.result
+
+        def settled_result():
+            completion = result()
+            self.limiter.settle(estimated, completion["input_tokens"] + completion["output_tokens"])
+            self._learn(stage, completion["output_tokens"])
+            completion["queue_wait"] = waited
+            completion["queue_depth"] = depth
+            return completion
+
+        stream.result = settled_result
+        return stream
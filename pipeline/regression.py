@@ -0,0 +1,222 @@
+"""Cost and latency regression gate: a candidate run against a baseline, document by document.
+
+Every prompt iteration produces a new results file; ``gate`` checks whether
+it got more expensive or slower than the run it replaces. Runs come from the
+results index and are named ``SOURCE[:APPROACH]``, where SOURCE is a
+results file or a directory of per-document results (``results/runs``).
+Documents are paired: by document and approach, or by document alone when
+both runs name an approach, so the two prompts of one file can be compared
+(``results/real_email_combined_prompts_v9.json:new_prompt`` against
+``...:optimized_prompt``).
+
+For every metric the change is the geometric mean of the per-document
+ratios candidate/baseline, with a bootstrap confidence interval over the
+documents. A metric fails when the whole interval is above its threshold
+(a regression that is not noise), and warns when only the estimate is. A
+metric with fewer than ``MIN_PAIRS`` usable pairs (e.g. timings recorded
+for only a few documents) is skipped rather than judged on a degenerate
+interval. The verdict fails when any metric fails, and is ``insufficient``
+with fewer than ``MIN_PAIRS`` documents::
+
+    python -m pipeline.regression results/real_email_combined_prompts_v9.json
+    python -m pipeline.regression results/runs --baseline results/real_file --threshold cost=0.02 --json verdict.json
+
+Without ``--baseline`` the candidate is compared with the previous prompt
+version of the same file (``_v7`` for ``_v9``). The exit status is 1 when
+the verdict fails and 2 when there are too few paired documents to tell, so
+the gate blocks a rollout like a failing test.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from pipeline.predictor import interactive_records
+from pipeline.prompt_cache import run_set
+from pipeline.results_index import build_results_index
+
+METRICS = ["input_tokens", "output_tokens", "cost", "execution_time"]
+# Латентність шумна (v5/v6/v7 тих самих листів), тому поріг для неї ширший
+DEFAULT_THRESHOLDS = {"input_tokens": 0.05, "output_tokens": 0.10, "cost": 0.05, "execution_time": 0.15}
+DEFAULT_CONFIDENCE = 0.9
+MIN_PAIRS = 3
+BOOTSTRAP_SAMPLES = 2000
+SEED = 0
+EXIT_CODES = {"fail": 1, "insufficient": 2}
+_VERSION_RE = re.compile(r"_v(\d+)((?:_\d*)?_?\.json)$")
+
+
+def parse_run(spec):
+    """(run set, approach or None) of ``SOURCE[:APPROACH]``"""
+    source, _, approach = spec.partition(":")
+    return source.rstrip("/"), approach or None
+
+
+def run_totals(records, source, approach=None):
+    """Per-document totals of a run set, one row per (document, approach); batch runs are left out"""
+    df = interactive_records(records)
+    totals = df[df["stage"] == "total"]
+    totals = totals[[run_set(record) == source for record in totals.to_dict("records")]]
+    if approach is not None:
+        totals = totals[totals["approach"] == approach]
+    return totals.drop_duplicates(["document", "approach"], keep="last")
+
+
+def previous_version(source, sources):
+    """The highest ``_vN`` of the same results file below the version of ``source``; None if there is none"""
+    match = _VERSION_RE.search(source)
+    if match is None:
+        return None
+    stem = source[:match.start()]
+    version = int(match.group(1))
+    candidates = []
+    for other in sources:
+        other_match = _VERSION_RE.search(other)
+        if other_match and other[:other_match.start()] == stem and int(other_match.group(1)) < version:
+            candidates.append((int(other_match.group(1)), other))
+    return max(candidates)[1] if candidates else None
+
+
+def pair_runs(baseline, candidate, by_approach=True):
+    """Documents present in both runs, with ``baseline_<metric>`` and ``candidate_<metric>`` columns"""
+    keys = ["document", "approach"] if by_approach else ["document"]
+    columns = keys + METRICS
+    pairs = baseline[columns].merge(candidate[columns], on=keys, suffixes=("_baseline", "_candidate"))
+    return pairs.rename(columns={f"{metric}_{side}": f"{side}_{metric}"
+                                 for metric in METRICS for side in ("baseline", "candidate")})
+
+
+def paired_change(baseline, candidate, confidence=DEFAULT_CONFIDENCE, samples=BOOTSTRAP_SAMPLES, seed=SEED):
+    """(change, low, high, pairs): geometric mean of the ratios - 1 and its bootstrap interval
+
+    Pairs where either side is zero or missing (a run without timings) are
+    left out.
+    """
+    baseline = np.asarray(baseline, dtype=float)
+    candidate = np.asarray(candidate, dtype=float)
+    valid = (baseline > 0) & (candidate > 0)
+    log_ratios = np.log(candidate[valid] / baseline[valid])
+    if not len(log_ratios):
+        return None, None, None, 0
+    rng = np.random.default_rng(seed)
+    means = log_ratios[rng.integers(0, len(log_ratios), (samples, len(log_ratios)))].mean(axis=1)
+    tail = (1 - confidence) / 2
+    low, high = np.quantile(means, [tail, 1 - tail])
+    return float(np.expm1(log_ratios.mean())), float(np.expm1(low)), float(np.expm1(high)), int(len(log_ratios))
+
+
+def metric_status(change, low, threshold, pairs=None, min_pairs=MIN_PAIRS):
+    # З одної-двох пар бутстреп дає інтервал нульової ширини, і шум виглядає як регресія
+    if change is None or (pairs is not None and pairs < min_pairs):
+        return "skipped"
+    if low > threshold:
+        return "fail"
+    if change > threshold:
+        return "warn"
+    return "pass"
+
+
+def gate(records, candidate, baseline=None, thresholds=None, confidence=DEFAULT_CONFIDENCE, min_pairs=MIN_PAIRS):
+    """The verdict on ``candidate`` against ``baseline`` (``SOURCE[:APPROACH]`` specs), as a JSON-ready dict"""
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    candidate_source, candidate_approach = parse_run(candidate)
+    if baseline is None:
+        sources = {run_set(record) for record in df[df["stage"] == "total"].to_dict("records")}
+        previous = previous_version(candidate_source, sources)
+        if previous is None:
+            raise ValueError(f"No earlier version of {candidate_source} in the results index; give --baseline")
+        baseline = previous + (f":{candidate_approach}" if candidate_approach else "")
+    baseline_source, baseline_approach = parse_run(baseline)
+    by_approach = not (candidate_approach and baseline_approach)
+    pairs = pair_runs(run_totals(df, baseline_source, baseline_approach),
+                      run_totals(df, candidate_source, candidate_approach), by_approach)
+
+    metrics = {}
+    for metric in METRICS:
+        change, low, high, count = paired_change(pairs[f"baseline_{metric}"], pairs[f"candidate_{metric}"],
+                                                 confidence)
+        metrics[metric] = {
+            "threshold": thresholds.get(metric), "pairs": count,
+            "baseline_mean": float(pairs[f"baseline_{metric}"].mean()) if len(pairs) else None,
+            "candidate_mean": float(pairs[f"candidate_{metric}"].mean()) if len(pairs) else None,
+            "change": change, "low": low, "high": high,
+            "status": metric_status(change, low, thresholds[metric], count, min_pairs)
+            if thresholds.get(metric) is not None else "info",
+        }
+    statuses = [result["status"] for result in metrics.values()]
+    if len(pairs) < min_pairs:
+        verdict = "insufficient"
+    elif "fail" in statuses:
+        verdict = "fail"
+    elif "warn" in statuses:
+        verdict = "warn"
+    else:
+        verdict = "pass"
+    documents = [{
+        "document": row["document"], **({"approach": row["approach"]} if by_approach else {}),
+        **{metric: row[f"candidate_{metric}"] / row[f"baseline_{metric}"] - 1 if row[f"baseline_{metric}"]
+           else None for metric in METRICS},
+    } for row in pairs.to_dict("records")]
+    return {"baseline": baseline, "candidate": candidate, "confidence": confidence, "pairs": len(pairs),
+            "verdict": verdict, "metrics": metrics, "documents": documents}
+
+
+def format_report(result):
+    lines = [f"{result['candidate']} vs {result['baseline']}: {result['verdict'].upper()} "
+             f"({result['pairs']} paired documents, {result['confidence']:.0%} intervals)"]
+    for metric, values in result["metrics"].items():
+        if values["change"] is None:
+            lines.append(f"  {metric:<15} no paired values")
+            continue
+        threshold = f"threshold {values['threshold']:+.0%}" if values["threshold"] is not None else "no threshold"
+        status = values["status"]
+        if status == "skipped":
+            status = f"skipped, {values['pairs']} paired values"
+        lines.append(f"  {metric:<15} {values['change']:+7.1%}  [{values['low']:+.1%}, {values['high']:+.1%}]  "
+                     f"{threshold:<16} {status}")
+    return "\n".join(lines)
+
+
+def threshold_arg(value):
+    metric, _, limit = value.partition("=")
+    if metric not in METRICS or not limit:
+        raise argparse.ArgumentTypeError(f"expected METRIC=FRACTION with METRIC one of {', '.join(METRICS)}")
+    return metric, None if limit == "none" else float(limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when a run is more expensive or slower than its baseline")
+    parser.add_argument("candidate", help="SOURCE[:APPROACH], a results file or directory of the results index")
+    parser.add_argument("--baseline", help="SOURCE[:APPROACH] (default: the previous _vN of the candidate)")
+    parser.add_argument("--threshold", type=threshold_arg, action="append", default=[],
+                        help="Largest tolerated increase, e.g. cost=0.05 or execution_time=none; repeatable")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument("--min-pairs", type=int, default=MIN_PAIRS)
+    parser.add_argument("--json", help="Write the verdict as JSON to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    try:
+        result = gate(build_results_index(), args.candidate, args.baseline, dict(args.threshold),
+                      args.confidence, args.min_pairs)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if args.json == "-":
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(result))
+        if args.json:
+            os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+    if result["verdict"] in EXIT_CODES:
+        sys.exit(EXIT_CODES[result["verdict"]])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Normalized index of every run stored in ``results/``.
+
+The results files come in several layouts (category comparison, file chunk
+comparison, email prompt comparison, separate/combined email analysis and the
+real-file denoise runs). ``build_results_index`` flattens all of them into one
+record per (source file, document, approach, stage) with the same metric
+columns, so the dashboard and the tooling can compare runs without knowing
+each layout. File comparison runs also carry ``knots``, the number of unique
+knots extracted, as a measure of quality. ``cached_input_tokens`` is the part
+of the input read from the prompt cache; only runs made by
+``pipeline.runner`` record it, it is None for the others.
+
+Runner results record the ``backend`` that made them. Dry runs against the
+stub backend have made-up answers and near-zero latencies, so they are left
+out of the index, which feeds the predictor, the latency policy and the
+regression gate. Results of ``--batch`` runs record ``mode: batch``: their
+cost is at the batch discount and their calls have no latency of their own,
+so their records carry ``mode == "batch"`` and the price and latency fits,
+the latency policy and the regression gate leave them out.
+"""
+import glob
+import json
+import os
+import re
+
+RESULT_PATTERNS = ["results/*.json", "results/**/*.json"]
+
+METRIC_COLUMNS = ["input_tokens", "output_tokens", "total_tokens", "cached_input_tokens", "cost", "execution_time"]
+# Бекенди, що лише імітують модель: їхні результати не є вимірюваннями
+SIMULATED_BACKENDS = {"stub"}
+INTERACTIVE_MODE = "interactive"
+BATCH_MODE = "batch"
+RECORD_COLUMNS = ["source", "layout", "prompt_version", "document", "approach", "stage", "mode",
+                  "chunking_threshold", "document_tokens", "knots"] + METRIC_COLUMNS
+
+
+def normalize_metrics(metrics):
+    """Metric dict in either ``{"tokens": {...}}`` or flat ``input_tokens`` form -> flat form"""
+    if not isinstance(metrics, dict):
+        return None
+    tokens = metrics.get("tokens")
+    if isinstance(tokens, dict):
+        input_tokens = tokens.get("input", 0)
+        output_tokens = tokens.get("output", 0)
+        total_tokens = tokens.get("total", input_tokens + output_tokens)
+    elif "input_tokens" in metrics or "total_input_tokens" in metrics:
+        input_tokens = metrics.get("input_tokens", metrics.get("total_input_tokens", 0))
+        output_tokens = metrics.get("output_tokens", metrics.get("total_output_tokens", 0))
+        total_tokens = metrics.get("total_tokens", input_tokens + output_tokens)
+    else:
+        return None
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": total_tokens,
+        "cached_input_tokens": metrics.get("cached_input_tokens"),
+        "cost": metrics.get("cost", metrics.get("total_cost", 0.0)),
+        "execution_time": metrics.get("execution_time", metrics.get("total_execution_time", 0.0)),
+    }
+
+
+def prompt_version(source):
+    """Version tag from the file name (``real_email_combined_prompts_v9.json`` -> ``v9``)"""
+    match = re.search(r"_(v\d+)(?:_\d*)?_?\.json$", os.path.basename(source))
+    return match.group(1) if match else ""
+
+
+def _record(source, layout, document, approach, stage, metrics, **extra):
+    normalized = normalize_metrics(metrics)
+    if normalized is None:
+        return None
+    record = {
+        "source": source,
+        "layout": layout,
+        "prompt_version": prompt_version(source),
+        "document": document,
+        "approach": approach,
+        "stage": stage,
+        "mode": extra.get("mode", INTERACTIVE_MODE),
+        "chunking_threshold": extra.get("chunking_threshold"),
+        "document_tokens": extra.get("document_tokens"),
+        "knots": extra.get("knots"),
+    }
+    record.update(normalized)
+    return record
+
+
+def detect_layout(data):
+    if not isinstance(data, dict):
+        return None
+    if "original_approach" in data and "combined_approach" in data:
+        return "category_comparison"
+    if "separate_approach" in data and "combined_approach" in data:
+        return "file_comparison"
+    if "metrics" in data and "extracted_data" in data:
+        return "real_file"
+    entries = [v for k, v in data.items() if k != "summary" and isinstance(v, dict)]
+    if entries and all("metrics_comparison" in v for v in entries):
+        return "email_prompt_comparison"
+    if entries and all("separate_execution" in v for v in entries):
+        return "email_analysis"
+    return None
+
+
+def records_from_result(source, data):
+    """Flatten one parsed results file into normalized run records"""
+    layout = detect_layout(data)
+    records = []
+
+    if layout == "category_comparison":
+        document = os.path.splitext(os.path.basename(source))[0].rstrip("_")
+        original = data["original_approach"]
+        records.append(_record(source, layout, document, "original", "category", original.get("category_metrics")))
+        records.append(_record(source, layout, document, "original", "knots", original.get("knots_metrics")))
+        records.append(_record(source, layout, document, "original", "total", original.get("total_metrics")))
+        records.append(_record(source, layout, document, "combined", "total", data["combined_approach"].get("metrics")))
+
+    elif layout == "file_comparison":
+        extra = {"chunking_threshold": data.get("chunking_threshold"), "document_tokens": data.get("file_size_tokens")}
+        document = data.get("file", os.path.basename(source))
+        for approach in ("separate", "combined"):
+            result = data[f"{approach}_approach"]
+            knots = result.get("knots")
+            # Якість запуску — кількість унікальних вузлів (без урахування регістру)
+            knots = len({str(knot).lower() for knot in knots}) if isinstance(knots, list) else None
+            records.append(_record(source, layout, document, approach, "total", result.get("metrics"),
+                                   knots=knots, **extra))
+
+    elif layout == "real_file":
+        if data.get("backend") in SIMULATED_BACKENDS:
+            return []
+        document = os.path.splitext(os.path.basename(source))[0].replace("_result", "")
+        mode = BATCH_MODE if data.get("mode") == BATCH_MODE else INTERACTIVE_MODE
+        for stage, metrics in data["metrics"].items():
+            records.append(_record(source, layout, document, "original", stage, metrics, mode=mode))
+
+    elif layout == "email_prompt_comparison":
+        for document, entry in data.items():
+            if document == "summary":
+                continue
+            for approach in ("new_prompt", "optimized_prompt"):
+                records.append(_record(source, layout, document, approach, "total",
+                                       entry["metrics_comparison"].get(approach)))
+
+    elif layout == "email_analysis":
+        for document, entry in data.items():
+            if document == "summary" or not isinstance(entry, dict):
+                continue
+            separate_metrics = entry.get("separate_execution", {}).get("metrics", {})
+            for key, metrics in separate_metrics.items():
+                if key.endswith("_metrics"):
+                    records.append(_record(source, layout, document, "separate", key[:-len("_metrics")], metrics))
+            records.append(_record(source, layout, document, "separate", "total", separate_metrics))
+            records.append(_record(source, layout, document, "combined", "total",
+                                   entry.get("combined_execution", {}).get("metrics")))
+
+    return [r for r in records if r is not None]
+
+
+def result_files(root="."):
+    files = set()
+    for pattern in RESULT_PATTERNS:
+        files.update(glob.glob(os.path.join(root, pattern), recursive=True))
+    return sorted(files)
+
+
+def results_fingerprint(root="."):
+    """Changes whenever a results file is added, removed or modified"""
+    return tuple((os.path.relpath(path, root), os.path.getmtime(path)) for path in result_files(root))
+
+
+def build_results_index(root="."):
+    """Normalized run records for every readable results file under ``root``"""
+    records = []
+    for path in result_files(root):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        records.extend(records_from_result(os.path.relpath(path, root).replace(os.sep, "/"), data))
+    return records
@@ -0,0 +1,860 @@
+"""Run the file extraction pipeline on documents and save results like ``results/real_file``.
+
+The original approach makes two calls: the category, then the extraction with
+that category's template. With ``--local-classifier`` the category comes from
+``pipeline.classifier`` when it is confident enough, which saves the first
+call; otherwise the model still decides. Every category stage records the
+decision (``local`` or ``model``), the classifier confidence and, for local
+decisions, the tokens and cost the skipped call would have used::
+
+    python -m pipeline.runner samples/real_file/medical_real.txt --local-classifier
+    python -m pipeline.runner samples/real_file --approach combined --backend stub
+
+Documents longer than the chunking threshold are split at section boundaries
+(``pipeline.chunking``); the category comes from the whole document and the
+extraction runs per chunk, with the chunk results merged. With
+``--chunking-threshold auto`` (the default) the threshold is chosen per
+document from the stored runs: the choice, its prediction and the actual
+outcome are saved under ``chunking`` in the result and appended to
+``results/runs/chunking_log.jsonl``.
+
+With ``--pack-budget`` small documents are sent several per request
+(``pipeline.packing``) and their results split back out per document. With
+``--batch`` every stage is submitted as one batch job (``pipeline.batch``).
+``--workers`` runs documents in parallel, kept under ``--rpm``/``--tpm`` by
+``pipeline.rate_limit``. ``--hedge`` duplicates slow calls and retries the
+ones that time out (``pipeline.hedging``). With ``--queue`` several machines
+share the documents through a job queue file (``pipeline.work_queue``).
+
+Results go to ``results/runs/<document>_result.json``, where the dashboard's
+results index picks them up; each records its ``backend``, and the index
+skips the results of ``--backend stub`` dry runs. Every completed call is first appended to
+``results/runs/journal.jsonl`` (``pipeline.journal``); an interrupted run
+started again with the same arguments replays those calls instead of paying
+for them. The calls of a document leave the journal once its result is
+written, and the journal is removed when none are left. The search index
+(``pipeline.search_index``) is rebuilt at the end of a run.
+"""
+import argparse
+import json
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from pipeline import pricing
+from pipeline.backend import BACKENDS, BackendError, StubBackend, get_backend
+from pipeline.batch import (BATCH_DIR, BATCH_DISCOUNT, POLL_INTERVAL, LocalBatchEndpoint, OpenAIBatchEndpoint,
+                            custom_id, parse_custom_id, read_outputs, wait, write_requests)
+from pipeline.chunking import (DEFAULT_OBJECTIVE, OBJECTIVES, THRESHOLD_CANDIDATES, choose_threshold,
+                               quality_curves, split_chunks)
+from pipeline.classifier import DEFAULT_THRESHOLD, load_classifier
+from pipeline.parsing import parse_json_response
+from pipeline.hedging import RETRY_LIMIT, HedgedBackend, LatencyPolicy
+from pipeline.journal import JOURNAL_NAME, RunJournal
+from pipeline.predictor import RunPredictor
+from pipeline.packing import (DEFAULT_PACK_BUDGET, answer_weight, attribute, document_ids, pack_documents,
+                              split_packed)
+from pipeline.prompts import (CATEGORIES, CATEGORY_SAMPLE_CHARS, category_messages, combined_messages,
+                              extraction_messages, packed_category_messages, packed_combined_messages,
+                              packed_extraction_messages, parse_category, parse_packed_categories)
+from pipeline.rate_limit import RateLimitedBackend, RateLimiter
+from pipeline.results_index import BATCH_MODE, build_results_index
+from pipeline.search_index import build_index
+from pipeline.streaming import SECTIONS, RepetitionGuard, completed_sections, stream_completion
+from pipeline.tracing import TracedBackend, Tracer, set_tracer, span, trace_path
+from pipeline.work_queue import LEASE_SECONDS, drain, enqueue, progress, sweep_id, worker_id
+from pipeline.work_queue import connect as connect_queue
+
+RUNS_DIR = os.path.join("results", "runs")
+METRIC_KEYS = ["input_tokens", "output_tokens", "execution_time", "cost"]
+# Записується для кожного етапу, але не прогнозується
+CACHE_KEY = "cached_input_tokens"
+DOCUMENT_EXTENSIONS = (".txt", ".md", ".html", ".htm")
+# Відповідь на запит категорії — одна мітка, 4-6 токенів
+CATEGORY_OUTPUT_TOKENS = 5
+PARSE_ERROR = {"error": "Failed to parse JSON from response"}
+CHUNKING_LOG = "chunking_log.jsonl"
+# Історичні криві, за якими прогнозується кожен підхід: original, як і separate, робить кілька викликів на чанк
+CHUNKING_CURVES = {"original": "separate", "combined": "combined"}
+HEDGE_KEYS = ["hedged", "retries", "wasted_tokens", "wasted_cost"]
+
+
+def read_document(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def stage_metrics(completion):
+    return chunk_stage_metrics([completion])
+
+
+def chunk_stage_metrics(completions):
+    """Metrics of a stage run once per chunk: the sums, plus the number of calls and streaming details"""
+    metrics = {key: sum(completion[key] for completion in completions) for key in METRIC_KEYS + [CACHE_KEY]}
+    if len(completions) > 1:
+        metrics["calls"] = len(completions)
+    first_event_times = [c["first_event_time"] for c in completions if c.get("first_event_time") is not None]
+    if first_event_times:
+        metrics["first_event_time"] = first_event_times[0]
+    cancelled = [c["cancelled"] for c in completions if c.get("cancelled")]
+    if cancelled:
+        metrics["cancelled"] = cancelled
+    if any("queue_wait" in completion for completion in completions):
+        metrics["queue_wait"] = sum(completion.get("queue_wait", 0.0) for completion in completions)
+        metrics["queue_depth"] = max(completion.get("queue_depth", 0) for completion in completions)
+    if any("hedged" in completion for completion in completions):
+        for key in HEDGE_KEYS:
+            metrics[key] = sum(completion.get(key, 0) for completion in completions)
+    return metrics
+
+
+def generate(backend, messages, stage, stream=False, on_event=None):
+    """One model call; streamed calls are parsed as they arrive and cancelled when they start repeating"""
+    if not stream:
+        return backend.complete(messages, stage=stage)
+    return stream_completion(backend, messages, stage, guard=RepetitionGuard(), on_event=on_event)
+
+
+def parse_completion(completion):
+    """The JSON of a response, or the sections that closed before a cancelled response was cut off"""
+    if completion.get("cancelled"):
+        return {"extracted_data": completed_sections(completion["events"])}
+    return parse_json_response(completion["text"])
+
+
+def parse_chunks(completions, stage):
+    """``parse_completion`` of every chunk, each in a span of its own"""
+    parsed = []
+    for chunk, completion in enumerate(completions):
+        with span("parse", stage=stage, chunk=chunk):
+            parsed.append(parse_completion(completion))
+    return parsed
+
+
+def merge_extracted(parts):
+    """One ``extracted_data`` tree from the trees of several chunks
+
+    Lists are concatenated without duplicates, dicts are merged key by key and
+    the first non-empty scalar wins.
+    """
+    parts = [part for part in parts if part not in (None, "", [], {})]
+    if not parts:
+        return None
+    if all(isinstance(part, dict) for part in parts):
+        keys = list(dict.fromkeys(key for part in parts for key in part))
+        return {key: merge_extracted([part.get(key) for part in parts]) for key in keys}
+    if all(isinstance(part, list) for part in parts):
+        merged = []
+        for item in (item for part in parts for item in part):
+            if item not in merged:
+                merged.append(item)
+        return merged
+    return parts[0]
+
+
+def _raw(responses):
+    return responses[0] if len(responses) == 1 else responses
+
+
+def total_metrics(stages):
+    total = {key: sum(stage.get(key, 0) for stage in stages.values()) for key in METRIC_KEYS + [CACHE_KEY]}
+    total["total_tokens"] = total["input_tokens"] + total["output_tokens"]
+    saved_cost = sum(stage.get("saved_cost", 0) for stage in stages.values())
+    if saved_cost:
+        total["saved_cost"] = saved_cost
+    if any("queue_wait" in stage for stage in stages.values()):
+        total["queue_wait"] = sum(stage.get("queue_wait", 0.0) for stage in stages.values())
+    if any("hedged" in stage for stage in stages.values()):
+        for key in HEDGE_KEYS:
+            total[key] = sum(stage.get(key, 0) for stage in stages.values())
+    return total
+
+
+def local_category(text, classifier, threshold=DEFAULT_THRESHOLD):
+    """(label, confidence, metrics) of the local classifier; metrics only when it is confident enough"""
+    start = time.perf_counter()
+    label, confidence = classifier.predict(text)
+    elapsed = time.perf_counter() - start
+    if confidence < threshold:
+        return label, confidence, None
+    saved_input = sum(pricing.estimate_tokens(message["content"]) for message in category_messages(text))
+    metrics = {"input_tokens": 0, "output_tokens": 0, "execution_time": elapsed, "cost": 0.0,
+               "decision": "local", "confidence": round(confidence, 4),
+               "saved_input_tokens": saved_input, "saved_output_tokens": CATEGORY_OUTPUT_TOKENS,
+               "saved_cost": pricing.cost(saved_input, CATEGORY_OUTPUT_TOKENS)}
+    return label, confidence, metrics
+
+
+def classify(text, backend, classifier=None, threshold=DEFAULT_THRESHOLD):
+    """(label, metrics, raw answer) of the category stage"""
+    local_label = confidence = None
+    if classifier is not None:
+        local_label, confidence, metrics = local_category(text, classifier, threshold)
+        if metrics is not None:
+            return local_label, metrics, local_label
+
+    completion = backend.complete(category_messages(text), stage="category")
+    label = parse_category(completion["text"])
+    metrics = stage_metrics(completion)
+    metrics["decision"] = "model"
+    if local_label is not None:
+        metrics.update(local_category=local_label, confidence=round(confidence, 4))
+    return label, metrics, completion["text"]
+
+
+def split_document(text, chunking_threshold=None, chars_per_token=pricing.CHARS_PER_TOKEN):
+    """The whole text, or its chunks when a chunking threshold is given"""
+    if not chunking_threshold:
+        return [text]
+    return split_chunks(text, chunking_threshold, chars_per_token)
+
+
+def run_original(path, backend, classifier=None, threshold=DEFAULT_THRESHOLD, chunking_threshold=None,
+                 chars_per_token=pricing.CHARS_PER_TOKEN, stream=False, on_event=None):
+    """Category, then extraction with the category's template, per chunk"""
+    text = read_document(path)
+    with span("stage", stage="category"):
+        label, category_metrics, category_raw = classify(text, backend, classifier, threshold)
+    metrics = {"category": category_metrics}
+    raw_responses = {"category": category_raw}
+    chunks = [text]
+    if label is None:
+        extracted = {"error": f"Unknown category: {category_raw.strip()[:100]}"}
+    else:
+        chunks = split_document(text, chunking_threshold, chars_per_token)
+        with span("stage", stage="extraction", chunks=len(chunks)):
+            completions = [generate(backend, extraction_messages(label, chunk), "extraction", stream, on_event)
+                           for chunk in chunks]
+            metrics["extraction"] = chunk_stage_metrics(completions)
+            raw_responses["extraction"] = _raw([completion["text"] for completion in completions])
+            parsed = parse_chunks(completions, "extraction")
+            with span("merge", stage="extraction"):
+                extracted = merge_extracted(parsed) or PARSE_ERROR
+    metrics["total"] = total_metrics(metrics)
+    return {"file_path": path, "file_category": label, "extracted_data": extracted, "metrics": metrics,
+            "raw_responses": raw_responses, "chunking": {"threshold": chunking_threshold, "chunks": len(chunks)}}
+
+
+def run_combined(path, backend, chunking_threshold=None, chars_per_token=pricing.CHARS_PER_TOKEN, stream=False,
+                 on_event=None):
+    """Category and extraction in one call per chunk"""
+    text = read_document(path)
+    chunks = split_document(text, chunking_threshold, chars_per_token)
+    with span("stage", stage="combined", chunks=len(chunks)):
+        completions = [generate(backend, combined_messages(chunk), "combined", stream, on_event)
+                       for chunk in chunks]
+        parsed = parse_chunks(completions, "combined")
+        with span("merge", stage="combined"):
+            extracted = merge_extracted(parsed) or PARSE_ERROR
+    category_names = {name: label for label, name in CATEGORIES.items()}
+    label = category_names.get(extracted.get("category")) or parse_category(str(extracted.get("category")))
+    metrics = {"combined": chunk_stage_metrics(completions)}
+    metrics["total"] = total_metrics(metrics)
+    return {"file_path": path, "file_category": label, "extracted_data": extracted, "metrics": metrics,
+            "raw_responses": {"combined": _raw([completion["text"] for completion in completions])},
+            "chunking": {"threshold": chunking_threshold, "chunks": len(chunks)}}
+
+
+def packed_call(backend, stage, messages, texts):
+    """One request for several documents, ``{path: text}``: per path the answer, the metrics and the raw answer"""
+    ids = document_ids(list(texts))
+    completion = backend.complete(messages({doc_id: texts[path] for doc_id, path in ids.items()}), stage=stage)
+    answers = split_packed(completion["text"])
+    answers = {path: answers.get(doc_id) for doc_id, path in ids.items()}
+    metrics = attribute(completion, [pricing.estimate_tokens(text) for text in texts.values()],
+                        [answer_weight(answer) for answer in answers.values()])
+    raw = {path: json.dumps(answer, ensure_ascii=False) if answer is not None else completion["text"]
+           for path, answer in answers.items()}
+    return answers, dict(zip(texts, metrics)), raw
+
+
+def packed_categories(backend, texts):
+    """Labels, metrics and raw answers of one category request for several documents"""
+    ids = document_ids(list(texts))
+    completion = backend.complete(packed_category_messages({doc_id: texts[path] for doc_id, path in ids.items()}),
+                                  stage="category")
+    labels = parse_packed_categories(completion["text"])
+    samples = [pricing.estimate_tokens(text[:CATEGORY_SAMPLE_CHARS]) for text in texts.values()]
+    metrics = attribute(completion, samples, [1] * len(texts))
+    return ({path: labels.get(doc_id) for doc_id, path in ids.items()}, dict(zip(texts, metrics)),
+            {path: completion["text"] for path in texts})
+
+
+def run_packed(paths, backend, approach="original", classifier=None, threshold=DEFAULT_THRESHOLD):
+    """Results of small documents sent several per request, in the layouts of ``run_original``/``run_combined``
+
+    Each stage packs every document that needs it into one request (the
+    original approach: one category request, then one extraction request per
+    category); a stage with a single document uses the plain prompt. The
+    metrics of a packed request are split between its documents, see
+    ``pipeline.packing.attribute``.
+    """
+    texts = {path: read_document(path) for path in paths}
+    results = {path: {"file_path": path, "file_category": None, "extracted_data": None, "metrics": {},
+                      "raw_responses": {}, "chunking": {"threshold": None, "chunks": 1},
+                      "packing": {"documents": list(paths)}} for path in paths}
+
+    def run_stage(stage, group, single, packed):
+        if len(group) == 1:
+            path = next(iter(group))
+            completion = backend.complete(single(group[path]), stage=stage)
+            return ({path: parse_json_response(completion["text"])}, {path: stage_metrics(completion)},
+                    {path: completion["text"]})
+        return packed_call(backend, stage, packed, group)
+
+    if approach == "combined":
+        answers, metrics, raw = run_stage("combined", texts, combined_messages, packed_combined_messages)
+        category_names = {name: label for label, name in CATEGORIES.items()}
+        for path, result in results.items():
+            extracted = answers[path] or PARSE_ERROR
+            result["file_category"] = (category_names.get(extracted.get("category"))
+                                       or parse_category(str(extracted.get("category"))))
+            result.update(extracted_data=extracted, raw_responses={"combined": raw[path]})
+            result["metrics"]["combined"] = metrics[path]
+    else:
+        remaining = {}
+        for path, text in texts.items():
+            local = local_category(text, classifier, threshold) if classifier is not None else (None, None, None)
+            if local[2] is not None:
+                results[path].update(file_category=local[0], raw_responses={"category": local[0]})
+                results[path]["metrics"]["category"] = local[2]
+            else:
+                remaining[path] = local
+        if len(remaining) == 1:
+            path = next(iter(remaining))
+            label, category_metrics, category_raw = classify(texts[path], backend)
+            labels, metrics, raw = {path: label}, {path: category_metrics}, {path: category_raw}
+        elif remaining:
+            labels, metrics, raw = packed_categories(backend, {path: texts[path] for path in remaining})
+        for path, (local_label, confidence, _) in remaining.items():
+            metrics[path]["decision"] = "model"
+            if local_label is not None:
+                metrics[path].update(local_category=local_label, confidence=round(confidence, 4))
+            results[path].update(file_category=labels[path], raw_responses={"category": raw[path]})
+            results[path]["metrics"]["category"] = metrics[path]
+
+        for label in dict.fromkeys(result["file_category"] for result in results.values()):
+            group = {path: texts[path] for path, result in results.items() if result["file_category"] == label}
+            if label is None:
+                for path in group:
+                    category_raw = results[path]["raw_responses"]["category"]
+                    results[path]["extracted_data"] = {"error": f"Unknown category: {category_raw.strip()[:100]}"}
+                continue
+            answers, metrics, raw = run_stage("extraction", group, lambda text: extraction_messages(label, text),
+                                              lambda documents: packed_extraction_messages(label, documents))
+            for path in group:
+                results[path]["extracted_data"] = answers[path] or PARSE_ERROR
+                results[path]["raw_responses"]["extraction"] = raw[path]
+                results[path]["metrics"]["extraction"] = metrics[path]
+
+    for result in results.values():
+        result["metrics"]["total"] = total_metrics(result["metrics"])
+    return list(results.values())
+
+
+def run_batch(paths, endpoint, approach="original", classifier=None, threshold=DEFAULT_THRESHOLD,
+              chunking_thresholds=None, chars_per_token=pricing.CHARS_PER_TOKEN, work_dir=BATCH_DIR,
+              poll_interval=POLL_INTERVAL, progress=None):
+    """Results of documents run as batch jobs (``pipeline.batch``), one batch per stage
+
+    The original approach submits the category requests of every document,
+    then the extraction requests of every chunk; the combined approach one
+    batch of chunks. Request files are written and answers read one line at a
+    time, and documents are re-read from disk for each stage, so the number
+    of documents is limited only by the endpoint. Each result records the
+    batch ids of its stages under ``batch``, and ``mode: batch`` with the
+    ``price_factor`` its costs were billed at, so the results index can tell
+    them from interactive runs.
+    """
+    paths = list(paths)
+    thresholds = chunking_thresholds or {}
+    results = [{"file_path": path, "file_category": None, "extracted_data": None, "metrics": {},
+                "raw_responses": {}, "chunking": {"threshold": thresholds.get(path), "chunks": 1}, "batch": {},
+                "mode": BATCH_MODE, "price_factor": BATCH_DISCOUNT}
+               for path in paths]
+    run_id = time.strftime("%Y%m%d_%H%M%S")
+
+    def run_stage(stage, requests):
+        """Per document index, the completions of one batch in chunk order"""
+        input_path = os.path.join(work_dir, f"{run_id}_{stage}_requests.jsonl")
+        if not write_requests(input_path, requests):
+            return {}
+        batch_id = endpoint.submit(input_path)
+        status = wait(endpoint, batch_id, poll_interval, progress=progress)
+        if status["status"] != "completed":
+            raise BackendError(f"{stage} batch {batch_id} {status['status']}")
+        output_path = endpoint.fetch(batch_id, os.path.join(work_dir, f"{run_id}_{stage}_output.jsonl"))
+        completions = {}
+        for request_id, completion in read_outputs(output_path):
+            index, _, chunk = parse_custom_id(request_id)
+            completions.setdefault(index, {})[chunk] = completion
+            results[index]["batch"][stage] = batch_id
+        return {index: [chunks[chunk] for chunk in sorted(chunks)] for index, chunks in completions.items()}
+
+    def chunk_requests(stage, messages, indexes):
+        for index in indexes:
+            path = paths[index]
+            chunks = split_document(read_document(path), thresholds.get(path), chars_per_token)
+            results[index]["chunking"]["chunks"] = len(chunks)
+            for chunk, text in enumerate(chunks):
+                yield custom_id(index, stage, chunk), messages(index, text), endpoint.model
+
+    def chunk_results(stage, completions, index):
+        completions = completions.get(index)
+        if not completions:
+            return {"error": "No answer in the batch output"}
+        metrics = chunk_stage_metrics(completions)
+        failed = [completion["error"] for completion in completions if completion.get("error")]
+        if failed:
+            metrics["failed_requests"] = len(failed)
+        results[index]["metrics"][stage] = metrics
+        results[index]["raw_responses"][stage] = _raw([completion["text"] or json.dumps(completion.get("error"))
+                                                       for completion in completions])
+        return merge_extracted([parse_json_response(completion["text"]) for completion in completions]) or PARSE_ERROR
+
+    if approach == "combined":
+        completions = run_stage("combined", chunk_requests("combined", lambda index, text: combined_messages(text),
+                                                           range(len(paths))))
+        category_names = {name: label for label, name in CATEGORIES.items()}
+        for index, result in enumerate(results):
+            extracted = chunk_results("combined", completions, index)
+            result["extracted_data"] = extracted
+            result["file_category"] = (category_names.get(extracted.get("category"))
+                                       or parse_category(str(extracted.get("category"))))
+    else:
+        local = {}
+
+        def category_requests():
+            for index, path in enumerate(paths):
+                text = read_document(path)
+                if classifier is not None:
+                    label, confidence, metrics = local_category(text, classifier, threshold)
+                    if metrics is not None:
+                        results[index].update(file_category=label, raw_responses={"category": label})
+                        results[index]["metrics"]["category"] = metrics
+                        continue
+                    local[index] = {"local_category": label, "confidence": round(confidence, 4)}
+                yield custom_id(index, "category"), category_messages(text), endpoint.model
+
+        for index, (completion,) in run_stage("category", category_requests()).items():
+            results[index].update(file_category=parse_category(completion["text"]),
+                                  raw_responses={"category": completion["text"]})
+            results[index]["metrics"]["category"] = {**stage_metrics(completion), "decision": "model",
+                                                     **local.get(index, {})}
+
+        labelled = [index for index, result in enumerate(results) if result["file_category"] is not None]
+        completions = run_stage("extraction", chunk_requests(
+            "extraction", lambda index, text: extraction_messages(results[index]["file_category"], text), labelled))
+        for index, result in enumerate(results):
+            if result["file_category"] is None:
+                category_raw = result["raw_responses"].get("category", "")
+                result["extracted_data"] = {"error": f"Unknown category: {category_raw.strip()[:100]}"}
+            else:
+                result["extracted_data"] = chunk_results("extraction", completions, index)
+
+    for result in results:
+        result["metrics"]["total"] = total_metrics(result["metrics"])
+    return results
+
+
+def iter_documents(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(DOCUMENT_EXTENSIONS):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def chunking_outcome(choice, result, mode="auto"):
+    """The choice of threshold, its prediction and the actual outcome, for the result and the log"""
+    predicted = choice["predicted"]
+    total = result["metrics"]["total"]
+    actual = {"chunks": result["chunking"]["chunks"], **{key: total[key] for key in METRIC_KEYS}}
+    return {
+        **result["chunking"],
+        "mode": mode,
+        "objective": choice["objective"],
+        "document_tokens": choice["document_tokens"],
+        "structure_density": choice["structure_density"],
+        "quality_reference": choice["quality_reference"],
+        "quality_elasticity": choice["quality_elasticity"],
+        "candidates": [{key: row[key] for key in ("chunking_threshold", "chunks", "cost", "execution_time",
+                                                  "relative_quality", "score")} for row in choice["candidates"]],
+        "predicted": {key: predicted[key] for key in actual},
+        "actual": actual,
+        # Відносна похибка прогнозу: (факт - прогноз) / прогноз
+        "error": {key: (actual[key] - predicted[key]) / predicted[key] for key in actual if predicted[key]},
+    }
+
+
+def log_chunking(path, outcome, out_dir=RUNS_DIR):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, CHUNKING_LOG), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"file_path": path, "logged_at": time.time(), **outcome}, ensure_ascii=False) + "\n")
+
+
+def section_printer(start):
+    """``on_event`` callback that prints every extraction section as it closes"""
+    def on_event(event):
+        name, event_path, value = event
+        if name == SECTIONS:
+            filled = "filled" if merge_extracted([value]) else "empty"
+            print(f"  {event_path[-1]} {filled} at {time.perf_counter() - start:.1f}s")
+    return on_event
+
+
+def chunking_threshold_arg(value):
+    """``auto``, ``none`` or a number of tokens"""
+    if value in ("auto", "none"):
+        return value
+    return int(value)
+
+
+def result_path(path, out_dir=RUNS_DIR):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(out_dir, f"{stem}_result.json")
+
+
+def save_result(result, out_dir=RUNS_DIR):
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = result_path(result["file_path"], out_dir)
+    # Спершу в тимчасовий файл: обірваний запис не псує попередній результат
+    with open(out_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    os.replace(out_path + ".tmp", out_path)
+    return out_path
+
+
+def _results_or_exit(results):
+    try:
+        yield from results
+    except BackendError as e:
+        raise SystemExit(str(e))
+
+
+def report_chunking(result):
+    outcome = result["chunking"]
+    if outcome.get("predicted"):
+        print(f"{result['file_path']}: chunking {outcome['threshold']} ({outcome['chunks']} chunks), "
+              f"predicted ${outcome['predicted']['cost']:.6f} {outcome['predicted']['execution_time']:.1f}s, "
+              f"cost error {outcome['error'].get('cost', 0):+.0%}, "
+              f"time error {outcome['error'].get('execution_time', 0):+.0%}")
+
+
+def report_result(result, out_dir=RUNS_DIR):
+    """Save a result and print its summary line; returns its total metrics"""
+    path = result["file_path"]
+    for stage, metrics in result["metrics"].items():
+        for reason in metrics.get("cancelled", []):
+            print(f"{path}: {stage} cancelled, {reason}")
+    with span("save", document=path):
+        out_path = save_result(result, out_dir)
+    total = result["metrics"]["total"]
+    category = result["metrics"].get("category", {})
+    decision = " ".join(str(category[key]) for key in ("decision", "confidence") if key in category)
+    decision = f" [{decision}]" if decision else ""
+    cached = f" ({total[CACHE_KEY]} cached)" if total[CACHE_KEY] else ""
+    print(f"{path}: {result['file_category']}{decision} {total['total_tokens']} tokens{cached} "
+          f"${total['cost']:.6f} -> {out_path}")
+    return total
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the extraction pipeline on documents")
+    parser.add_argument("paths", nargs="+", help="Documents or directories of documents")
+    parser.add_argument("--approach", choices=["original", "combined"], default="original")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="openai")
+    parser.add_argument("--local-classifier", action="store_true",
+                        help="Skip the category call when the local classifier is confident")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--chunking-threshold", type=chunking_threshold_arg, default="auto",
+                        help="Tokens per chunk, 'auto' to choose per document or 'none' to send whole documents")
+    parser.add_argument("--chunking-candidates", type=int, nargs="+", default=list(THRESHOLD_CANDIDATES),
+                        help="Thresholds 'auto' chooses from")
+    parser.add_argument("--chunking-objective", choices=sorted(OBJECTIVES), default=DEFAULT_OBJECTIVE)
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream responses, report sections as they close and cancel runaway repetition")
+    parser.add_argument("--stub-prefill-latency", type=float, default=0.0,
+                        help="Stub backend: seconds per 1,000 input tokens not read from the prompt cache")
+    parser.add_argument("--stub-cache-min-tokens", type=int,
+                        help="Stub backend: shortest cached prompt prefix (set it above the prompt size to disable)")
+    parser.add_argument("--pack-budget", type=int, nargs="?", const=DEFAULT_PACK_BUDGET,
+                        help=f"Send documents of up to this many tokens several per request "
+                             f"(default {DEFAULT_PACK_BUDGET} when given without a value)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit every stage as one batch job (a local stand-in with the stub backend)")
+    parser.add_argument("--batch-dir", default=BATCH_DIR, help="Where batch request and output files are kept")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL,
+                        help="Seconds between batch status checks")
+    parser.add_argument("--workers", type=int, default=1, help="Documents processed in parallel")
+    parser.add_argument("--rpm", type=int, help="Provider limit of requests per minute to schedule under")
+    parser.add_argument("--tpm", type=int, help="Provider limit of tokens per minute to schedule under")
+    parser.add_argument("--stub-rpm-limit", type=int, help="Stub backend: answer 429 above this many requests a minute")
+    parser.add_argument("--stub-tpm-limit", type=int, help="Stub backend: answer 429 above this many tokens a minute")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate of calls slower than the stage's p95 and take the first answer")
+    parser.add_argument("--retries", type=int,
+                        help=f"Retries after a timeout, connection error, 429 or 5xx (default {RETRY_LIMIT} "
+                             f"with --hedge, else none)")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Stub backend: seconds per call")
+    parser.add_argument("--stub-tail-share", type=float, default=0.0,
+                        help="Stub backend: share of calls that take ten times as long")
+    parser.add_argument("--stub-latency-distribution", choices=StubBackend.LATENCY_DISTRIBUTIONS, default="fixed",
+                        help="Stub backend: distribution of the call latency, with --stub-latency as its mean")
+    parser.add_argument("--stub-tokens-per-second", type=float, help="Stub backend: generation speed")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0,
+                        help="Stub backend: share of calls that fail with HTTP 500")
+    parser.add_argument("--stub-truncation-rate", type=float, default=0.0,
+                        help="Stub backend: share of answers cut off halfway")
+    parser.add_argument("--out-dir", default=RUNS_DIR)
+    parser.add_argument("--journal",
+                        help=f"Journal of completed calls to resume from (default OUT_DIR/{JOURNAL_NAME})")
+    parser.add_argument("--no-journal", action="store_true",
+                        help="Do not journal calls; an interrupted run starts over")
+    parser.add_argument("--queue", help="Shared SQLite job queue: every machine running the same command takes "
+                                        "documents from it (--workers at a time)")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                        help="Seconds a queued document stays leased without a heartbeat")
+    parser.add_argument("--trace", nargs="?", const=True,
+                        help="Record spans of the run and export them as OpenTelemetry JSON "
+                             "(to indexes/traces/ when given without a path)")
+    args = parser.parse_args(argv)
+    if args.batch and (args.stream or args.pack_budget):
+        parser.error("--batch cannot be combined with --stream or --pack-budget")
+    if args.hedge and (args.stream or args.batch):
+        parser.error("--hedge cannot be combined with --stream or --batch")
+    if args.queue and (args.batch or args.pack_budget):
+        parser.error("--queue cannot be combined with --batch or --pack-budget")
+    return args
+
+
+def stub_options(args):
+    """``StubBackend`` keyword arguments from the ``--stub-*`` options"""
+    return {"prefill_latency": args.stub_prefill_latency, "cache_min_tokens": args.stub_cache_min_tokens,
+            "rpm_limit": args.stub_rpm_limit, "tpm_limit": args.stub_tpm_limit,
+            "latency": args.stub_latency, "tail_share": args.stub_tail_share,
+            "latency_distribution": args.stub_latency_distribution,
+            "tokens_per_second": args.stub_tokens_per_second, "error_rate": args.stub_error_rate,
+            "truncation_rate": args.stub_truncation_rate}
+
+
+def build_backend(args):
+    """The backend of a run, wrapped in the rate limiter and hedging it asks for; (backend, limiter, hedged)"""
+    try:
+        backend = get_backend(args.backend, **(stub_options(args) if args.backend == "stub" else {}))
+    except BackendError as e:
+        raise SystemExit(str(e))
+    limiter = None
+    if args.rpm or args.tpm:
+        limiter = RateLimiter(args.rpm, args.tpm)
+        backend = RateLimitedBackend(backend, limiter)
+    hedged = None
+    if args.hedge or args.retries:
+        retries = args.retries if args.retries is not None else RETRY_LIMIT
+        # Дублі й повтори йдуть через обмежувач, як і основні запити
+        backend = hedged = HedgedBackend(backend, LatencyPolicy.from_records(build_results_index()),
+                                         args.hedge, retries)
+    return backend, limiter, hedged
+
+
+def local_classifier(args):
+    """The trained local classifier with ``--local-classifier``, else ``None``"""
+    if not args.local_classifier:
+        return None
+    try:
+        return load_classifier()
+    except FileNotFoundError as e:
+        raise SystemExit(str(e))
+
+
+def chunking_model(args):
+    """(predictor, curves, chars_per_token) fitted on the stored runs; no predictor without chunking"""
+    if args.chunking_threshold == "none":
+        return None, None, pricing.CHARS_PER_TOKEN
+    records = pd.DataFrame(build_results_index())
+    predictor = RunPredictor.fit(records)
+    return predictor, quality_curves(records, predictor.chars_per_token), predictor.chars_per_token
+
+
+def chunking_candidates(args):
+    return args.chunking_candidates if args.chunking_threshold == "auto" else [args.chunking_threshold]
+
+
+def open_journal(args):
+    """The journal of completed calls to resume from, or ``None`` with ``--no-journal`` and ``--batch``"""
+    if args.no_journal or args.batch:
+        return None
+    # У черзі кожна машина веде свій журнал, щоб не дописувати в один файл з кількох машин
+    default_journal = f"journal-{socket.gethostname()}.jsonl" if args.queue else JOURNAL_NAME
+    journal = RunJournal(args.journal or os.path.join(args.out_dir, default_journal))
+    if journal.loaded:
+        print(f"resuming: {journal.loaded} completed calls in {journal.path}")
+    return journal
+
+
+def run_in_batch(args, paths, backend, classifier, predictor, curves, chars_per_token):
+    """Results of ``paths`` with every stage submitted as one batch job"""
+    endpoint = LocalBatchEndpoint(backend, args.batch_dir) if args.backend == "stub" else OpenAIBatchEndpoint(backend)
+    thresholds = {}
+    if predictor is not None:
+        thresholds = {path: choose_threshold(read_document(path), CHUNKING_CURVES[args.approach], predictor, curves,
+                                             chunking_candidates(args), args.chunking_objective)["threshold"]
+                      for path in paths}
+    try:
+        return run_batch(paths, endpoint, args.approach, classifier, args.threshold, thresholds, chars_per_token,
+                         args.batch_dir, args.poll_interval,
+                         progress=lambda status: print(f"batch {status['status']} {status['counts']}"))
+    except BackendError as e:
+        raise SystemExit(str(e))
+
+
+def run_queued(args, paths, process):
+    """Put ``paths`` on the shared queue and ``process`` documents from it until the sweep is done"""
+    worker = worker_id()
+    # Усі машини спільної черги з однаковими параметрами працюють над одним набором документів
+    sweep_options = {"paths": args.paths, "approach": args.approach, "backend": args.backend,
+                     "local_classifier": args.local_classifier, "threshold": args.threshold,
+                     "chunking_threshold": args.chunking_threshold, "chunking_candidates": args.chunking_candidates,
+                     "chunking_objective": args.chunking_objective, "stream": args.stream, "out_dir": args.out_dir}
+    conn = connect_queue(args.queue)
+    sweep = sweep_id(sweep_options)
+    added = enqueue(conn, sweep, paths, sweep_options)
+    print(f"queue {args.queue}: sweep {sweep}, {added} of {len(paths)} documents added")
+    finished = drain(args.queue, sweep, process, args.workers, worker, args.lease,
+                     on_error=lambda path, e: print(f"{path}: failed, {e}"))
+    counts = progress(conn, sweep)[sweep]
+    print(f"queue: {finished} documents done by {worker}; sweep "
+          + ", ".join(f"{counts[status]} {status}" for status in counts))
+
+
+def print_summary(totals, limiter=None, journal=None, hedged=None):
+    """Cost, cache and local category savings of a run, then the limiter, journal and hedging stats"""
+    total_cost = sum(total["cost"] for total in totals)
+    saved_cost = sum(total.get("saved_cost", 0) for total in totals)
+    input_tokens = sum(total["input_tokens"] for total in totals)
+    cached_tokens = sum(total[CACHE_KEY] for total in totals)
+    summary = [f"total ${total_cost:.6f}"]
+    if cached_tokens:
+        summary.append(f"{cached_tokens / input_tokens:.0%} of input tokens cached, "
+                       f"saved ${pricing.cache_saving(cached_tokens):.6f}")
+    if saved_cost:
+        summary.append(f"saved ${saved_cost:.6f} by local categories")
+    print(", ".join(summary))
+    if limiter is not None:
+        stats = limiter.stats()
+        print(f"rate limiter: {stats['admitted']} requests, {stats['waited']} queued "
+              f"(mean wait {stats['mean_wait']:.1f}s, max {stats['max_wait']:.1f}s, "
+              f"max queue depth {stats['max_queue_depth']}), {stats['throttled']} throttled by the provider")
+    if journal is not None:
+        stats = journal.stats()
+        if stats["replayed"]:
+            print(f"journal: {stats['replayed']} calls replayed (${stats['replayed_cost']:.6f} not paid again), "
+                  f"{stats['recorded']} new")
+    if hedged is not None and hedged.calls:
+        stats = hedged.stats()
+        print(f"hedging: {stats['calls']} calls, p50 {stats['p50']:.2f}s p95 {stats['p95']:.2f}s "
+              f"p99 {stats['p99']:.2f}s; {stats['hedges']} duplicates ({stats['hedge_wins']} answered first), "
+              f"{stats['retries']} retries, {stats['wasted_tokens']} wasted tokens "
+              f"(${stats['wasted_cost']:.6f}, {stats['wasted_cost'] / total_cost if total_cost else 0:.1%} of cost)")
+
+
+def main():
+    args = parse_args()
+    classifier = local_classifier(args)
+    backend, limiter, hedged = build_backend(args)
+    predictor, curves, chars_per_token = chunking_model(args)
+    paths = list(iter_documents(args.paths))
+    tracer = None
+    if args.trace:
+        tracer = Tracer("run", approach=args.approach, backend=args.backend, documents=len(paths),
+                        workers=args.workers)
+        set_tracer(tracer)
+    journal = open_journal(args)
+
+    def document_backend(document):
+        # Журнал зовні: повторені виклики не проходять ні обмежувач, ні хеджування
+        traced = journal.backend(backend, document=document, approach=args.approach) if journal else backend
+        return TracedBackend(traced, document=str(document)) if tracer else traced
+
+    totals = []
+    written = set()
+
+    def save(result):
+        # Результати заглушки не потрапляють до індексу результатів, тож бекенд записується в кожен
+        result["backend"] = args.backend
+        totals.append(report_result(result, args.out_dir))
+        written.add(result["file_path"])
+
+    if args.batch:
+        for result in run_in_batch(args, paths, backend, classifier, predictor, curves, chars_per_token):
+            save(result)
+        paths = []
+
+    packs = []
+    if args.pack_budget:
+        sizes = {path: int(len(read_document(path)) / chars_per_token) for path in paths}
+        small = {path: tokens for path, tokens in sizes.items() if tokens <= args.pack_budget}
+        packs = [group for group in pack_documents(small, args.pack_budget) if len(group) > 1]
+        packed = {path for group in packs for path in group}
+        paths = [path for path in paths if path not in packed]
+
+    for group in packs:
+        print(f"packing {len(group)} documents, ~{sum(sizes[path] for path in group):,} tokens")
+        for result in run_packed(group, document_backend(group), args.approach, classifier, args.threshold):
+            save(result)
+
+    def run_document(path):
+        choice = None
+        chunking_threshold = None
+        on_event = section_printer(time.perf_counter()) if args.stream else None
+        with span("document", document=path):
+            if predictor is not None:
+                with span("chunking", document=path):
+                    choice = choose_threshold(read_document(path), CHUNKING_CURVES[args.approach], predictor,
+                                              curves, chunking_candidates(args), args.chunking_objective)
+                chunking_threshold = choice["threshold"]
+            if args.approach == "combined":
+                result = run_combined(path, document_backend(path), chunking_threshold, chars_per_token,
+                                      args.stream, on_event)
+            else:
+                result = run_original(path, document_backend(path), classifier, args.threshold, chunking_threshold,
+                                      chars_per_token, args.stream, on_event)
+        if choice is not None:
+            result["chunking"] = chunking_outcome(choice, result,
+                                                  "auto" if args.chunking_threshold == "auto" else "fixed")
+            log_chunking(path, result["chunking"], args.out_dir)
+        return result
+
+    if args.queue:
+        def process(path):
+            result = run_document(path)
+            report_chunking(result)
+            save(result)
+            return result_path(path, args.out_dir)
+
+        run_queued(args, paths, process)
+    else:
+        # Документи паралельно; результати друкуються й зберігаються в порядку документів
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for result in _results_or_exit(executor.map(run_document, paths)):
+                report_chunking(result)
+                save(result)
+
+    print_summary(totals, limiter, journal, hedged)
+    if journal is not None:
+        # У черзі частина документів могла впасти: їхні виклики лишаються в журналі для наступного запуску
+        journal.compact(written)
+    if totals:
+        print(f"search index: {len(build_index().docs)} documents")
+    if tracer is not None:
+        set_tracer(None)
+        print(f"trace: {tracer.export(trace_path(tracer) if args.trace is True else args.trace)}")
+
+
+if __name__ == "__main__":
+    main()
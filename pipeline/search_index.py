@@ -0,0 +1,358 @@
+"""Full-text inverted index over the sample corpus and the model outputs.
+
+The index maps every token to the sorted list of documents that contain it.
+A "document" is one field of one source: a sample file, a real email, an
+email of the corpus store (``pipeline.corpus``), or the denoised text /
+knots / topics / raw output of one run inside a results file.
+Posting lists are delta-encoded varints, so a query touches only the posting
+lists of its terms and never scans the JSON results.
+
+Corpus ingest and the pipeline runner rebuild it when they have written new
+emails or results; to build it by hand::
+
+    python -m pipeline.search_index build
+
+Query syntax: terms are ANDed, ``OR`` separates alternatives, ``-term`` or
+``NOT term`` excludes, and ``term*`` matches every token with that prefix
+(the first ``MAX_PREFIX_EXPANSION`` of them; ``search`` reports the prefixes
+that matched more).
+"""
+import argparse
+import bisect
+import glob
+import importlib
+import json
+import os
+import re
+import sqlite3
+import time
+
+from pipeline.corpus import CORPUS_DB
+
+INDEX_DIR = os.path.join("indexes", "search")
+META_FILE = "meta.json"
+POSTINGS_FILE = "postings.bin"
+
+SAMPLE_PATTERNS = ["samples/*.txt", "samples/real_file/*"]
+EMAIL_MODULES = ["samples.email", "samples.real_email"]
+RESULT_PATTERNS = ["results/*.json", "results/**/*.json"]
+
+FIELDS = ["sample", "email", "denoised", "knots", "topics", "output", "extracted"]
+
+# Keys that hold lists of knots in the different results layouts
+KNOT_LIST_KEYS = {"knots", "common_knots", "only_in_new", "only_in_optimized", "only_in_separate", "only_in_combined"}
+# Keys that hold raw model output (JSON, usually wrapped in a markdown code block)
+RAW_OUTPUT_KEYS = {"new_prompt", "optimized_prompt", "raw_json", "result", "knots_result", "extraction", "knots", "topics"}
+
+MAX_PREFIX_EXPANSION = 1000
+
+_TOKEN_RE = re.compile(r"\w+(?:[.\-'’&‐-―]\w+)*")
+_PART_RE = re.compile(r"\w+")
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOPIC_RE = re.compile(r'"topic_(?:name|description)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def tokenize(text):
+    """Lowercase tokens; compound tokens like ``deepseek-v3.1`` are kept whole and also split into parts"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group(0)
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART_RE.findall(token))
+    return tokens
+
+
+def encode_postings(doc_ids):
+    """Delta + varint encode a sorted list of document ids"""
+    out = bytearray()
+    previous = 0
+    for doc_id in doc_ids:
+        delta = doc_id - previous
+        previous = doc_id
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_postings(data):
+    doc_ids = []
+    value = shift = previous = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += value
+        doc_ids.append(previous)
+        value = shift = 0
+    return doc_ids
+
+
+def _extract_topics(raw_output):
+    return "\n".join(json.loads(f'"{value}"') if "\\" in value else value
+                     for value in _TOPIC_RE.findall(raw_output))
+
+
+def _collect_result_fields(node, path, out):
+    """Walk one results file and collect (path, field) -> text fragments"""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            child_path = path + [key]
+            if key == "extracted_data" and isinstance(value, dict):
+                _collect_extracted(value, "/".join(path), out)
+            elif key in KNOT_LIST_KEYS and isinstance(value, list) and all(isinstance(v, str) for v in value):
+                out.setdefault(("/".join(path), "knots"), []).extend(value)
+            elif key == "denoised" and isinstance(value, str):
+                out.setdefault(("/".join(path), "denoised"), []).append(value)
+            elif key in RAW_OUTPUT_KEYS and isinstance(value, str):
+                run_path = "/".join(child_path)
+                out.setdefault((run_path, "output"), []).append(value)
+                topics = _extract_topics(value)
+                if topics:
+                    out.setdefault((run_path, "topics"), []).append(topics)
+            else:
+                _collect_result_fields(value, child_path, out)
+    elif isinstance(node, list):
+        for item in node:
+            if isinstance(item, (dict, list)):
+                _collect_result_fields(item, path, out)
+
+
+def _collect_extracted(node, run_path, out):
+    if isinstance(node, dict):
+        for value in node.values():
+            _collect_extracted(value, run_path, out)
+    elif isinstance(node, list):
+        for value in node:
+            _collect_extracted(value, run_path, out)
+    elif isinstance(node, str):
+        out.setdefault((run_path, "extracted"), []).append(node)
+
+
+def _corpus_emails(corpus_db):
+    # Лише читання: індекс не повинен створювати чи блокувати сховище
+    try:
+        conn = sqlite3.connect(f"file:{os.path.abspath(corpus_db)}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return
+    try:
+        rows = conn.execute("SELECT id, source, subject, text FROM emails ORDER BY id")
+        for email_id, source, subject, text in rows:
+            yield {"source": source, "path": f"#{email_id}", "field": "email",
+                   "title": f"{os.path.basename(source)} #{email_id}: {subject or '(no subject)'}",
+                   "text": f"{subject or ''}\n{text or ''}"}
+    except sqlite3.Error as e:
+        print(f"Skipping {corpus_db}: {str(e)}")
+    finally:
+        conn.close()
+
+
+def iter_corpus_documents(root=".", corpus_db=CORPUS_DB):
+    """Yield dicts with ``source``, ``path``, ``field``, ``title`` and ``text`` for everything we index"""
+    seen = set()
+    for pattern in SAMPLE_PATTERNS:
+        for file_path in sorted(glob.glob(os.path.join(root, pattern))):
+            if file_path in seen or not os.path.isfile(file_path):
+                continue
+            seen.add(file_path)
+            with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+                text = f.read()
+            if file_path.endswith(".html"):
+                text = _TAG_RE.sub(" ", text)
+            source = os.path.relpath(file_path, root)
+            yield {"source": source, "path": "", "field": "sample", "title": source, "text": text}
+
+    for module_name in EMAIL_MODULES:
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        for name, value in vars(module).items():
+            if not name.startswith("_") and isinstance(value, str):
+                source = module_name.replace(".", "/") + ".py"
+                yield {"source": source, "path": name, "field": "email", "title": f"{source}:{name}", "text": value}
+
+    corpus_path = corpus_db if os.path.isabs(corpus_db) else os.path.join(root, corpus_db)
+    if os.path.exists(corpus_path):
+        yield from _corpus_emails(corpus_path)
+
+    for pattern in RESULT_PATTERNS:
+        for file_path in sorted(glob.glob(os.path.join(root, pattern), recursive=True)):
+            if file_path in seen:
+                continue
+            seen.add(file_path)
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Skipping {file_path}: {str(e)}")
+                continue
+            fields = {}
+            _collect_result_fields(data, [], fields)
+            source = os.path.relpath(file_path, root)
+            for (run_path, field), fragments in fields.items():
+                title = f"{source} › {run_path}" if run_path else source
+                yield {"source": source, "path": run_path, "field": field, "title": title,
+                       "text": "\n".join(fragments)}
+
+
+class SearchIndex:
+    """Token -> compressed posting list, plus a table describing each document"""
+
+    def __init__(self, docs, terms, offsets, postings):
+        self.docs = docs
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+
+    @classmethod
+    def build(cls, documents):
+        docs = []
+        term_docs = {}
+        for doc_id, document in enumerate(documents):
+            text = document["text"]
+            docs.append({
+                "source": document["source"],
+                "path": document["path"],
+                "field": document["field"],
+                "title": document["title"],
+                "preview": " ".join(text[:300].split())[:160],
+            })
+            for token in set(tokenize(text)):
+                term_docs.setdefault(token, []).append(doc_id)
+
+        terms = sorted(term_docs)
+        offsets = []
+        postings = bytearray()
+        for term in terms:
+            offsets.append(len(postings))
+            postings.extend(encode_postings(term_docs[term]))
+        offsets.append(len(postings))
+        return cls(docs, terms, offsets, bytes(postings))
+
+    def save(self, index_dir=INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        with open(os.path.join(index_dir, POSTINGS_FILE), "wb") as f:
+            f.write(self.postings)
+        meta = {"version": 1, "built_at": time.time(), "docs": self.docs,
+                "terms": self.terms, "offsets": self.offsets}
+        with open(os.path.join(index_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR):
+        with open(os.path.join(index_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(index_dir, POSTINGS_FILE), "rb") as f:
+            postings = f.read()
+        return cls(meta["docs"], meta["terms"], meta["offsets"], postings)
+
+    def _postings_at(self, position):
+        return decode_postings(self.postings[self.offsets[position]:self.offsets[position + 1]])
+
+    def lookup(self, term, truncated=None):
+        """Document ids for an exact token, or for every token starting with ``term`` if it ends with ``*``
+
+        A prefix is expanded to at most ``MAX_PREFIX_EXPANSION`` tokens; when
+        it matches more, it is appended to the ``truncated`` list.
+        """
+        if term.endswith("*"):
+            prefix = term[:-1]
+            if not prefix:
+                return set()
+            start = bisect.bisect_left(self.terms, prefix)
+            end = bisect.bisect_left(self.terms, prefix + "\U0010ffff")
+            if end - start > MAX_PREFIX_EXPANSION and truncated is not None:
+                truncated.append(term)
+            result = set()
+            for position in range(start, min(end, start + MAX_PREFIX_EXPANSION)):
+                result.update(self._postings_at(position))
+            return result
+        position = bisect.bisect_left(self.terms, term)
+        if position < len(self.terms) and self.terms[position] == term:
+            return set(self._postings_at(position))
+        return set()
+
+    def _term_docs(self, word, truncated=None):
+        """A query word can tokenize into several tokens; all of them must match"""
+        prefix = word.endswith("*")
+        tokens = [t for t in _TOKEN_RE.findall(word.lower().rstrip("*"))]
+        if not tokens:
+            return None
+        result = None
+        for i, token in enumerate(tokens):
+            docs = self.lookup(token + "*" if prefix and i == len(tokens) - 1 else token, truncated)
+            result = docs if result is None else result & docs
+        return result
+
+    def search(self, query, fields=None, truncated=None):
+        """Evaluate a boolean query and return matching document ids in index order
+
+        Prefixes that matched more than ``MAX_PREFIX_EXPANSION`` tokens, and so
+        gave partial results, are appended to the ``truncated`` list.
+        """
+        result = set()
+        for clause in re.split(r"\s+OR\s+", query.strip()):
+            include = None
+            exclude = set()
+            negate_next = False
+            for word in clause.split():
+                if word == "NOT":
+                    negate_next = True
+                    continue
+                negate = negate_next or (word.startswith("-") and len(word) > 1)
+                negate_next = False
+                docs = self._term_docs(word.lstrip("-") if negate else word, truncated)
+                if docs is None:
+                    continue
+                if negate:
+                    exclude |= docs
+                else:
+                    include = docs if include is None else include & docs
+            if include:
+                result |= include - exclude
+        if fields:
+            result = {doc_id for doc_id in result if self.docs[doc_id]["field"] in fields}
+        return sorted(result)
+
+
+def build_index(root=".", index_dir=INDEX_DIR, corpus_db=CORPUS_DB):
+    index = SearchIndex.build(iter_corpus_documents(root, corpus_db))
+    index.save(index_dir)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the full-text index over samples and results")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="Rebuild the index from samples/ and results/")
+    query_parser = subparsers.add_parser("query", help="Run a query against the index")
+    query_parser.add_argument("query")
+    query_parser.add_argument("--field", action="append", choices=FIELDS)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = build_index()
+        print(f"Indexed {len(index.docs)} documents, {len(index.terms)} terms, "
+              f"{len(index.postings):,} bytes of postings in {time.perf_counter() - start:.2f}s")
+    else:
+        index = SearchIndex.load()
+        start = time.perf_counter()
+        truncated = []
+        hits = index.search(args.query, fields=args.field, truncated=truncated)
+        elapsed = (time.perf_counter() - start) * 1000
+        for doc_id in hits:
+            doc = index.docs[doc_id]
+            print(f"[{doc['field']}] {doc['title']}")
+        print(f"{len(hits)} documents in {elapsed:.2f} ms")
+        if truncated:
+            print(f"Partial results: {', '.join(truncated)} matched more than {MAX_PREFIX_EXPANSION} terms, "
+                  f"only the first {MAX_PREFIX_EXPANSION} were searched")
+
+
+if __name__ == "__main__":
+    main()
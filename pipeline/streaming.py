@@ -0,0 +1,277 @@
+"""Parse model output while it is still being generated.
+
+``IncrementalJSONParser`` is fed the text of a streamed response piece by
+piece and emits every value at a watched path as soon as the value closes:
+knot groups and topics of the analysis prompts, the sections of an extraction
+template and the items of every list. Fences and text around the JSON are
+skipped, several ```json blocks in one response are parsed one after another,
+and a truncated response still yields everything that was completed before
+the cut.
+
+``RepetitionGuard`` applies the dashboard's ``has_duplicate_issue`` rule to
+the list items as they arrive, so ``stream_completion`` can cancel a response
+that has started repeating itself instead of paying for it to the token
+limit::
+
+    completion = stream_completion(backend, messages, stage="extraction",
+                                   guard=RepetitionGuard(), on_event=print)
+"""
+import json
+import time
+from collections import Counter
+
+# Шляхи: "*" — будь-який ключ чи індекс, "#" — лише індекс масиву, "**" — будь-яка кількість сегментів
+KNOT_GROUPS = "knot_group"
+TOPICS = "topic"
+SECTIONS = "section"
+LIST_ITEMS = "list_item"
+DEFAULT_PATTERNS = {
+    KNOT_GROUPS: ("**", "knots_from_section", "#"),
+    TOPICS: ("**", "topics", "#"),
+    SECTIONS: ("extracted_data", "*"),
+    LIST_ITEMS: ("**", "#"),
+}
+
+# Ті самі пороги, що й has_duplicate_issue на сторінці Email Comparison
+MAX_ITEMS = 1000
+DUPLICATE_LIMIT = 10
+DUPLICATE_RATIO = 0.2
+
+_WHITESPACE = " \t\r\n"
+_SCALAR_END = ",]}" + _WHITESPACE
+_SCALAR_START = "-0123456789tfn"
+
+
+def path_matches(pattern, path):
+    if not pattern:
+        return not path
+    head, rest = pattern[0], pattern[1:]
+    if head == "**":
+        return any(path_matches(rest, path[i:]) for i in range(len(path) + 1))
+    if not path:
+        return False
+    segment = path[0]
+    if head == "#":
+        matched = isinstance(segment, int)
+    else:
+        matched = head == "*" or head == segment
+    return matched and path_matches(rest, path[1:])
+
+
+class IncrementalJSONParser:
+    """Push parser for streamed JSON; ``feed`` returns the (name, path, value) events completed so far
+
+    Only the text of values that are being captured is kept, so memory stays
+    proportional to the largest watched value rather than the response. Text
+    that is not valid JSON abandons the current document (``errors`` counts
+    them) and parsing resumes at the next ``{``.
+    """
+
+    def __init__(self, patterns=None):
+        self.patterns = dict(DEFAULT_PATTERNS if patterns is None else patterns)
+        self.errors = 0
+        self.documents = 0
+        self._text = ""
+        self._pos = 0
+        # Кадр: [дужка, стан, ключ або індекс поточного елемента]; шлях значення — треті елементи кадрів
+        self._stack = []
+        self._captures = []
+        self._in_string = self._escape = self._string_is_key = self._in_scalar = False
+        self._value_start = 0
+
+    def feed(self, text):
+        if not text:
+            return []
+        self._text += text
+        events = []
+        text_length = len(self._text)
+        while self._pos < text_length:
+            self._step(self._text[self._pos], events)
+            self._pos += 1
+        self._trim()
+        return events
+
+    def _trim(self):
+        starts = [capture[1] for capture in self._captures]
+        if self._in_string or self._in_scalar:
+            starts.append(self._value_start)
+        keep = min(starts, default=self._pos)
+        if keep:
+            self._text = self._text[keep:]
+            self._pos -= keep
+            self._value_start -= keep
+            for capture in self._captures:
+                capture[1] -= keep
+
+    def _step(self, char, events):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == "\n":
+                # Сирий перенос рядка в JSON-рядку — відповідь обірвалася посеред значення
+                self._in_string = False
+                self._error(char)
+            elif char == '"':
+                self._in_string = False
+                if self._string_is_key:
+                    frame = self._stack[-1]
+                    frame[1], frame[2] = "colon", json.loads(self._text[self._value_start:self._pos + 1])
+                else:
+                    self._value_done(events, self._pos + 1)
+            return
+        if self._in_scalar:
+            if char not in _SCALAR_END:
+                return
+            self._in_scalar = False
+            self._value_done(events, self._pos)
+        if char in _WHITESPACE:
+            return
+        if not self._stack:
+            # Поза документом: пропускаємо огорожі ``` і текст до наступного {
+            if char == "{":
+                self._start_value(char)
+            return
+        frame = self._stack[-1]
+        state = frame[1]
+        if frame[0] == "{":
+            if state == "key" and char == '"':
+                self._in_string, self._string_is_key, self._value_start = True, True, self._pos
+            elif state in ("key", "comma") and char == "}":
+                self._close(events)
+            elif state == "colon" and char == ":":
+                frame[1] = "value"
+            elif state == "value":
+                self._start_value(char)
+            elif state == "comma" and char == ",":
+                frame[1] = "key"
+            else:
+                self._error(char)
+        else:
+            if state in ("first", "comma") and char == "]":
+                self._close(events)
+            elif state in ("first", "value"):
+                self._start_value(char)
+            elif state == "comma" and char == ",":
+                frame[1] = "value"
+                frame[2] += 1
+            else:
+                self._error(char)
+
+    def _error(self, char):
+        """Drop the broken document and look for the next one; completed values stay emitted"""
+        self.errors += 1
+        self._stack.clear()
+        self._captures.clear()
+        self._in_scalar = False
+        # Обірвана відповідь, за якою одразу йде наступний блок: { може бути його початком
+        if char == "{":
+            self._start_value(char)
+
+    def _start_value(self, char):
+        if char not in '{["' and char not in _SCALAR_START:
+            self._error(char)
+            return
+        path = tuple(frame[2] for frame in self._stack)
+        names = [name for name, pattern in self.patterns.items() if path_matches(pattern, path)]
+        if names:
+            self._captures.append([names, self._pos, len(self._stack), path])
+        if char == "{":
+            self._stack.append(["{", "key", None])
+        elif char == "[":
+            self._stack.append(["[", "first", 0])
+        else:
+            self._value_start = self._pos
+            if char == '"':
+                self._in_string, self._string_is_key = True, False
+            else:
+                self._in_scalar = True
+
+    def _close(self, events):
+        self._stack.pop()
+        self._value_done(events, self._pos + 1)
+
+    def _value_done(self, events, end):
+        depth = len(self._stack)
+        while self._captures and self._captures[-1][2] == depth:
+            names, start, _, path = self._captures.pop()
+            try:
+                value = json.loads(self._text[start:end])
+            except ValueError:
+                continue
+            events.extend((name, path, value) for name in names)
+        if self._stack:
+            self._stack[-1][1] = "comma"
+        else:
+            self.documents += 1
+
+
+class RepetitionGuard:
+    """Trips when the streamed list items show the ``has_duplicate_issue`` pattern
+
+    Fed with parser events; only string list items are counted, compared
+    case-insensitively. A knot group is counted through its strings, which
+    the parser emits as list items of their own before the group.
+    """
+
+    def __init__(self, max_items=MAX_ITEMS, duplicate_limit=DUPLICATE_LIMIT, duplicate_ratio=DUPLICATE_RATIO):
+        self.max_items = max_items
+        self.duplicate_limit = duplicate_limit
+        self.duplicate_ratio = duplicate_ratio
+        self.counts = Counter()
+        self.items = 0
+        self.reason = None
+
+    @property
+    def duplicates(self):
+        return self.items - len(self.counts)
+
+    def add(self, event):
+        """Count one parser event; True once the response looks like a runaway"""
+        name, _, value = event
+        if name != LIST_ITEMS or not isinstance(value, str):
+            return False
+        self.counts[value.strip().lower()] += 1
+        self.items += 1
+        if self.items > self.max_items:
+            self.reason = f"more than {self.max_items} list items"
+        elif self.duplicates > self.duplicate_limit and self.duplicates / self.items > self.duplicate_ratio:
+            self.reason = f"{self.duplicates} of {self.items} list items repeated"
+        return self.reason is not None
+
+
+def stream_completion(backend, messages, stage=None, patterns=None, guard=None, on_event=None):
+    """``backend.complete`` over a stream, with parser events as they close and early cancellation
+
+    Returns the same dict as ``complete`` plus ``events`` (every parser event),
+    ``first_event_time`` (seconds until the first completed value) and, when
+    the guard cancelled the response, ``cancelled`` with its reason.
+    """
+    parser = IncrementalJSONParser(patterns)
+    stream = backend.stream(messages, stage=stage)
+    events = []
+    first_event_time = None
+    for piece in stream:
+        for event in parser.feed(piece):
+            if first_event_time is None:
+                first_event_time = time.perf_counter() - stream.start
+            events.append(event)
+            if on_event:
+                on_event(event)
+            if guard is not None and guard.add(event):
+                break
+        if guard is not None and guard.reason:
+            stream.close()
+            break
+    completion = stream.result()
+    completion["events"] = events
+    completion["first_event_time"] = first_event_time
+    if guard is not None and guard.reason:
+        completion["cancelled"] = guard.reason
+    return completion
+
+
+def completed_sections(events):
+    """``extracted_data`` sections that closed before a response was cut off"""
+    return {path[-1]: value for name, path, value in events if name == SECTIONS}
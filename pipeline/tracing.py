@@ -0,0 +1,255 @@
+"""Span-level tracing of pipeline runs, exported as OpenTelemetry JSON.
+
+The stage metrics only hold totals; a trace shows where the time of a run
+went. ``Tracer`` records spans with their parent, start and end: the run,
+each document, each stage, every model call (``TracedBackend``) with its
+queue wait, request (until the first token) and generation, and the parsing
+and post-processing of every chunk. ``export`` writes the spans in the OTLP
+JSON layout, so the file can be loaded into any OpenTelemetry tool as well
+as the "Run Traces" page::
+
+    tracer = Tracer()
+    with activate(tracer), span("document", document=path):
+        ...
+    tracer.export(trace_path(tracer))
+
+``span`` does nothing while no tracer is active. Spans nest per thread;
+spans opened in a worker thread hang under the run's root span.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+TRACE_DIR = os.path.join("indexes", "traces")
+SERVICE_NAME = "comparison_prompts"
+SCOPE_NAME = "pipeline.runner"
+# Тип спану з погляду моделі часу, для підсумку на сторінці
+SPAN_KINDS = {"queue_wait": "waiting", "request": "model", "generation": "model", "journal": "journal",
+              "parse": "parsing", "merge": "post-processing", "save": "post-processing", "chunking": "planning"}
+
+_active = None
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _span(trace_id, span_id, parent, name, start_ns, end_ns, attributes, status=None):
+    span = {"traceId": trace_id, "spanId": span_id, "parentSpanId": parent, "name": name, "kind": 1,
+            "startTimeUnixNano": str(start_ns), "endTimeUnixNano": str(end_ns),
+            "attributes": [_attribute(key, value) for key, value in attributes.items() if value is not None]}
+    if status is not None:
+        span["status"] = status
+    return span
+
+
+def _value(attribute):
+    typed = attribute["value"]
+    if "intValue" in typed:
+        return int(typed["intValue"])
+    return next(iter(typed.values()), None)
+
+
+class Tracer:
+    """Spans of one run under a root span; thread-safe"""
+
+    def __init__(self, name="run", **attributes):
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.root = self._new_id()
+        self.root_start = time.time_ns()
+        self.root_name = name
+        self.root_attributes = attributes
+
+    @staticmethod
+    def _new_id():
+        return secrets.token_hex(8)
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self):
+        """Id of the innermost open span of this thread, else the root"""
+        stack = self._stack()
+        return stack[-1] if stack else self.root
+
+    def record(self, name, start_ns, end_ns, parent=None, **attributes):
+        """Add a finished span; returns its id"""
+        span_id = self._new_id()
+        span = _span(self.trace_id, span_id, parent or self.current(), name, start_ns, end_ns, attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span_id
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """A span around the body; spans opened inside it are its children"""
+        span_id = self._new_id()
+        parent = self.current()
+        start = time.time_ns()
+        stack = self._stack()
+        stack.append(span_id)
+        status = {"code": 1}
+        try:
+            yield span_id
+        except BaseException as e:
+            status = {"code": 2, "message": str(e)[:500]}
+            raise
+        finally:
+            stack.pop()
+            span = _span(self.trace_id, span_id, parent, name, start, time.time_ns(), attributes, status)
+            with self._lock:
+                self.spans.append(span)
+
+    def export(self, path):
+        """Write the spans, the root span included, as OTLP JSON"""
+        root = _span(self.trace_id, self.root, "", self.root_name, self.root_start, time.time_ns(),
+                     self.root_attributes)
+        with self._lock:
+            spans = [root] + list(self.spans)
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": spans}],
+        }]}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        return path
+
+
+def trace_path(tracer, directory=TRACE_DIR):
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(tracer.root_start / 1e9))
+    return os.path.join(directory, f"{stamp}-{tracer.trace_id[:8]}.json")
+
+
+def set_tracer(tracer):
+    """Make ``tracer`` the one ``span`` and ``TracedBackend`` record to (None to stop); returns the previous one"""
+    global _active
+    previous, _active = _active, tracer
+    return previous
+
+
+@contextmanager
+def activate(tracer):
+    previous = set_tracer(tracer)
+    try:
+        yield tracer
+    finally:
+        set_tracer(previous)
+
+
+def span(name, **attributes):
+    """A span in the active tracer, or nothing"""
+    return _active.span(name, **attributes) if _active is not None else nullcontext()
+
+
+def read_trace(path):
+    """Spans of an OTLP JSON file as dicts with ``start``/``end`` in seconds and flat attributes"""
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    spans = []
+    for resource in payload.get("resourceSpans", []):
+        for scope in resource.get("scopeSpans", []):
+            for item in scope.get("spans", []):
+                spans.append({"span_id": item["spanId"], "parent_id": item.get("parentSpanId"),
+                              "name": item["name"], "start": int(item["startTimeUnixNano"]) / 1e9,
+                              "end": int(item["endTimeUnixNano"]) / 1e9,
+                              "error": (item.get("status") or {}).get("code") == 2,
+                              **{attribute["key"]: _value(attribute) for attribute in item.get("attributes", [])}})
+    return spans
+
+
+def inherit(spans, key):
+    """Fill ``key`` of every span from its closest ancestor that has it (the document of a parse span)"""
+    by_id = {item["span_id"]: item for item in spans}
+    for item in spans:
+        ancestor = item
+        while ancestor is not None and ancestor.get(key) is None:
+            ancestor = by_id.get(ancestor.get("parent_id"))
+        item[key] = ancestor.get(key) if ancestor is not None else None
+    return spans
+
+
+def time_breakdown(spans):
+    """Seconds per kind of work (``SPAN_KINDS``), from the leaf spans"""
+    totals = Counter()
+    for item in spans:
+        kind = SPAN_KINDS.get(item["name"])
+        if kind:
+            totals[kind] += item["end"] - item["start"]
+    return dict(totals)
+
+
+class TracedBackend:
+    """A backend whose calls are recorded as ``call`` spans of the active tracer
+
+    Each call span gets children from the completion: ``queue_wait`` (time in
+    the rate limiter), ``request`` (until the first token; the whole call when
+    it was not streamed) and ``generation`` (the rest of a streamed call).
+    Calls replayed from the journal become a ``journal`` span.
+    """
+
+    def __init__(self, backend, **attributes):
+        self.backend = backend
+        self.attributes = attributes
+        self.name = backend.name
+        self.model = getattr(backend, "model", None)
+        self._chunks = Counter()
+
+    def _record(self, stage, start, completion):
+        tracer = _active
+        if tracer is None:
+            return
+        end = time.time_ns()
+        chunk = self._chunks[stage]
+        self._chunks[stage] += 1
+        attributes = {**self.attributes, "stage": stage, "chunk": chunk,
+                      **{key: completion.get(key) for key in ("input_tokens", "output_tokens", "cost",
+                                                              "cached_input_tokens", "hedged", "retries")}}
+        call = tracer.record("call", start, end, **attributes)
+        if completion.get("journaled"):
+            tracer.record("journal", start, end, parent=call)
+            return
+        request_start = start + int(completion.get("queue_wait", 0.0) * 1e9)
+        if request_start > start:
+            tracer.record("queue_wait", start, request_start, parent=call, queue_depth=completion.get("queue_depth"))
+        first_token = completion.get("time_to_first_token")
+        first_token_end = min(end, request_start + int(first_token * 1e9)) if first_token is not None else end
+        tracer.record("request", request_start, first_token_end, parent=call)
+        if first_token_end < end:
+            tracer.record("generation", first_token_end, end, parent=call)
+
+    def complete(self, messages, stage=None):
+        start = time.time_ns()
+        completion = self.backend.complete(messages, stage=stage)
+        self._record(stage, start, completion)
+        return completion
+
+    def stream(self, messages, stage=None):
+        start = time.time_ns()
+        stream = self.backend.stream(messages, stage=stage)
+        result = stream.result
+
+        def traced_result():
+            completion = result()
+            self._record(stage, start, completion)
+            return completion
+
+        stream.result = traced_result
+        return stream
@@ -0,0 +1,253 @@
+"""Spread a run over several machines through a job queue in a shared SQLite file.
+
+Every machine runs the same ``pipeline.runner`` command with ``--queue``; the
+first to start fills the queue with one job per document, the others find
+them there (jobs are keyed by sweep and document, so enqueueing twice adds
+nothing). Each worker thread leases a job, processes it and marks it done.
+A lease lasts ``LEASE_SECONDS`` and is renewed by a heartbeat while the job
+runs; the job of a worker that died goes back to the others when its lease
+expires, up to ``MAX_ATTEMPTS`` times. Results are written under a fixed
+name with an atomic rename before a job is marked done, so a job processed
+twice writes the same file twice and nothing else.
+
+A sweep is one set of runner options (approach, chunking, backend, ...):
+running the command with other options fills a separate sweep in the same
+queue. Nothing but the file is shared, so no service has to run anywhere.
+The queue keeps SQLite's default rollback journal, which, unlike WAL, works
+on network filesystems::
+
+    python -m pipeline.runner samples --queue /shared/work_queue.sqlite --workers 4   # on every machine
+    python -m pipeline.work_queue status /shared/work_queue.sqlite
+    python -m pipeline.work_queue retry /shared/work_queue.sqlite                   # failed jobs again
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUE_DB = os.path.join("indexes", "work_queue.sqlite")
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 5.0
+STATUSES = ("pending", "leased", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    sweep TEXT NOT NULL,
+    document TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result_path TEXT,
+    error TEXT,
+    created_at REAL,
+    finished_at REAL,
+    UNIQUE (sweep, document)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (sweep, status);
+"""
+
+
+def connect(path=QUEUE_DB):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Транзакції керуються явно: BEGIN IMMEDIATE бере блокування на запис одразу
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def sweep_id(options):
+    """Id of a sweep: a hash of the options its documents are run with"""
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def enqueue(conn, sweep, documents, options):
+    """Add a job per document not yet in the sweep; returns how many were new"""
+    before = conn.total_changes
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany("INSERT OR IGNORE INTO jobs (sweep, document, options, created_at) VALUES (?, ?, ?, ?)",
+                     [(sweep, document, json.dumps(options, sort_keys=True), now) for document in documents])
+    conn.execute("COMMIT")
+    return conn.total_changes - before
+
+
+def lease(conn, sweep, worker, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+    """The next pending (or expired) job of the sweep, leased to ``worker``; None when there is none"""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE sweep = ? AND attempts < ? "
+            "AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) ORDER BY id LIMIT 1",
+            (sweep, max_attempts, now)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                         "WHERE id = ?", (worker, now + lease_seconds, row["id"]))
+        # Прострочені оренди без спроб, що лишилися, більше не чекають
+        conn.execute("UPDATE jobs SET status = 'failed', error = 'lease expired', finished_at = ? "
+                     "WHERE sweep = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                     (now, sweep, now, max_attempts))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return dict(row) if row is not None else None
+
+
+def heartbeat(conn, job_ids, worker, lease_seconds=LEASE_SECONDS):
+    """Extend the leases ``worker`` still holds; returns the ids it lost"""
+    lost = []
+    for job_id in job_ids:
+        updated = conn.execute("UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                               (time.time() + lease_seconds, job_id, worker)).rowcount
+        if not updated:
+            lost.append(job_id)
+    return lost
+
+
+def complete(conn, job_id, worker, result_path):
+    """Mark a job done; a job already done (by a worker whose lease it outlived) stays as it is"""
+    conn.execute("UPDATE jobs SET status = 'done', worker = ?, result_path = ?, error = NULL, finished_at = ? "
+                 "WHERE id = ? AND status != 'done'", (worker, result_path, time.time(), job_id))
+
+
+def fail(conn, job_id, worker, error, max_attempts=MAX_ATTEMPTS):
+    """Give a failed job back to the queue, or mark it failed after ``max_attempts``"""
+    conn.execute("UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                 "error = ?, lease_expires = NULL, finished_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                 (max_attempts, str(error)[:1000], time.time(), job_id, worker))
+
+
+def retry_failed(conn, sweep=None):
+    """Put failed jobs back with fresh attempts; returns how many"""
+    query = "UPDATE jobs SET status = 'pending', attempts = 0, error = NULL WHERE status = 'failed'"
+    return conn.execute(query + (" AND sweep = ?" if sweep else ""), (sweep,) if sweep else ()).rowcount
+
+
+def progress(conn, sweep=None):
+    """``{sweep: {status: jobs}}``"""
+    query = "SELECT sweep, status, COUNT(*) AS jobs FROM jobs"
+    rows = conn.execute(query + (" WHERE sweep = ?" if sweep else "") + " GROUP BY sweep, status",
+                        (sweep,) if sweep else ())
+    counts = {}
+    for row in rows:
+        counts.setdefault(row["sweep"], dict.fromkeys(STATUSES, 0))[row["status"]] = row["jobs"]
+    return counts
+
+
+class _Heartbeat:
+    """Renews the leases of the jobs in progress every third of the lease"""
+
+    def __init__(self, path, worker, lease_seconds):
+        self.path = path
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.jobs = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        conn = connect(self.path)
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._lock:
+                jobs = list(self.jobs)
+            # Втрачену оренду не повернути; повторна обробка запише той самий результат
+            heartbeat(conn, jobs, self.worker, self.lease_seconds)
+        conn.close()
+
+    def add(self, job_id):
+        with self._lock:
+            self.jobs.add(job_id)
+
+    def remove(self, job_id):
+        with self._lock:
+            self.jobs.discard(job_id)
+
+
+def drain(path, sweep, process, concurrency=1, worker=None, lease_seconds=LEASE_SECONDS,
+          max_attempts=MAX_ATTEMPTS, poll_interval=POLL_INTERVAL, on_error=None):
+    """Lease and process the jobs of a sweep in ``concurrency`` threads until none are left
+
+    ``process(document)`` does the work and returns the path of the written
+    result. A thread with nothing to lease waits while other workers still
+    hold leases, since an expired one comes back. Exceptions from ``process``
+    fail the job (it is retried up to ``max_attempts``); ``on_error(document,
+    error)`` is told about them. Returns the number of jobs this worker
+    finished.
+    """
+    worker = worker or worker_id()
+
+    def run_worker(_):
+        conn = connect(path)
+        finished = 0
+        try:
+            while True:
+                job = lease(conn, sweep, worker, lease_seconds, max_attempts)
+                if job is None:
+                    if not progress(conn, sweep).get(sweep, {}).get("leased"):
+                        return finished
+                    time.sleep(poll_interval)
+                    continue
+                beat.add(job["id"])
+                try:
+                    result_path = process(job["document"])
+                except Exception as e:
+                    fail(conn, job["id"], worker, e, max_attempts)
+                    if on_error:
+                        on_error(job["document"], e)
+                else:
+                    complete(conn, job["id"], worker, result_path)
+                    finished += 1
+                finally:
+                    beat.remove(job["id"])
+        finally:
+            conn.close()
+
+    with _Heartbeat(path, worker, lease_seconds) as beat, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return sum(executor.map(run_worker, range(concurrency)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the shared job queue of distributed runs")
+    parser.add_argument("command", choices=["status", "retry"])
+    parser.add_argument("db", nargs="?", default=QUEUE_DB)
+    parser.add_argument("--sweep", help="Only this sweep")
+    args = parser.parse_args()
+    conn = connect(args.db)
+    if args.command == "retry":
+        print(f"{retry_failed(conn, args.sweep)} failed jobs queued again")
+    for sweep, counts in progress(conn, args.sweep).items():
+        options = conn.execute("SELECT options FROM jobs WHERE sweep = ? LIMIT 1", (sweep,)).fetchone()["options"]
+        print(f"{sweep}: " + ", ".join(f"{counts[status]} {status}" for status in STATUSES) + f"  {options}")
+    for row in conn.execute("SELECT sweep, document, attempts, error FROM jobs WHERE status = 'failed'"
+                            + (" AND sweep = ?" if args.sweep else ""), (args.sweep,) if args.sweep else ()):
+        print(f"  failed {row['sweep']} {row['document']} after {row['attempts']} attempts: {row['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import streamlit as st
+from dashboard.shared_cache import results_index, cache_stats_sidebar
 
 st.set_page_config(
     page_title="Prompts Analysis Tools",
@@ -12,10 +13,31 @@ Welcome to the Prompts Analysis Tools dashboard. This application provides tools
 
 1. **Email Comparison**: Compare different prompting approaches for email analysis.
 2. **File Comparison**: Compare different result files from email analysis.
+3. **Search**: Full-text search across the samples and model outputs (knots, topics, denoised text).
+4. **Email Corpus**: Ingest whole mailboxes and explore token usage, cost and entities across thousands of emails.
+5. **Run Traces**: Timeline of a pipeline run, showing where the time went: rate limiter, model, parsing.
+6. **Regression Gate**: Check whether a new run is more expensive or slower than its baseline, document by document.
 
 Please select a tool from the sidebar to get started.
 """)
 
+# Короткий огляд усіх запусків з results/
+st.header("Stored Runs")
+runs = results_index()
+if runs.empty:
+    st.info("No results found in the results/ directory.")
+else:
+    totals = runs[runs["stage"] == "total"]
+    overview = totals.groupby("layout").agg(
+        Files=("source", "nunique"),
+        Runs=("source", "size"),
+        Tokens=("total_tokens", "sum"),
+        Cost=("cost", "sum"),
+    ).reset_index().rename(columns={"layout": "Layout"})
+    overview["Cost"] = overview["Cost"].map(lambda x: f"${x:.4f}")
+    st.dataframe(overview, hide_index=True, width="stretch")
+cache_stats_sidebar()
+
 # Додаткова інформація про проект
 st.markdown("---")
 st.header("About")